@@ -1,6 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from django.db.models import Q
+
+from ride_app.admin_tools import DateHierarchyListFilter, EstimatedCountPaginator
 from ride_app.forms import CustomUserChangeForm, CustomUserCreationForm
 from .models import User, Ride, RideEvent
 
@@ -45,13 +48,62 @@ admin.site.register(User, CustomUserAdmin)
 class RideAdmin(admin.ModelAdmin):
     list_display = ("id_ride", "status", "id_rider", "id_driver", "pickup_time")
     list_filter = ("status",)
-    search_fields = ("id_rider__username", "id_driver__username")
+    # User.__str__ needs the user row: join both users instead of one query per row.
+    list_select_related = ("id_rider", "id_driver")
+    search_fields = ("=id_ride", "=id_rider__username", "=id_driver__username")
+    search_help_text = "Exact ride id or rider/driver username."
     ordering = ("-pickup_time",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Match ids and usernames exactly so the pk and the unique username
+        # index are used instead of LIKE scans.
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if search_term.isdigit():
+            return queryset.filter(id_ride=int(search_term)), False
+        return (
+            queryset.filter(
+                Q(id_rider__username=search_term) | Q(id_driver__username=search_term)
+            ),
+            False,
+        )
+
+
+class RideEventCreatedAtFilter(DateHierarchyListFilter):
+    field_name = "created_at"
+    title = "created at"
+    parameter_name = "created"
 
 
 @admin.register(RideEvent)
 class RideEventAdmin(admin.ModelAdmin):
-    list_display = ("id_ride_event", "id_ride", "description", "created_at")
-    list_filter = ("created_at",)
-    search_fields = ("id_ride__id_ride", "description")
+    list_display = ("id_ride_event", "ride", "description", "created_at")
+    list_filter = (RideEventCreatedAtFilter,)
+    search_fields = ("=id_ride__id_ride", "description")
+    search_help_text = "Exact ride id, or the beginning of the description (case-sensitive)."
     ordering = ("-created_at",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @admin.display(description="ride", ordering="id_ride")
+    def ride(self, obj):
+        # Reads the FK column; RideEvent.id_ride would load the Ride per row.
+        return f"Ride {obj.id_ride_id}"
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if search_term.isdigit():
+            return queryset.filter(id_ride_id=int(search_term)), False
+        # A prefix expressed as a range can use the description index on any
+        # backend, unlike LIKE '%term%'.
+        return (
+            queryset.filter(
+                description__gte=search_term, description__lt=search_term + "\uffff"
+            ),
+            False,
+        )
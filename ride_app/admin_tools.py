@@ -0,0 +1,153 @@
+import calendar
+from datetime import MAXYEAR, MINYEAR, datetime, timedelta
+
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+
+def estimated_row_count(model, using="default"):
+    """
+    Return the planner's row estimate for ``model``'s table, or None if the
+    backend keeps no statistics (run ANALYZE to create them on SQLite).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    queries = {
+        "postgresql": ("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table]),
+        "mysql": (
+            "SELECT table_rows FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = %s",
+            [table],
+        ),
+        "sqlite": ("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table]),
+    }
+    if connection.vendor not in queries:
+        return None
+    sql, params = queries[connection.vendor]
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(sql, params)
+        except DatabaseError:
+            # e.g. sqlite_stat1 doesn't exist until the first ANALYZE.
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None:
+        return None
+    if connection.vendor == "sqlite":
+        # The first number of sqlite_stat1.stat is the table's row count.
+        return int(str(row[0]).split()[0])
+    return int(row[0]) if int(row[0]) >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids COUNT(*) over huge tables.
+
+    An unfiltered changelist uses the table statistics once they report more
+    than ``estimate_threshold`` rows. A filtered one counts at most
+    ``count_limit`` rows, so pages past that limit are not linked.
+    """
+
+    estimate_threshold = 100_000
+    count_limit = 10_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.estimate_threshold:
+                return estimate
+            return queryset.count()
+        # COUNT(*) over a LIMITed subquery stops after count_limit rows.
+        return queryset.order_by()[: self.count_limit].count()
+
+
+class DateHierarchyListFilter(admin.SimpleListFilter):
+    """
+    Year -> month -> day drill-down over an indexed datetime field.
+
+    Unlike ModelAdmin.date_hierarchy, which lists the available dates with a
+    SELECT DISTINCT over the whole table, the choices come from the field's
+    MIN/MAX (two index lookups) and the calendar, and the selection becomes
+    a half-open range on the field.
+    """
+
+    field_name = None
+    title = "date"
+    parameter_name = "date"
+
+    def parse(self, value):
+        """
+        Turn "2025", "2025-03" or "2025-03-02" into [year, month, day] prefixes;
+        anything invalid selects nothing. The first and last years datetime
+        supports are refused: the end of their range, or its conversion to
+        UTC, would overflow.
+        """
+        parts = (value or "").split("-")[:3]
+        if not all(part.isdigit() for part in parts):
+            return []
+        parts = [int(part) for part in parts]
+        if not MINYEAR < parts[0] < MAXYEAR:
+            return []
+        try:
+            datetime(*(parts + [1, 1])[:3])
+        except ValueError:
+            return []
+        return parts
+
+    def lookups(self, request, model_admin):
+        # The selected year/month stay listed above their months/days so the
+        # current level is shown as selected and one can step back up.
+        selected = self.parse(self.value())
+        if len(selected) >= 2:
+            year, month = selected[:2]
+            days = calendar.monthrange(year, month)[1]
+            return [
+                (str(year), str(year)),
+                (f"{year}-{month:02d}", f"{calendar.month_name[month]} {year}"),
+            ] + [
+                (f"{year}-{month:02d}-{day:02d}", f"{calendar.month_abbr[month]} {day}, {year}")
+                for day in range(1, days + 1)
+            ]
+        if len(selected) == 1:
+            (year,) = selected
+            return [(str(year), str(year))] + [
+                (f"{year}-{month:02d}", f"{calendar.month_name[month]} {year}")
+                for month in range(1, 13)
+            ]
+        bounds = model_admin.model._default_manager.aggregate(
+            first=Min(self.field_name), last=Max(self.field_name)
+        )
+        if bounds["first"] is None:
+            return []
+        return [
+            (str(year), str(year))
+            for year in range(bounds["last"].year, bounds["first"].year - 1, -1)
+        ]
+
+    def queryset(self, request, queryset):
+        selected = self.parse(self.value())
+        if not selected:
+            return queryset
+        year, month, day = (selected + [None, None])[:3]
+        tz = timezone.get_current_timezone()
+        if day is not None:
+            start = datetime(year, month, day)
+            end = start + timedelta(days=1)
+        elif month is not None:
+            start = datetime(year, month, 1)
+            end = datetime(year + month // 12, month % 12 + 1, 1)
+        else:
+            start = datetime(year, 1, 1)
+            end = datetime(year + 1, 1, 1)
+        return queryset.filter(
+            **{
+                f"{self.field_name}__gte": timezone.make_aware(start, tz),
+                f"{self.field_name}__lt": timezone.make_aware(end, tz),
+            }
+        )
@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from .models import User
+
+
+DEFAULT_OPTIONS = {
+    "MAX_SIZE": 10000,
+    "TTL": 60,
+}
+# Every User column but the password hash, which no API response reads.
+CACHED_USER_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields if field.attname != "password"
+)
+
+
+def get_options():
+    return {**DEFAULT_OPTIONS, **getattr(settings, "AUTH_TOKEN_CACHE", {})}
+
+
+class TokenCache:
+    """
+    Bounded, thread-safe LRU cache of token key -> the token user's field
+    values, whose entries also expire after ``ttl`` seconds.
+
+    The TTL bounds how long another worker process may keep serving a
+    revoked token, since invalidation signals only reach the current process.
+    ``max_size`` and ``ttl`` default to the AUTH_TOKEN_CACHE settings, read
+    on use.
+    """
+
+    def __init__(self, max_size=None, ttl=None):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self):
+        return get_options()["MAX_SIZE"] if self._max_size is None else self._max_size
+
+    @property
+    def ttl(self):
+        return get_options()["TTL"] if self._ttl is None else self._ttl
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, _, value = entry
+            if expires_at <= time.monotonic():
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, user_id, value):
+        ttl, max_size = self.ttl, self.max_size
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (time.monotonic() + ttl, user_id, value)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > max_size:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry[1]
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+
+def _partial_instance(model, **values):
+    # Build an instance as if loaded with .only(*values); the remaining
+    # fields are deferred and load from the database on first access.
+    field_names = [
+        field.attname for field in model._meta.concrete_fields if field.attname in values
+    ]
+    return model.from_db(
+        DEFAULT_DB_ALIAS, field_names, [values[name] for name in field_names]
+    )
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that resolves tokens from ``token_cache`` instead of
+    loading the Token and User rows on every request.
+
+    The returned user has every field but ``password`` loaded (one query on
+    a cache miss, none on a hit); the password hash is fetched on access.
+    """
+
+    def authenticate_credentials(self, key):
+        values = token_cache.get(key)
+        if values is None:
+            model = self.get_model()
+            try:
+                row = model.objects.values_list(
+                    *(f"user__{name}" for name in CACHED_USER_FIELDS)
+                ).get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            values = dict(zip(CACHED_USER_FIELDS, row))
+            token_cache.set(key, values["id_user"], values)
+
+        if not values["is_active"]:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+        user = _partial_instance(User, **values)
+        token = _partial_instance(self.get_model(), key=key, user_id=user.pk)
+        token.user = user
+        return (user, token)
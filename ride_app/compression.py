@@ -0,0 +1,60 @@
+import brotli
+from django.utils.text import compress_sequence, compress_string
+
+# Random bytes added to gzip headers to mitigate BREACH, as GZipMiddleware does.
+MAX_RANDOM_BYTES = 100
+# Supported content codings, preferred first.
+ENCODINGS = ("br", "gzip")
+
+
+def parse_accept_encoding(header):
+    """
+    Return {coding: quality} for an Accept-Encoding header.
+    """
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate_encoding(header):
+    """
+    Pick the best supported content coding the client accepts, or None.
+    Brotli wins ties because it compresses JSON noticeably better.
+    """
+    accepted = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for coding in ENCODINGS:
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(data, encoding, level):
+    if encoding == "br":
+        return brotli.compress(data, mode=brotli.MODE_TEXT, quality=level)
+    return compress_string(data, max_random_bytes=MAX_RANDOM_BYTES)
+
+
+def compress_stream(chunks, encoding, level):
+    if encoding == "br":
+        compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=level)
+        for chunk in chunks:
+            data = compressor.process(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    else:
+        yield from compress_sequence(chunks, max_random_bytes=MAX_RANDOM_BYTES)
@@ -0,0 +1,133 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+_local = threading.local()
+_replica_state = {}
+_replica_lock = threading.Lock()
+
+
+def replica_aliases():
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+def pin_to_primary(seconds=None):
+    """
+    Send this thread's reads to the primary for the next ``seconds``, so a
+    client reads its own writes even if the replicas are behind. Within a
+    request the pin ends with the request (ReplicaPinMiddleware), so the
+    thread's next client starts unpinned.
+    """
+    if seconds is None:
+        seconds = getattr(settings, "REPLICA_PIN_SECONDS", 5)
+    _local.pinned_until = time.monotonic() + seconds
+
+
+def unpin():
+    _local.pinned_until = 0
+
+
+def is_pinned_to_primary():
+    return getattr(_local, "pinned_until", 0) > time.monotonic()
+
+
+def replica_lag(alias):
+    """
+    Seconds between the newest RideEvent on the primary and on ``alias``,
+    0 when both are empty. Raises DatabaseError if the replica is unusable.
+    """
+    from .models import RideEvent
+
+    def newest(using):
+        return (
+            RideEvent.objects.using(using)
+            .order_by("-pk")
+            .values_list("created_at", flat=True)
+            .first()
+        )
+
+    primary = newest(DEFAULT_DB_ALIAS)
+    if primary is None:
+        return 0
+    replica = newest(alias)
+    if replica is None:
+        return float("inf")
+    return max((primary - replica).total_seconds(), 0)
+
+
+def check_replica(alias):
+    """
+    Probe ``alias`` and record whether it is reachable and within
+    REPLICA_MAX_LAG_SECONDS of the primary.
+    """
+    max_lag = getattr(settings, "REPLICA_MAX_LAG_SECONDS", 10)
+    try:
+        healthy = replica_lag(alias) <= max_lag
+    except DatabaseError:
+        healthy = False
+        connections[alias].close()
+    with _replica_lock:
+        _replica_state[alias] = (healthy, time.monotonic())
+    return healthy
+
+
+def available_replicas():
+    """
+    Replicas that passed their last health/lag check, re-checking any whose
+    result is older than REPLICA_CHECK_INTERVAL seconds.
+    """
+    interval = getattr(settings, "REPLICA_CHECK_INTERVAL", 5)
+    now = time.monotonic()
+    available = []
+    for alias in replica_aliases():
+        healthy, checked_at = _replica_state.get(alias, (False, None))
+        if checked_at is None or now - checked_at >= interval:
+            healthy = check_replica(alias)
+        if healthy:
+            available.append(alias)
+    return available
+
+
+class ReadReplicaRouter:
+    """
+    Route ride_app reads (RideViewSet listings, reports) to a healthy replica
+    and all writes to the primary, falling back to the primary when no
+    replica is configured, healthy and caught up.
+
+    Users are always read from the primary: authentication and permission
+    checks must not see a revoked role or a deactivated account late.
+    """
+
+    app_labels = {"ride_app"}
+    primary_models = {settings.AUTH_USER_MODEL.lower()}
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in self.app_labels:
+            return None
+        if model._meta.label_lower in self.primary_models:
+            return DEFAULT_DB_ALIAS
+        if is_pinned_to_primary() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = available_replicas()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in self.app_labels:
+            return None
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary and are never migrated directly.
+        if db in replica_aliases():
+            return False
+        return None
@@ -1,10 +1,20 @@
 import django_filters
-from .models import Ride
+from django.db.models import Exists, OuterRef
+from .models import Ride, RideEvent
 
 class RideFilter(django_filters.FilterSet):
     status = django_filters.CharFilter(field_name='status', lookup_expr='iexact')
     rider_email = django_filters.CharFilter(field_name='id_rider__email', lookup_expr='icontains')
+    # Rides with at least one event of this kind, e.g. ?event_kind=2 for pickups.
+    event_kind = django_filters.TypedChoiceFilter(
+        choices=RideEvent.Kind.choices, coerce=int, method='filter_event_kind'
+    )
 
     class Meta:
         model = Ride
-        fields = ['status', 'rider_email']
+        fields = ['status', 'rider_email', 'event_kind']
+
+    def filter_event_kind(self, queryset, name, value):
+        # EXISTS avoids the duplicate rows (and DISTINCT) of a join on events.
+        events = RideEvent.objects.filter(id_ride=OuterRef('pk'), event_kind=value)
+        return queryset.filter(Exists(events))
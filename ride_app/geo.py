@@ -0,0 +1,108 @@
+import math
+
+try:
+    import numpy
+except ImportError:  # In requirements.txt; without it matrices are computed in Python.
+    numpy = None
+
+EARTH_RADIUS_KM = 6371.0088
+# Cells computed per chunk of a distance matrix: 1M float64 cells is 8 MB.
+CHUNK_CELLS = 1_000_000
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """
+    Great-circle distance in kilometres between two points in degrees.
+    """
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(math.sqrt(a), 1.0))
+
+
+def available_backends():
+    return ("numpy", "python") if numpy is not None else ("python",)
+
+
+def _numpy_chunks(origins, destinations, rows):
+    origins = numpy.radians(numpy.asarray(origins, dtype=float).reshape(-1, 2))
+    destinations = numpy.radians(numpy.asarray(destinations, dtype=float).reshape(-1, 2))
+    lat2 = destinations[:, 0][numpy.newaxis, :]
+    lng2 = destinations[:, 1][numpy.newaxis, :]
+    cos_lat2 = numpy.cos(lat2)
+    for start in range(0, len(origins), rows):
+        lat1 = origins[start:start + rows, 0][:, numpy.newaxis]
+        lng1 = origins[start:start + rows, 1][:, numpy.newaxis]
+        a = (
+            numpy.sin((lat2 - lat1) / 2) ** 2
+            + numpy.cos(lat1) * cos_lat2 * numpy.sin((lng2 - lng1) / 2) ** 2
+        )
+        yield start, 2 * EARTH_RADIUS_KM * numpy.arcsin(numpy.sqrt(numpy.minimum(a, 1.0)))
+
+
+def _python_chunks(origins, destinations, rows):
+    # Per-destination terms are computed once instead of once per cell.
+    targets = [
+        (math.radians(lat), math.radians(lng), math.cos(math.radians(lat)))
+        for lat, lng in destinations
+    ]
+    sin, asin, sqrt = math.sin, math.asin, math.sqrt
+    diameter = 2 * EARTH_RADIUS_KM
+    for start in range(0, len(origins), rows):
+        block = []
+        for lat, lng in origins[start:start + rows]:
+            lat1, lng1 = math.radians(lat), math.radians(lng)
+            cos_lat1 = math.cos(lat1)
+            block.append(
+                [
+                    diameter
+                    * asin(
+                        min(
+                            sqrt(
+                                sin((lat2 - lat1) / 2) ** 2
+                                + cos_lat1 * cos_lat2 * sin((lng2 - lng1) / 2) ** 2
+                            ),
+                            1.0,
+                        )
+                    )
+                    for lat2, lng2, cos_lat2 in targets
+                ]
+            )
+        yield start, block
+
+
+def iter_distance_matrix(origins, destinations, backend=None, chunk_cells=CHUNK_CELLS):
+    """
+    Yield (first row, block) chunks of the haversine distance matrix (km)
+    from ``origins`` to ``destinations``, both sequences of (lat, lng).
+    Blocks hold whole rows and about ``chunk_cells`` cells, so memory stays
+    bounded however large the matrix is. They are NumPy arrays with the
+    "numpy" backend (the default when installed), lists of lists otherwise.
+    """
+    backend = backend or available_backends()[0]
+    if backend not in available_backends():
+        raise ValueError(f"Backend {backend!r} is not available.")
+    if not origins or not destinations:
+        return
+    rows = max(chunk_cells // len(destinations), 1)
+    chunks = _numpy_chunks if backend == "numpy" else _python_chunks
+    yield from chunks(origins, destinations, rows)
+
+
+def distance_matrix(origins, destinations, backend=None):
+    """
+    The full haversine distance matrix (km) as a list of rows.
+    """
+    matrix = []
+    for _, block in iter_distance_matrix(origins, destinations, backend):
+        matrix.extend(block.tolist() if numpy is not None and isinstance(block, numpy.ndarray) else block)
+    return matrix
+
+
+def eta_seconds(distance_km, speed_kmh):
+    """
+    Straight-line travel time at ``speed_kmh``.
+    """
+    return distance_km / speed_kmh * 3600
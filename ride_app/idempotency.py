@@ -0,0 +1,196 @@
+"""
+Idempotency-Key handling for write endpoints.
+
+A client that retries a write sends the same ``Idempotency-Key`` header as
+the first attempt. The first request to commit with a key stores its
+response; later requests with that key get the stored response back
+without being validated or executed again.
+"""
+
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyRecord
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+DEFAULT_OPTIONS = {
+    # Seconds a stored response is replayed for.
+    "TTL": 24 * 60 * 60,
+    # Expired records deleted per stored response.
+    "EVICT_BATCH_SIZE": 100,
+    # Retries, with doubling delays (seconds), of a keyed request rolled back
+    # because the database was locked by a concurrent write.
+    "LOCK_RETRIES": 3,
+    "LOCK_RETRY_DELAY": 0.05,
+}
+
+
+def get_options():
+    return {**DEFAULT_OPTIONS, **getattr(settings, "IDEMPOTENCY", {})}
+
+
+def _canonical_data(data):
+    # Form data is a QueryDict of lists; uploads count by name and size.
+    if hasattr(data, "lists"):
+        data = {key: values for key, values in data.lists()}
+    return json.dumps(
+        data,
+        sort_keys=True,
+        default=lambda value: [getattr(value, "name", None), getattr(value, "size", None)],
+    )
+
+
+def request_fingerprint(request):
+    """
+    sha256 of the method, path and parsed payload. The payload is hashed from
+    ``request.data`` rather than the raw body, which form parsing or CSRF
+    checks may already have consumed.
+    """
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(b"\0")
+    digest.update(request.get_full_path().encode())
+    digest.update(b"\0")
+    digest.update(_canonical_data(request.data).encode())
+    return digest.hexdigest()
+
+
+def evict_expired(batch_size=None):
+    """
+    Delete up to ``batch_size`` expired records, oldest first; returns the
+    number deleted.
+    """
+    if batch_size is None:
+        batch_size = get_options()["EVICT_BATCH_SIZE"]
+    expired = IdempotencyRecord.objects.filter(expires_at__lte=timezone.now()).order_by(
+        "expires_at"
+    )
+    pks = list(expired.values_list("pk", flat=True)[:batch_size])
+    if not pks:
+        return 0
+    return IdempotencyRecord.objects.filter(pk__in=pks).delete()[0]
+
+
+def _find(records, now):
+    return records.filter(expires_at__gt=now).first()
+
+
+def _replay(record, fingerprint):
+    if record.fingerprint != fingerprint:
+        return Response(
+            {"detail": f"{HEADER} was already used for a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    response = Response(json.loads(record.response), status=record.status_code)
+    response[REPLAYED_HEADER] = "true"
+    return response
+
+
+def _is_lock_contention(exc):
+    # SQLite: "database is locked"; PostgreSQL: "deadlock detected".
+    message = str(exc).lower()
+    return "locked" in message or "deadlock" in message
+
+
+def _in_progress():
+    response = Response(
+        {"detail": f"A request with this {HEADER} is in progress, retry later."},
+        status=status.HTTP_409_CONFLICT,
+    )
+    response["Retry-After"] = "1"
+    return response
+
+
+def idempotent(view_method):
+    """
+    Make a viewset write action honour the Idempotency-Key header.
+
+    The stored record is inserted in the same transaction as the action's
+    writes, so of two concurrent requests with one key only one commits;
+    the other fails on the unique (user, key) constraint and replays the
+    winner's response. Only successful (2xx) responses are stored: after an
+    error the client may retry with the same key.
+
+    Where the database reports the lock contention instead (SQLite without
+    IMMEDIATE transactions fails the loser with "database is locked"), the
+    rolled back request is retried up to LOCK_RETRIES times, by when the
+    winner has usually committed and is replayed; after that, or inside an
+    outer transaction that can't be retried, the answer is 409 with
+    Retry-After.
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return view_method(self, request, *args, **kwargs)
+        if not key or len(key) > IdempotencyRecord._meta.get_field("key").max_length:
+            return Response(
+                {"detail": f"{HEADER} must be 1 to 255 characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fingerprint = request_fingerprint(request)
+        options = get_options()
+        retries = 0 if transaction.get_connection().in_atomic_block else options["LOCK_RETRIES"]
+        for attempt in range(retries + 1):
+            try:
+                return _execute(view_method, self, request, args, kwargs, key, fingerprint)
+            except OperationalError as exc:
+                if not _is_lock_contention(exc):
+                    raise
+                if attempt == retries:
+                    return _in_progress()
+                time.sleep(options["LOCK_RETRY_DELAY"] * 2**attempt)
+
+    return wrapper
+
+
+def _execute(view_method, view, request, args, kwargs, key, fingerprint):
+    # One attempt at a keyed request, in one transaction with its record.
+    now = timezone.now()
+    records = IdempotencyRecord.objects.filter(id_user=request.user, key=key)
+    # Reads inside the transaction go to the primary (see db_router).
+    with transaction.atomic():
+        record = _find(records, now)
+        if record is not None:
+            return _replay(record, fingerprint)
+        records.filter(expires_at__lte=now).delete()
+        record = IdempotencyRecord(
+            id_user=request.user,
+            key=key,
+            fingerprint=fingerprint,
+            status_code=0,
+            expires_at=now + timedelta(seconds=get_options()["TTL"]),
+        )
+        try:
+            with transaction.atomic():
+                record.save(force_insert=True)
+        except IntegrityError:
+            # A concurrent request with this key committed first.
+            record = None
+        if record is not None:
+            response = view_method(view, request, *args, **kwargs)
+            if status.is_success(response.status_code):
+                record.status_code = response.status_code
+                record.response = json.dumps(response.data, cls=JSONEncoder)
+                record.save(update_fields=["status_code", "response"])
+            else:
+                record.delete()
+    if record is None:
+        # The failed insert pinned this thread's reads to the primary.
+        return _replay(records.get(), fingerprint)
+    evict_expired()
+    return response
@@ -0,0 +1,439 @@
+"""
+DB-backed background jobs.
+
+Views ``submit()`` a job and return at once; ``manage.py worker`` claims
+queued jobs and runs each one in a child process, so a slow report never
+holds up a web worker. Results are stored on the Job row and reused by
+later submissions of the same kind and parameters for RESULT_TTL seconds,
+except for kinds with side effects (``reuse_results=False``), which run
+again once the previous run finished.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Job, Ride, RideProjection
+from .projections import RideProjector
+from .retention import Purge
+
+logger = logging.getLogger("ride_app.jobs")
+
+DEFAULT_OPTIONS = {
+    # Seconds a finished result is reused for an identical submission.
+    "RESULT_TTL": 3600,
+    "MAX_ATTEMPTS": 3,
+    # A failed job is retried after RETRY_DELAY * attempts seconds.
+    "RETRY_DELAY": 30,
+    # Seconds a job may run before the worker kills it, unless its kind
+    # sets its own timeout.
+    "TIMEOUT": 600,
+}
+
+
+def get_options():
+    return {**DEFAULT_OPTIONS, **getattr(settings, "JOB_QUEUE", {})}
+
+
+class JobKind:
+    """
+    A registered job function. ``defaults`` lists the accepted parameters;
+    submitted values must have the JSON type of their default (an integer
+    is also accepted for a float) and nothing is coerced.
+    """
+
+    def __init__(self, name, func, defaults, content_type, extension, timeout, reuse_results):
+        self.name = name
+        self.func = func
+        self.defaults = defaults
+        self.content_type = content_type
+        self.extension = extension
+        self.timeout = timeout
+        self.reuse_results = reuse_results
+
+    def clean_params(self, params):
+        unknown = set(params) - set(self.defaults)
+        if unknown:
+            raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}.")
+        cleaned = dict(self.defaults)
+        for name, value in params.items():
+            default = self.defaults[name]
+            # bool is a subclass of int: true must not pass for 1, nor 1 for true.
+            if isinstance(default, bool) or isinstance(value, bool):
+                valid = type(value) is type(default)
+            elif isinstance(default, float):
+                valid = isinstance(value, (int, float))
+            else:
+                valid = isinstance(value, type(default))
+            if not valid:
+                raise ValueError(
+                    f"Invalid value for {name}: {value!r} (expected {_json_type(default)})."
+                )
+            cleaned[name] = type(default)(value)
+        return cleaned
+
+    def get_timeout(self):
+        return self.timeout or get_options()["TIMEOUT"]
+
+
+def _json_type(value):
+    if isinstance(value, bool):
+        return "a boolean"
+    if isinstance(value, int):
+        return "an integer"
+    if isinstance(value, float):
+        return "a number"
+    return "a string"
+
+
+JOB_KINDS = {}
+
+
+def register(
+    name,
+    defaults=None,
+    content_type="application/json",
+    extension="json",
+    timeout=None,
+    reuse_results=True,
+):
+    """
+    Register ``func(params, progress)`` as job kind ``name``. It returns the
+    result as text and may call ``progress(fraction)`` as it goes. Kinds
+    that change data pass ``reuse_results=False``: a recent result of the
+    same parameters says nothing about what a new run would do.
+    """
+
+    def decorator(func):
+        JOB_KINDS[name] = JobKind(
+            name, func, defaults or {}, content_type, extension, timeout, reuse_results
+        )
+        return func
+
+    return decorator
+
+
+def params_hash(kind, params):
+    canonical = json.dumps([kind, params], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def submit(kind, params=None, user=None):
+    """
+    Queue a ``kind`` job and return ``(job, created)``. A queued or running
+    job with the same parameters, or (for kinds that reuse results) one that
+    succeeded within RESULT_TTL, is returned instead of queueing a new one.
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind {kind!r}.")
+    job_kind = JOB_KINDS[kind]
+    params = job_kind.clean_params(params or {})
+    key = params_hash(kind, params)
+    reusable = Q(status__in=[Job.Status.QUEUED, Job.Status.RUNNING])
+    if job_kind.reuse_results:
+        fresh_since = timezone.now() - timedelta(seconds=get_options()["RESULT_TTL"])
+        reusable |= Q(status=Job.Status.SUCCEEDED, finished_at__gte=fresh_since)
+    # Two simultaneous first submissions may both queue a job; both run and
+    # later submissions reuse the newest result.
+    existing = Job.objects.filter(params_hash=key).filter(reusable).order_by("-id_job").first()
+    if existing is not None:
+        return existing, False
+    job = Job.objects.create(kind=kind, params=params, params_hash=key, created_by=user)
+    return job, True
+
+
+def job_timeout(kind):
+    job_kind = JOB_KINDS.get(kind)
+    return job_kind.get_timeout() if job_kind else get_options()["TIMEOUT"]
+
+
+def claim_job():
+    """
+    Mark the next due job as running and return it, or None if there is none.
+
+    Jobs still "running" past ``locked_until`` belonged to a worker that
+    died and are claimed again. Every state change is a conditional UPDATE
+    on (status, attempts), so concurrent workers never run a job twice and
+    a late result from a killed run can't overwrite a newer attempt.
+    """
+    now = timezone.now()
+    max_attempts = get_options()["MAX_ATTEMPTS"]
+    candidates = (
+        Job.objects.filter(
+            Q(status=Job.Status.QUEUED, run_after__lte=now)
+            | Q(status=Job.Status.RUNNING, locked_until__lt=now)
+        )
+        .order_by("run_after", "id_job")
+        .values_list("id_job", "kind", "status", "attempts")[:10]
+    )
+    for id_job, kind, status, attempts in candidates:
+        current = Job.objects.filter(id_job=id_job, status=status, attempts=attempts)
+        if status == Job.Status.RUNNING and attempts >= max_attempts:
+            current.update(
+                status=Job.Status.FAILED,
+                error="The worker running this job stopped responding.",
+                finished_at=now,
+                locked_until=None,
+            )
+            continue
+        claimed = current.update(
+            status=Job.Status.RUNNING,
+            attempts=attempts + 1,
+            progress=0,
+            started_at=now,
+            # Some slack over the timeout for the worker to notice and kill it.
+            locked_until=now + timedelta(seconds=job_timeout(kind) * 2),
+        )
+        if claimed:
+            return Job.objects.get(id_job=id_job)
+    return None
+
+
+def _running(job):
+    return Job.objects.filter(
+        id_job=job.id_job, status=Job.Status.RUNNING, attempts=job.attempts
+    )
+
+
+def run_job(job):
+    """
+    Run a claimed job in this process and record its result or failure.
+    Returns True on success.
+    """
+
+    def progress(fraction):
+        _running(job).update(progress=min(max(fraction, 0), 1))
+
+    try:
+        job_kind = JOB_KINDS[job.kind]
+        result = job_kind.func(job.params, progress)
+    except Exception:
+        logger.exception("Job %s (%s) failed", job.id_job, job.kind)
+        fail_job(job, traceback.format_exc())
+        return False
+    _running(job).update(
+        status=Job.Status.SUCCEEDED,
+        progress=1,
+        result=result,
+        content_type=job_kind.content_type,
+        error="",
+        finished_at=timezone.now(),
+        locked_until=None,
+    )
+    return True
+
+
+def fail_job(job, error):
+    """
+    Queue ``job`` for another attempt after a backoff, or mark it failed
+    once it has used MAX_ATTEMPTS.
+    """
+    options = get_options()
+    now = timezone.now()
+    if job.attempts < options["MAX_ATTEMPTS"]:
+        changes = {
+            "status": Job.Status.QUEUED,
+            "run_after": now + timedelta(seconds=options["RETRY_DELAY"] * job.attempts),
+        }
+    else:
+        changes = {"status": Job.Status.FAILED, "finished_at": now}
+    return _running(job).update(error=error, locked_until=None, **changes)
+
+
+def _execute(id_job):
+    # Entry point of a worker child process.
+    try:
+        run_job(Job.objects.get(id_job=id_job))
+    finally:
+        connections.close_all()
+
+
+class Worker:
+    """
+    Runs up to ``processes`` jobs at a time, each in a forked child process
+    that is killed when it exceeds its kind's timeout. With ``processes=0``
+    jobs run one at a time inside the worker itself, without timeouts.
+    """
+
+    def __init__(self, processes=2, poll_interval=1.0, log=None):
+        self.processes = processes
+        self.poll_interval = poll_interval
+        self.log = log or logger.info
+        self.context = multiprocessing.get_context("fork")
+        # id_job -> (process, job, deadline)
+        self.running = {}
+
+    def start(self, job):
+        self.log(f"Job {job.id_job} ({job.kind}) started, attempt {job.attempts}")
+        if not self.processes:
+            run_job(job)
+            return
+        # Children must open their own connections rather than share ours.
+        connections.close_all()
+        process = self.context.Process(target=_execute, args=(job.id_job,), daemon=True)
+        process.start()
+        self.running[job.id_job] = (process, job, time.monotonic() + job_timeout(job.kind))
+
+    def reap(self):
+        """
+        Forget finished children; kill those past their deadline and record
+        the timeout (or crash) so the job is retried.
+        """
+        for id_job, (process, job, deadline) in list(self.running.items()):
+            if process.is_alive():
+                if time.monotonic() < deadline:
+                    continue
+                process.terminate()
+                process.join()
+                self.log(f"Job {id_job} timed out")
+                fail_job(job, f"Timed out after {job_timeout(job.kind)} seconds.")
+            elif process.exitcode:
+                # run_job records its own failures; this is a crash or kill.
+                fail_job(job, f"Worker process exited with code {process.exitcode}.")
+            del self.running[id_job]
+
+    def run_once(self):
+        """
+        Reap children and start as many due jobs as there are free slots.
+        Returns the number of jobs started.
+        """
+        self.reap()
+        started = 0
+        while len(self.running) < max(self.processes, 1):
+            job = claim_job()
+            if job is None:
+                break
+            self.start(job)
+            started += 1
+        return started
+
+    def run(self, burst=False):
+        """
+        Process jobs until interrupted, or with ``burst`` until the queue is
+        empty and every started job has finished.
+        """
+        while True:
+            started = self.run_once()
+            if burst and not started and not self.running:
+                return
+            if not started:
+                time.sleep(self.poll_interval)
+
+
+@register("driver_report", defaults={"min_trip_seconds": 3600.0})
+def driver_report(params, progress):
+    """
+    Trips longer than ``min_trip_seconds`` per month and driver (the raw SQL
+    report in the README), from projections brought up to date first.
+    """
+    RideProjector().catch_up()
+    progress(0.5)
+    rows = (
+        RideProjection.objects.filter(trip_seconds__gt=params["min_trip_seconds"])
+        .annotate(month=TruncMonth("pickup_at"))
+        .values(
+            "month",
+            "id_ride__id_driver",
+            "id_ride__id_driver__first_name",
+            "id_ride__id_driver__last_name",
+        )
+        .annotate(trip_count=Count("pk"))
+        .order_by("month", "id_ride__id_driver")
+    )
+    report = [
+        {
+            "month": row["month"].strftime("%Y-%m"),
+            "id_driver": row["id_ride__id_driver"],
+            "driver": "{} {}".format(
+                row["id_ride__id_driver__first_name"],
+                row["id_ride__id_driver__last_name"][:1],
+            ).strip(),
+            "trip_count": row["trip_count"],
+        }
+        for row in rows
+    ]
+    return json.dumps(report)
+
+
+EXPORT_FIELDS = [
+    "id_ride",
+    "status",
+    "id_rider_id",
+    "id_driver_id",
+    "pickup_latitude",
+    "pickup_longitude",
+    "dropoff_latitude",
+    "dropoff_longitude",
+    "pickup_time",
+]
+
+
+@register(
+    "rides_export",
+    defaults={"status": "", "batch_size": 5000},
+    content_type="text/csv",
+    extension="csv",
+)
+def rides_export(params, progress):
+    """
+    All rides (or those with ``status``) as CSV, read in primary key order
+    one batch at a time.
+    """
+    queryset = Ride.objects.order_by("id_ride")
+    if params["status"]:
+        queryset = queryset.filter(status__iexact=params["status"])
+    total = queryset.count()
+    batch_size = max(params["batch_size"], 1)
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(EXPORT_FIELDS)
+    last_id, written = 0, 0
+    while True:
+        batch = list(queryset.filter(id_ride__gt=last_id).values_list(*EXPORT_FIELDS)[:batch_size])
+        if not batch:
+            break
+        writer.writerows(batch)
+        last_id = batch[-1][0]
+        written += len(batch)
+        progress(written / total)
+    return output.getvalue()
+
+
+@register(
+    "purge",
+    defaults={"ride_days": 0, "event_days": 0, "user_id": 0, "dry_run": True, "batch_size": 1000},
+    timeout=3600,
+    reuse_results=False,
+)
+def purge(params, progress):
+    """
+    Retention purge (see ride_app.retention) of rides picked up more than
+    ``ride_days`` ago, events older than ``event_days`` and the user
+    ``user_id``; 0 skips each. Only counts the rows unless ``dry_run`` is
+    false. The result lists the rows deleted (or to delete) per table.
+    """
+    now = timezone.now()
+    if not (params["ride_days"] or params["event_days"] or params["user_id"]):
+        raise ValueError("Nothing to purge.")
+    counts = Purge(
+        rides_before=now - timedelta(days=params["ride_days"]) if params["ride_days"] else None,
+        events_before=now - timedelta(days=params["event_days"]) if params["event_days"] else None,
+        user_ids=[params["user_id"]] if params["user_id"] else [],
+        batch_size=params["batch_size"],
+        dry_run=params["dry_run"],
+        progress=lambda done, total: progress(done / total if total else 1.0),
+    ).run()
+    return json.dumps({"dry_run": params["dry_run"], "deleted": counts})
@@ -0,0 +1,187 @@
+"""
+Traffic generation and reporting for ``manage.py load_test``.
+
+Each client process sends requests drawn from a weighted mix of endpoints
+with randomized, skewed parameters (most listings read the first pages, a
+few rides get most detail reads) and records the status, latency and
+X-Query-Count of every response.
+"""
+
+import http.client
+import json
+import math
+import random
+import time
+import uuid
+from urllib.parse import urlencode
+
+DEFAULT_MIX = {"list": 40, "filter": 20, "distance": 15, "detail": 20, "write": 5}
+STATUSES = ["en-route", "pickup", "dropoff"]
+# Seed data is spread around this point; distance orderings start near it.
+CENTER = (40.7128, -74.0060)
+
+
+def parse_mix(value):
+    """
+    Parse "list=40,detail=20" into {endpoint: weight}.
+    """
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown endpoint {name!r}, expected one of {', '.join(DEFAULT_MIX)}.")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise ValueError(f"Invalid weight for {name}: {weight!r}.")
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError("At least one endpoint needs a positive weight.")
+    return mix
+
+
+class TrafficGenerator:
+    """
+    Builds (endpoint, method, path, body) requests against seeded data:
+    ``ride_ids`` is the (first, last) id of the seeded rides.
+    """
+
+    def __init__(self, mix, ride_ids, seed=None):
+        self.rng = random.Random(seed)
+        self.endpoints = list(mix)
+        self.weights = [mix[name] for name in self.endpoints]
+        self.first_ride, self.last_ride = ride_ids
+
+    def page(self, page_size=10):
+        # Geometric: about 60% of listings stop at the first page.
+        pages = math.ceil((self.last_ride - self.first_ride + 1) / page_size)
+        return min(int(math.log(1 - self.rng.random()) / math.log(0.4)) + 1, pages)
+
+    def ride_id(self):
+        # Pareto: a small set of rides receives most detail reads.
+        rides = self.last_ride - self.first_ride + 1
+        return self.first_ride + (int(self.rng.paretovariate(1.16)) - 1) % rides
+
+    def coordinate(self):
+        return (
+            round(self.rng.gauss(CENTER[0], 0.05), 6),
+            round(self.rng.gauss(CENTER[1], 0.05), 6),
+        )
+
+    def list(self):
+        page_size = 50 if self.rng.random() < 0.2 else 10
+        params = {"page": self.page(page_size), "page_size": page_size}
+        return "GET", f"/rides/?{urlencode(params)}", None
+
+    def filter(self):
+        params = {"status": self.rng.choice(STATUSES)}
+        if self.rng.random() < 0.3:
+            params["rider_email"] = f"rider{self.rng.randrange(10)}"
+        if self.rng.random() < 0.2:
+            params["event_kind"] = self.rng.choice([1, 2, 3])
+        return "GET", f"/rides/?{urlencode(params)}", None
+
+    def distance(self):
+        lat, lng = self.coordinate()
+        params = {"ordering": "distance", "lat": lat, "lng": lng, "page": self.page()}
+        return "GET", f"/rides/?{urlencode(params)}", None
+
+    def detail(self):
+        return "GET", f"/rides/{self.ride_id()}/", None
+
+    def write(self):
+        return "PATCH", f"/rides/{self.ride_id()}/", {"status": self.rng.choice(STATUSES)}
+
+    def next_request(self):
+        endpoint = self.rng.choices(self.endpoints, self.weights)[0]
+        return (endpoint, *getattr(self, endpoint)())
+
+
+def run_client(host, port, token, mix, ride_ids, seed, requests=None, duration=None):
+    """
+    Send ``requests`` requests, or keep going for ``duration`` seconds.
+    Returns ([(endpoint, status, seconds, query count or None), ...], elapsed
+    seconds); status 0 means the request failed without a response.
+    """
+    generator = TrafficGenerator(mix, ride_ids, seed)
+    headers = {"Authorization": f"Token {token}", "Content-Type": "application/json"}
+    started_at = time.monotonic()
+    deadline = started_at + duration if duration else None
+    samples = []
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    while True:
+        if requests is not None and len(samples) >= requests:
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        endpoint, method, path, body = generator.next_request()
+        request_headers = dict(headers)
+        if method != "GET":
+            request_headers["Idempotency-Key"] = uuid.uuid4().hex
+        started = time.perf_counter()
+        try:
+            connection.request(
+                method, path, json.dumps(body) if body is not None else None, request_headers
+            )
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+            queries = response.getheader("X-Query-Count")
+            if response.getheader("Connection", "").lower() == "close":
+                connection.close()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            status, queries = 0, None
+        samples.append(
+            (
+                endpoint,
+                status,
+                time.perf_counter() - started,
+                int(queries) if queries is not None else None,
+            )
+        )
+    connection.close()
+    return samples, time.monotonic() - started_at
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an ascending list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, elapsed):
+    """
+    Per-endpoint and overall throughput, latency percentiles (ms), error
+    rate and query counts of ``samples`` collected over ``elapsed`` seconds.
+    """
+    groups = {}
+    for sample in samples:
+        groups.setdefault(sample[0], []).append(sample)
+    groups["total"] = list(samples)
+
+    report = {}
+    for endpoint, group in groups.items():
+        latencies = sorted(seconds * 1000 for _, _, seconds, _ in group)
+        errors = sum(1 for _, status, _, _ in group if not 200 <= status < 400)
+        queries = [count for _, _, _, count in group if count is not None]
+        report[endpoint] = {
+            "requests": len(group),
+            "throughput": len(group) / elapsed if elapsed else 0.0,
+            "error_rate": errors / len(group),
+            "statuses": {
+                str(status): sum(1 for _, s, _, _ in group if s == status)
+                for status in sorted({status for _, status, _, _ in group})
+            },
+            "p50_ms": percentile(latencies, 50),
+            "p90_ms": percentile(latencies, 90),
+            "p99_ms": percentile(latencies, 99),
+            "max_ms": latencies[-1],
+            "queries_mean": sum(queries) / len(queries) if queries else None,
+            "queries_max": max(queries) if queries else None,
+        }
+    return report
@@ -0,0 +1,48 @@
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from ride_app.working_set import ActiveRideSet, active_rides_queryset
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the working set of active rides and report its size and memory "
+        "per ride, next to the same rides loaded as model instances."
+    )
+
+    def handle(self, *args, **options):
+        ride_set = ActiveRideSet()
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            ride_set.load()
+            working_set_bytes = tracemalloc.get_traced_memory()[0] - baseline
+
+            baseline = tracemalloc.get_traced_memory()[0]
+            rides = list(active_rides_queryset())
+            model_bytes = tracemalloc.get_traced_memory()[0] - baseline
+            del rides
+        finally:
+            tracemalloc.stop()
+
+        metrics = ride_set.stats()
+        count = metrics["rides"]
+        self.stdout.write(
+            f"{count} active rides, {metrics['events']} recent events, {metrics['users']} users, "
+            f"{metrics['cells']} grid cells; loaded in {metrics['load_seconds']:.2f} s"
+        )
+        if not count:
+            return
+        self.stdout.write(
+            f"  estimated (getsizeof)  {metrics['total_bytes']:>12,} B  "
+            f"{metrics['bytes_per_ride']:>8,.0f} B/ride "
+            f"(records {metrics['ride_bytes']:,}, indexes {metrics['index_bytes']:,}, "
+            f"users {metrics['user_bytes']:,})"
+        )
+        self.stdout.write(
+            f"  working set (traced)   {working_set_bytes:>12,} B  {working_set_bytes / count:>8,.0f} B/ride"
+        )
+        self.stdout.write(
+            f"  model instances        {model_bytes:>12,} B  {model_bytes / count:>8,.0f} B/ride"
+        )
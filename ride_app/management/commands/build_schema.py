@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ride_app.schema import generate_schema
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the OpenAPI schema once (e.g. at deploy time) and write it to "
+        "OPENAPI_SCHEMA_FILE, from where StaticSchemaView serves it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Fail if the schema file differs from the live schema instead of writing it.",
+        )
+
+    def handle(self, *args, **options):
+        path = settings.OPENAPI_SCHEMA_FILE
+        schema = generate_schema()
+        if options["check"]:
+            try:
+                with open(path, "rb") as schema_file:
+                    current = schema_file.read()
+            except FileNotFoundError:
+                current = None
+            if current != schema:
+                raise CommandError(f"{path} is out of date, run manage.py build_schema.")
+            self.stdout.write(f"{path} is up to date.")
+            return
+
+        with open(path, "wb") as schema_file:
+            schema_file.write(schema)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {path}"))
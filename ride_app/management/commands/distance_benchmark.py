@@ -0,0 +1,63 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ride_app import geo
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure haversine distance matrix throughput of each available "
+        "backend (NumPy, pure Python) on random points."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--origins", type=int, default=10_000)
+        parser.add_argument("--destinations", type=int, default=10_000)
+        parser.add_argument("--chunk-cells", type=int, default=geo.CHUNK_CELLS)
+        parser.add_argument(
+            "--backend",
+            action="append",
+            dest="backends",
+            choices=["numpy", "python"],
+            help="Backend to measure; repeat for several. Defaults to all available.",
+        )
+        parser.add_argument(
+            "--python-max-cells",
+            type=int,
+            default=2_000_000,
+            help="Pure Python runs stop after this many cells and report the rate so far.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        backends = options["backends"] or geo.available_backends()
+        unavailable = set(backends) - set(geo.available_backends())
+        if unavailable:
+            raise CommandError(f"Not available: {', '.join(sorted(unavailable))} (is NumPy installed?)")
+
+        rng = random.Random(options["seed"])
+
+        def points(count):
+            return [(rng.uniform(40.5, 40.9), rng.uniform(-74.3, -73.7)) for _ in range(count)]
+
+        origins, destinations = points(options["origins"]), points(options["destinations"])
+        total = len(origins) * len(destinations)
+        self.stdout.write(f"{len(origins)} x {len(destinations)} matrix, {total:,} cells")
+        for backend in backends:
+            limit = options["python_max_cells"] if backend == "python" else None
+            cells = 0
+            started = time.perf_counter()
+            for _, block in geo.iter_distance_matrix(
+                origins, destinations, backend, chunk_cells=options["chunk_cells"]
+            ):
+                cells += len(block) * len(destinations)
+                if limit is not None and cells >= limit:
+                    break
+            elapsed = time.perf_counter() - started
+            rate = cells / elapsed
+            note = "" if cells == total else f" (first {cells:,} cells; full matrix ~{total / rate:.1f} s)"
+            self.stdout.write(
+                f"  {backend:<8}{elapsed:8.2f} s  {rate / 1e6:8.2f} M cells/s{note}"
+            )
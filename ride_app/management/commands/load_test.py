@@ -0,0 +1,206 @@
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ride_app.loadtest import DEFAULT_MIX, parse_mix, run_client, summarize
+
+# Runs in a separate interpreter against its own SQLite file: migrates and
+# seeds the database, then serves the app with Django's threaded WSGI
+# server and prints {"port", "token", "ride_ids"} as JSON.
+SERVER_SCRIPT = """
+import json, random, sys
+from datetime import timedelta
+import django
+django.setup()
+from django.core.management import call_command
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from ride_app.loadtest import CENTER, STATUSES
+from ride_app.models import Ride, RideEvent, User
+
+rides, seed = int(sys.argv[1]), int(sys.argv[2])
+call_command("migrate", verbosity=0)
+rng = random.Random(seed)
+admin, _ = User.objects.get_or_create(username="loadtest-admin", defaults={"role": User.Role.ADMIN})
+token, _ = Token.objects.get_or_create(user=admin)
+if not User.objects.filter(username="rider0").exists():
+    User.objects.bulk_create(
+        User(username=f"rider{n}", email=f"rider{n}@example.com", role=User.Role.RIDER)
+        for n in range(max(rides // 20, 10))
+    )
+users = list(User.objects.values_list("pk", flat=True))
+existing = Ride.objects.count()
+now = timezone.now()
+batch = [
+    Ride(
+        status=rng.choice(STATUSES),
+        id_rider_id=rng.choice(users),
+        id_driver_id=rng.choice(users),
+        pickup_latitude=rng.gauss(CENTER[0], 0.05),
+        pickup_longitude=rng.gauss(CENTER[1], 0.05),
+        dropoff_latitude=rng.gauss(CENTER[0], 0.05),
+        dropoff_longitude=rng.gauss(CENTER[1], 0.05),
+        pickup_time=now - timedelta(minutes=rng.randrange(60 * 24 * 30)),
+    )
+    for _ in range(max(rides - existing, 0))
+]
+for start in range(0, len(batch), 1000):
+    created = Ride.objects.bulk_create(batch[start:start + 1000])
+    RideEvent.objects.bulk_create(
+        RideEvent(
+            id_ride=ride,
+            description=f"Status changed to {ride.status}",
+            event_kind=RideEvent.kind_for_description(f"Status changed to {ride.status}"),
+            created_at=now - timedelta(minutes=rng.randrange(60 * 48)),
+        )
+        for ride in created
+    )
+ride_ids = Ride.objects.order_by("pk").values_list("pk", flat=True)
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+server = ThreadedWSGIServer(("127.0.0.1", 0), QuietHandler)
+server.set_app(get_wsgi_application())
+print(json.dumps({
+    "port": server.server_address[1],
+    "token": token.key,
+    "ride_ids": [ride_ids.first(), ride_ids.last()],
+}), flush=True)
+server.serve_forever()
+"""
+
+COLUMNS = (
+    ("requests", "{:>8}"),
+    ("throughput", "{:>9.1f}"),
+    ("error_rate", "{:>7.1%}"),
+    ("p50_ms", "{:>8.1f}"),
+    ("p90_ms", "{:>8.1f}"),
+    ("p99_ms", "{:>8.1f}"),
+    ("max_ms", "{:>8.1f}"),
+    ("queries_mean", "{:>8.1f}"),
+    ("queries_max", "{:>7}"),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the ride API: serve it from a local WSGI server on a seeded "
+        "SQLite database and drive a mix of list, filter, distance, detail and "
+        "write traffic from several client processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=4, help="Client processes.")
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument("--duration", type=float, default=None, metavar="SECONDS")
+        group.add_argument("--requests", type=int, default=None, help="Requests per client process.")
+        parser.add_argument(
+            "--mix",
+            type=parse_mix,
+            default=DEFAULT_MIX,
+            help="Endpoint weights, e.g. list=40,filter=20,distance=15,detail=20,write=5.",
+        )
+        parser.add_argument("--rides", type=int, default=2000, help="Rides to seed.")
+        parser.add_argument(
+            "--database",
+            help="SQLite file to use (and keep); a temporary one by default.",
+        )
+        parser.add_argument(
+            "--settings-module",
+            default=os.environ.get("DJANGO_SETTINGS_MODULE"),
+            help="Settings the server runs with, e.g. ride_core.settings_production.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+
+    def start_server(self, database, options):
+        environment = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": options["settings_module"],
+            "DB_NAME": database,
+            "ALLOWED_HOSTS": "127.0.0.1,localhost",
+            # Measure capacity, not the rate limits; X-Query-Count needs the
+            # (non-strict) query analysis middleware.
+            "THROTTLE_ENABLED": "False",
+            "QUERY_ANALYSIS": "True",
+            "QUERY_ANALYSIS_STRICT": "False",
+        }
+        environment.pop("DB_REPLICAS", None)
+        server = subprocess.Popen(
+            [sys.executable, "-c", SERVER_SCRIPT, str(options["rides"]), str(options["seed"])],
+            cwd=settings.BASE_DIR,
+            env=environment,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        line = server.stdout.readline()
+        if not line:
+            server.wait()
+            raise CommandError(f"The server exited with code {server.returncode}.")
+        return server, json.loads(line)
+
+    def handle(self, *args, **options):
+        if options["duration"] is None and options["requests"] is None:
+            options["duration"] = 10.0
+        with tempfile.TemporaryDirectory() as directory:
+            database = options["database"] or str(Path(directory) / "loadtest.sqlite3")
+            server, info = self.start_server(database, options)
+            try:
+                arguments = [
+                    (
+                        "127.0.0.1",
+                        info["port"],
+                        info["token"],
+                        options["mix"],
+                        info["ride_ids"],
+                        options["seed"] + number,
+                        options["requests"],
+                        options["duration"],
+                    )
+                    for number in range(options["processes"])
+                ]
+                with multiprocessing.get_context("spawn").Pool(options["processes"]) as pool:
+                    results = pool.starmap(run_client, arguments)
+            finally:
+                server.terminate()
+                server.wait()
+
+        # Clients start at slightly different times; throughput is over the
+        # longest-running one.
+        elapsed = max(client_elapsed for _, client_elapsed in results)
+        report = summarize([sample for samples, _ in results for sample in samples], elapsed)
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"{options['processes']} client processes, {elapsed:.1f} s, "
+            f"{options['rides']} seeded rides"
+        )
+        header = f"{'endpoint':<10}{'requests':>8}{'req/s':>9}{'errors':>7}"
+        header += f"{'p50 ms':>8}{'p90 ms':>8}{'p99 ms':>8}{'max ms':>8}{'queries':>8}{'max q':>7}"
+        self.stdout.write(header)
+        for endpoint, row in report.items():
+            cells = [
+                "-".rjust(len(fmt.format(0))) if row[name] is None else fmt.format(row[name])
+                for name, fmt in COLUMNS
+            ]
+            self.stdout.write(f"{endpoint:<10}" + "".join(cells))
+        failed = {
+            endpoint: row["statuses"]
+            for endpoint, row in report.items()
+            if row["error_rate"] and endpoint != "total"
+        }
+        for endpoint, statuses in failed.items():
+            self.stdout.write(self.style.WARNING(f"{endpoint}: responses by status {statuses}"))
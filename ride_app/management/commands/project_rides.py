@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ride_app.projections import RideProjector
+
+
+class Command(BaseCommand):
+    help = (
+        "Bring ride projections up to date with the RideEvent log, from the "
+        "last checkpoint or (--replay) from scratch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--replay", action="store_true", help="Rebuild all projections.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--follow",
+            type=float,
+            metavar="SECONDS",
+            help="Keep running, catching up every SECONDS.",
+        )
+
+    def handle(self, *args, **options):
+        projector = RideProjector(batch_size=options["batch_size"])
+
+        def progress(applied):
+            self.stdout.write(f"  {applied} events applied (at {projector.position()})")
+
+        if options["replay"]:
+            applied = projector.replay(progress=progress)
+        else:
+            applied = projector.catch_up(progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"Applied {applied} events."))
+
+        while options["follow"]:
+            time.sleep(options["follow"])
+            applied = projector.catch_up()
+            if applied:
+                self.stdout.write(f"Applied {applied} events.")
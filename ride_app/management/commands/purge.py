@@ -0,0 +1,82 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ride_app.retention import COUNTED, Purge, retention_cutoffs
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete old rides and events, or users with all their rides, in "
+        "bounded batches of set-based deletes instead of through the ORM "
+        "collector."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rides-older-than", type=int, metavar="DAYS", help="Rides picked up before then."
+        )
+        parser.add_argument(
+            "--events-older-than", type=int, metavar="DAYS", help="Events created before then."
+        )
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            default=[],
+            metavar="ID",
+            help="A user to delete with all their rides; repeat for several.",
+        )
+        parser.add_argument(
+            "--enforce",
+            action="store_true",
+            help="Use the RETENTION settings (RIDE_DAYS, EVENT_DAYS) for the ages not given.",
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--pause", type=float, default=None, metavar="SECONDS", help="Wait between batches."
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only count the rows.")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        cutoffs = [
+            now - timedelta(days=options[name]) if options[name] is not None else None
+            for name in ("rides_older_than", "events_older_than")
+        ]
+        if options["enforce"]:
+            cutoffs = [
+                cutoff if cutoff is not None else default
+                for cutoff, default in zip(cutoffs, retention_cutoffs(now))
+            ]
+        rides_before, events_before = cutoffs
+        if rides_before is None and events_before is None and not options["user_ids"]:
+            raise CommandError("Nothing to purge: give ages or users, or configure RETENTION.")
+
+        last_report = 0.0
+
+        def progress(done, total):
+            nonlocal last_report
+            if time.monotonic() - last_report >= 1 or done >= total:
+                last_report = time.monotonic()
+                self.stdout.write(f"  {done:,}/{total:,} rides, events and users purged")
+
+        try:
+            purge = Purge(
+                rides_before=rides_before,
+                events_before=events_before,
+                user_ids=options["user_ids"],
+                batch_size=options["batch_size"],
+                pause=options["pause"],
+                dry_run=options["dry_run"],
+                progress=progress,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        counts = purge.run()
+        self.stdout.write("Would delete:" if options["dry_run"] else "Deleted:")
+        for name in COUNTED:
+            self.stdout.write(f"  {name:<20}{counts[name]:>12,}")
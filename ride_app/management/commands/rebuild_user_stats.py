@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from ride_app import stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the per-user daily stats from rides and events, e.g. after "
+        "bulk imports or deletes that bypassed the model signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rows = stats.rebuild(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} daily stats rows."))
@@ -0,0 +1,127 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter so that nothing is imported yet. Prints the
+# elapsed time of each startup phase as JSON on the last line of stdout.
+STARTUP_SCRIPT = """
+import json, os, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+app_loaded = time.perf_counter()
+from django.conf import settings
+from django.test import RequestFactory
+# Let the request reach the view whatever ALLOWED_HOSTS says.
+settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, "testserver"]
+request = RequestFactory().get(sys.argv[1])
+response = application.get_response(request)
+first_request = time.perf_counter()
+print(json.dumps({
+    "setup_ms": (setup_done - start) * 1000,
+    "wsgi_ms": (app_loaded - setup_done) * 1000,
+    "first_request_ms": (first_request - app_loaded) * 1000,
+    "total_ms": (first_request - start) * 1000,
+    "status": response.status_code,
+}))
+"""
+
+
+def parse_importtime(output):
+    """
+    Parse ``python -X importtime`` output into {top-level package: cumulative us},
+    counting only the outermost import of each package.
+    """
+    packages = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented below the import that caused them.
+        if name.startswith("   "):
+            continue
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(cumulative)
+    return packages
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure worker cold start: per-package import time and the time from "
+        "interpreter start to the first served request, per settings module."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--settings-module",
+            action="append",
+            dest="settings_modules",
+            help="Settings module to measure; repeat to compare. Defaults to the current one.",
+        )
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per settings module.")
+        parser.add_argument("--top", type=int, default=15, help="Packages to list.")
+        parser.add_argument("--path", default="/rides/", help="Path of the first request.")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+
+    def measure(self, settings_module, path, repeat):
+        environment = {**os.environ, "DJANGO_SETTINGS_MODULE": settings_module}
+        runs = []
+        packages = {}
+        for _ in range(repeat):
+            completed = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT, path],
+                cwd=settings.BASE_DIR,
+                env=environment,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+            for package, microseconds in parse_importtime(completed.stderr).items():
+                packages.setdefault(package, []).append(microseconds)
+
+        phases = {
+            phase: statistics.median(run[phase] for run in runs)
+            for phase in ("setup_ms", "wsgi_ms", "first_request_ms", "total_ms")
+        }
+        return {
+            "settings": settings_module,
+            "status": runs[-1]["status"],
+            **phases,
+            "imports_ms": {
+                package: statistics.median(values) / 1000
+                for package, values in packages.items()
+            },
+        }
+
+    def handle(self, *args, **options):
+        settings_modules = options["settings_modules"] or [os.environ["DJANGO_SETTINGS_MODULE"]]
+        reports = [
+            self.measure(module, options["path"], options["repeat"])
+            for module in settings_modules
+        ]
+        if options["json"]:
+            self.stdout.write(json.dumps(reports, indent=2))
+            return
+
+        for report in reports:
+            self.stdout.write(self.style.MIGRATE_HEADING(report["settings"]))
+            self.stdout.write(
+                f"  django.setup()   {report['setup_ms']:8.1f} ms\n"
+                f"  WSGI app load    {report['wsgi_ms']:8.1f} ms\n"
+                f"  first request    {report['first_request_ms']:8.1f} ms "
+                f"(GET {options['path']} -> {report['status']})\n"
+                f"  total            {report['total_ms']:8.1f} ms"
+            )
+            self.stdout.write("  slowest imports:")
+            slowest = sorted(report["imports_ms"].items(), key=lambda item: -item[1])
+            for package, milliseconds in slowest[: options["top"]]:
+                self.stdout.write(f"    {package:<30} {milliseconds:8.1f} ms")
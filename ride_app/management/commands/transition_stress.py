@@ -0,0 +1,178 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a separate interpreter against its own SQLite file (production
+# database profile): seeds en-route rides, then has every ride walked
+# through its statuses by ``contenders`` threads at once via
+# POST /rides/{id}/transition/, each retrying from the status a 409
+# reports. Prints the outcome and any invariant violations as JSON.
+STRESS_SCRIPT = """
+import json, random, sys, threading, time
+import django
+django.setup()
+from django.core.management import call_command
+from django.db import connections
+from django.utils import timezone
+from rest_framework.test import APIClient
+from ride_app.models import STATUS_TRANSITIONS, Ride, RideEvent, User, parse_status
+
+threads, rides, contenders, seed = map(int, sys.argv[1:5])
+call_command("migrate", verbosity=0)
+admin = User.objects.create(username="stress-admin", role=User.Role.ADMIN)
+Ride.objects.bulk_create(
+    Ride(
+        status="en-route",
+        id_rider=admin,
+        id_driver=admin,
+        pickup_latitude=40.7,
+        pickup_longitude=-74.0,
+        dropoff_latitude=40.8,
+        dropoff_longitude=-73.9,
+        pickup_time=timezone.now(),
+    )
+    for _ in range(rides)
+)
+ride_ids = list(Ride.objects.order_by("pk").values_list("pk", flat=True))
+# Threads of a group all walk the group's rides in the same order, so each
+# ride gets ``contenders`` concurrent transitions.
+groups = max(threads // contenders, 1)
+barrier = threading.Barrier(threads)
+lock = threading.Lock()
+outcomes = []
+
+
+def walk(number):
+    rng = random.Random(seed + number)
+    group = number % groups
+    client = APIClient()
+    client.force_authenticate(admin)
+    mine = []
+    barrier.wait()
+    for ride_id in ride_ids[group::groups]:
+        current = "en-route"
+        while STATUS_TRANSITIONS[current]:
+            target = "cancelled" if rng.random() < 0.1 else STATUS_TRANSITIONS[current][0]
+            body = {"status": target}
+            if rng.random() < 0.5:
+                body["expected_status"] = current
+            response = client.post(f"/rides/{ride_id}/transition/", body, format="json")
+            mine.append((ride_id, target, response.status_code))
+            if response.status_code == 200:
+                current = target
+            elif response.status_code == 409:
+                current = response.data["status"]
+            else:
+                break
+    connections.close_all()
+    with lock:
+        outcomes.extend(mine)
+
+
+started = time.monotonic()
+workers = [threading.Thread(target=walk, args=(number,)) for number in range(threads)]
+for worker in workers:
+    worker.start()
+for worker in workers:
+    worker.join()
+elapsed = time.monotonic() - started
+
+violations = []
+succeeded = {}
+for ride_id, target, code in outcomes:
+    if code == 200:
+        succeeded.setdefault(ride_id, []).append(target)
+events = {}
+for ride_id, description in RideEvent.objects.order_by("pk").values_list("id_ride_id", "description"):
+    events.setdefault(ride_id, []).append(parse_status(description))
+for ride_id, status in Ride.objects.values_list("pk", "status"):
+    path = events.get(ride_id, [])
+    if sorted(path) != sorted(succeeded.get(ride_id, [])):
+        violations.append(f"ride {ride_id}: events {path} but transitions {succeeded.get(ride_id)}")
+    if not path or path[-1] != status:
+        violations.append(f"ride {ride_id}: status {status!r} after events {path}")
+    for before, after in zip(["en-route"] + path, path):
+        if after not in STATUS_TRANSITIONS[before]:
+            violations.append(f"ride {ride_id}: {before} -> {after}")
+    if STATUS_TRANSITIONS[status]:
+        violations.append(f"ride {ride_id}: left in {status!r}")
+
+codes = [code for _, _, code in outcomes]
+print(json.dumps({
+    "requests": len(codes),
+    "succeeded": codes.count(200),
+    "conflicts": codes.count(409),
+    "errors": len(codes) - codes.count(200) - codes.count(409),
+    "seconds": elapsed,
+    "violations": violations,
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress POST /rides/{id}/transition/ with many concurrent transitions "
+        "on the same and different rides against a temporary SQLite database, "
+        "and check that no transition was lost or applied twice."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--rides", type=int, default=200)
+        parser.add_argument(
+            "--contenders", type=int, default=4, help="Threads transitioning each ride at once."
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            environment = {
+                **os.environ,
+                "DB_NAME": str(Path(directory) / "transitions.sqlite3"),
+                "DB_PROFILE": "production",
+                "ALLOWED_HOSTS": "testserver",
+                "THROTTLE_ENABLED": "False",
+                "MAX_CONCURRENT_REQUESTS": "0",
+            }
+            environment.pop("DB_REPLICAS", None)
+            process = subprocess.run(
+                [
+                    sys.executable,
+                    "-c",
+                    STRESS_SCRIPT,
+                    str(options["threads"]),
+                    str(options["rides"]),
+                    str(max(options["contenders"], 1)),
+                    str(options["seed"]),
+                ],
+                cwd=settings.BASE_DIR,
+                env=environment,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+        if process.returncode:
+            raise CommandError(
+                f"The stress run exited with code {process.returncode}:\n{process.stderr[-2000:]}"
+            )
+        report = json.loads(process.stdout.strip().splitlines()[-1])
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(
+                f"{report['requests']} transitions in {report['seconds']:.1f} s "
+                f"({report['requests'] / report['seconds']:.0f}/s): {report['succeeded']} applied, "
+                f"{report['conflicts']} conflicts (409), {report['errors']} errors, "
+                f"{len(report['violations'])} violations"
+            )
+            for violation in report["violations"][:20]:
+                self.stdout.write(self.style.ERROR(f"  {violation}"))
+        if report["errors"] or report["violations"]:
+            raise CommandError("Transitions were lost, duplicated or failed.")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from ride_app.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs (reports, exports), each in a child "
+        "process with a timeout, retrying failures."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=2,
+            help="Jobs to run at once; 0 runs them in this process, without timeouts.",
+        )
+        parser.add_argument("--poll-interval", type=float, default=1.0, metavar="SECONDS")
+        parser.add_argument(
+            "--burst", action="store_true", help="Exit once the queue is empty."
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            processes=options["processes"],
+            poll_interval=options["poll_interval"],
+            log=self.stdout.write,
+        )
+        try:
+            worker.run(burst=options["burst"])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping; running jobs are retried by the next worker.")
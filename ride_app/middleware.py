@@ -0,0 +1,142 @@
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+
+from .compression import compress, compress_stream, negotiate_encoding
+from .db_router import unpin
+from .query_analysis import analyze_queries, get_options
+from .throttling import ConcurrencyLimiter
+
+
+class ReplicaPinMiddleware:
+    """
+    Scope ReadReplicaRouter's read-your-writes pin to the request: a worker
+    thread that served a write goes back to reading from the replicas for
+    the next request instead of staying on the primary.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        unpin()
+        try:
+            return self.get_response(request)
+        finally:
+            unpin()
+
+
+class QueryAnalysisMiddleware:
+    """
+    Fingerprint the SQL run by each request, log slow queries and repeated
+    fingerprints (N+1) and, in strict mode, fail requests over their budget.
+
+    Views declare budgets per action with a ``query_budgets`` mapping, e.g.
+    ``query_budgets = {"list": 3}`` on RideViewSet.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        options = get_options()
+        if not options["ENABLED"]:
+            return self.get_response(request)
+
+        request.query_budget = None
+        label = f"{request.method} {request.path}"
+        # The budget is only known once the view has been resolved, so the
+        # analyzer reads it lazily from the request in process_view().
+        with analyze_queries(strict=options["STRICT"], label=label) as analyzer:
+            request.query_analyzer = analyzer
+            response = self.get_response(request)
+            analyzer.budget = request.query_budget
+        response["X-Query-Count"] = str(analyzer.count)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not hasattr(request, "query_analyzer"):
+            return None
+        view_class = getattr(view_func, "cls", None)
+        budgets = getattr(view_class, "query_budgets", None)
+        if budgets:
+            actions = getattr(view_func, "actions", None) or {}
+            action = actions.get(request.method.lower())
+            request.query_budget = budgets.get(action)
+        return None
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Shed load with 503 + Retry-After once MAX_CONCURRENT_REQUESTS requests
+    are already in flight in this worker, instead of queueing them until the
+    database runs out of connections. Disabled when the limit is 0.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limiter = ConcurrencyLimiter()
+
+    def __call__(self, request):
+        limit = getattr(settings, "MAX_CONCURRENT_REQUESTS", 0)
+        if not limit:
+            return self.get_response(request)
+
+        timeout = getattr(settings, "CONCURRENCY_QUEUE_TIMEOUT", 0)
+        if not self.limiter.acquire(limit, timeout):
+            response = JsonResponse(
+                {"detail": "Server is busy, please retry later."}, status=503
+            )
+            response["Retry-After"] = str(getattr(settings, "CONCURRENCY_RETRY_AFTER", 1))
+            return response
+        try:
+            return self.get_response(request)
+        finally:
+            self.limiter.release()
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with Brotli (when installed) or gzip, whichever the
+    client prefers, skipping bodies under COMPRESSION_MIN_SIZE bytes.
+    Streaming responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header("Content-Encoding"):
+            return response
+        min_size = getattr(settings, "COMPRESSION_MIN_SIZE", 1024)
+        if not response.streaming and len(response.content) < min_size:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = negotiate_encoding(request.headers.get("Accept-Encoding", ""))
+        if encoding is None:
+            return response
+
+        level = getattr(settings, "COMPRESSION_BROTLI_QUALITY", 5)
+        if response.streaming:
+            if response.is_async:
+                return response
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding, level
+            )
+            # The compressed size is unknown until the stream is consumed.
+            del response.headers["Content-Length"]
+        else:
+            compressed = compress(response.content, encoding, level)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # The body changed, so a strong ETag must become weak (RFC 9110 8.8.1).
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.6 on 2026-10-19 18:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ride_app', '0002_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectionCheckpoint',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('position', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RideProjection',
+            fields=[
+                ('id_ride', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='projection', serialize=False, to='ride_app.ride')),
+                ('status', models.CharField(blank=True, max_length=50)),
+                ('timeline', models.JSONField(default=list)),
+                ('pickup_at', models.DateTimeField(null=True)),
+                ('dropoff_at', models.DateTimeField(null=True)),
+                ('trip_seconds', models.FloatField(null=True)),
+                ('event_count', models.PositiveIntegerField(default=0)),
+                ('last_event_id', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ride_app', '0003_ride_projection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rideevent',
+            name='event_kind',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Other'), (1, 'Status changed to en-route'), (2, 'Status changed to pickup'), (3, 'Status changed to dropoff'), (4, 'Status changed to cancelled')], default=0),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+STATUS_KINDS = {
+    "en-route": 1,
+    "pickup": 2,
+    "dropoff": 3,
+    "cancelled": 4,
+}
+
+
+def populate_event_kind(apps, schema_editor):
+    # One set-based UPDATE per kind instead of parsing every row in Python;
+    # each matches on the indexed description column.
+    RideEvent = apps.get_model("ride_app", "RideEvent")
+    db_alias = schema_editor.connection.alias
+    for status, kind in STATUS_KINDS.items():
+        RideEvent.objects.using(db_alias).filter(
+            description=f"Status changed to {status}"
+        ).update(event_kind=kind)
+
+
+def clear_event_kind(apps, schema_editor):
+    RideEvent = apps.get_model("ride_app", "RideEvent")
+    RideEvent.objects.using(schema_editor.connection.alias).update(event_kind=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ride_app", "0004_rideevent_event_kind"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_event_kind, clear_event_kind),
+        # Built after the backfill so the UPDATEs don't maintain it row by row.
+        migrations.AddIndex(
+            model_name="rideevent",
+            index=models.Index(
+                fields=["event_kind", "created_at"], name="ride_app_ri_event_k_2b8d4a_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-19 18:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ride_app', '0007_idempotency_record'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('rider', 'Rider'), ('driver', 'Driver')], max_length=10)),
+                ('date', models.DateField()),
+                ('ride_count', models.IntegerField(default=0)),
+                ('distance_km', models.FloatField(default=0)),
+                ('trip_count', models.IntegerField(default=0)),
+                ('trip_seconds', models.FloatField(default=0)),
+                ('id_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('id_user', 'role', 'date'), name='unique_user_daily_stats')],
+            },
+        ),
+    ]
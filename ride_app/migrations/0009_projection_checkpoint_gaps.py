@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ride_app', '0008_user_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectioncheckpoint',
+            name='gaps',
+            field=models.JSONField(default=list),
+        ),
+    ]
@@ -36,17 +36,221 @@ class Ride(models.Model):
     dropoff_longitude = models.FloatField()
     pickup_time = models.DateTimeField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["pickup_time"]),
+            models.Index(fields=["status"]),
+        ]
+
     def __str__(self):
         return f"Ride {self.id_ride}"
 
 
+STATUS_CHANGE_PREFIX = "Status changed to "
+
+
+def parse_status(description):
+    """
+    Return the new status of a "Status changed to <status>" event, else None.
+    """
+    if description.startswith(STATUS_CHANGE_PREFIX):
+        return description[len(STATUS_CHANGE_PREFIX):].strip() or None
+    return None
+
+
 class RideEvent(models.Model):
+    class Kind(models.IntegerChoices):
+        OTHER = 0, "Other"
+        EN_ROUTE = 1, "Status changed to en-route"
+        PICKUP = 2, "Status changed to pickup"
+        DROPOFF = 3, "Status changed to dropoff"
+        CANCELLED = 4, "Status changed to cancelled"
+
     id_ride_event = models.AutoField(primary_key=True)
     id_ride = models.ForeignKey(
         Ride, related_name="ride_events", on_delete=models.CASCADE
     )
     description = models.CharField(max_length=255)
+    # Derived from the description on save() unless set explicitly.
+    event_kind = models.PositiveSmallIntegerField(
+        choices=Kind.choices, default=Kind.OTHER
+    )
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"]),
+            # Recent events of a ride (RideViewSet's 24 hour prefetch).
+            models.Index(fields=["id_ride", "created_at"]),
+            models.Index(fields=["description"]),
+            models.Index(fields=["event_kind", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"RideEvent {self.id_ride_event} for Ride {self.id_ride_id}"
+
+    @classmethod
+    def kind_for_description(cls, description):
+        return STATUS_KINDS.get(parse_status(description), cls.Kind.OTHER)
+
+    def save(self, *args, **kwargs):
+        if self.event_kind == self.Kind.OTHER:
+            self.event_kind = self.kind_for_description(self.description)
+        super().save(*args, **kwargs)
+
+
+# Status -> event kind of the "Status changed to <status>" event, and back.
+STATUS_KINDS = {
+    "en-route": RideEvent.Kind.EN_ROUTE,
+    "pickup": RideEvent.Kind.PICKUP,
+    "dropoff": RideEvent.Kind.DROPOFF,
+    "cancelled": RideEvent.Kind.CANCELLED,
+}
+KIND_STATUSES = {kind: status for status, kind in STATUS_KINDS.items()}
+# Statuses a ride may move to from each status (POST /rides/{id}/transition/).
+STATUS_TRANSITIONS = {
+    "en-route": ("pickup", "cancelled"),
+    "pickup": ("dropoff", "cancelled"),
+    "dropoff": (),
+    "cancelled": (),
+}
+
+
+class RideProjection(models.Model):
+    """
+    Per-ride state folded from the ride's RideEvents by
+    ride_app.projections.RideProjector; read it instead of scanning events.
+    """
+
+    id_ride = models.OneToOneField(
+        Ride, primary_key=True, related_name="projection", on_delete=models.CASCADE
+    )
+    status = models.CharField(max_length=50, blank=True)
+    # [[status, ISO 8601 timestamp], ...] in event order.
+    timeline = models.JSONField(default=list)
+    pickup_at = models.DateTimeField(null=True)
+    dropoff_at = models.DateTimeField(null=True)
+    trip_seconds = models.FloatField(null=True)
+    event_count = models.PositiveIntegerField(default=0)
+    last_event_id = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"RideProjection for Ride {self.id_ride_id}"
+
+
+class ProjectionCheckpoint(models.Model):
+    """
+    Last RideEvent (by id) a projection has consumed.
+    """
+
+    name = models.CharField(max_length=100, primary_key=True)
+    position = models.IntegerField(default=0)
+    # [[event id, unix time first missed], ...]: ids below the position that
+    # weren't there when it passed them, so may still commit.
+    gaps = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class Job(models.Model):
+    """
+    A unit of background work (report, export) run by ``manage.py worker``.
+    See ride_app.jobs for the job kinds and the queue operations.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+
+    id_job = models.AutoField(primary_key=True)
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict)
+    # sha256 of kind + canonical params; identical requests share results.
+    params_hash = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.QUEUED
+    )
+    progress = models.FloatField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    result = models.TextField(blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    created_by = models.ForeignKey(
+        User, null=True, blank=True, related_name="jobs", on_delete=models.SET_NULL
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+    # Not picked up again before this (retry backoff).
+    run_after = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # A running job past this is presumed abandoned by a dead worker.
+    locked_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"]),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id_job} ({self.kind}, {self.status})"
+
+
+class IdempotencyRecord(models.Model):
+    """
+    The response to a write sent with an Idempotency-Key, replayed to
+    retries of the same request until ``expires_at`` (see
+    ride_app.idempotency).
+    """
+
+    id_user = models.ForeignKey(User, related_name="+", on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    # sha256 of method, path and body; a reused key must match it.
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["id_user", "key"], name="unique_idempotency_key_per_user"
+            ),
+        ]
+
+    def __str__(self):
+        return f"IdempotencyRecord {self.key} for User {self.id_user_id}"
+
+
+class UserDailyStats(models.Model):
+    """
+    Per user, role and day (the ride's pickup date) activity totals, kept
+    up to date by ride_app.stats as rides and events are written.
+    """
+
+    class Role(models.TextChoices):
+        RIDER = "rider", "Rider"
+        DRIVER = "driver", "Driver"
+
+    id_user = models.ForeignKey(User, related_name="daily_stats", on_delete=models.CASCADE)
+    role = models.CharField(max_length=10, choices=Role.choices)
+    date = models.DateField()
+    ride_count = models.IntegerField(default=0)
+    distance_km = models.FloatField(default=0)
+    # Rides with both a pickup and a dropoff event.
+    trip_count = models.IntegerField(default=0)
+    trip_seconds = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["id_user", "role", "date"], name="unique_user_daily_stats"
+            ),
+        ]
+
     def __str__(self):
-        return f"RideEvent {self.id_ride_event} for Ride {self.id_ride.id_ride}"
+        return f"{self.role} stats for User {self.id_user_id} on {self.date}"
@@ -0,0 +1,161 @@
+import time
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import (
+    KIND_STATUSES,
+    ProjectionCheckpoint,
+    RideEvent,
+    RideProjection,
+    parse_status,
+)
+
+
+def status_durations(timeline):
+    """
+    Seconds spent in each status of a projection timeline, up to the last change.
+    """
+    durations = {}
+    for (status, started), (_, ended) in zip(timeline, timeline[1:]):
+        seconds = (
+            datetime.fromisoformat(ended) - datetime.fromisoformat(started)
+        ).total_seconds()
+        durations[status] = durations.get(status, 0) + seconds
+    return durations
+
+
+class RideProjector:
+    """
+    Folds the RideEvent log, in id order, into one RideProjection per ride.
+
+    ``catch_up()`` applies events after the stored checkpoint in batches of
+    ``batch_size``; ``replay()`` rebuilds every projection from scratch the
+    same way. Each batch and its checkpoint are committed together, so an
+    interrupted run resumes where it stopped.
+
+    Ids are allocated when a row is inserted, not when its transaction
+    commits, so an event committed late can land below the checkpoint.
+    Ids the checkpoint passes without seeing an event are kept as gaps and
+    looked for again by every batch for ``gap_timeout`` seconds, after which
+    they are taken as rolled back or deleted; an event found in a gap is
+    applied then, after the higher ids already applied. Only the newest
+    ``max_gaps`` gaps are kept.
+    """
+
+    name = "ride_state"
+
+    def __init__(self, batch_size=1000, gap_timeout=60, max_gaps=500):
+        self.batch_size = batch_size
+        self.gap_timeout = gap_timeout
+        self.max_gaps = max_gaps
+
+    def position(self):
+        checkpoint = ProjectionCheckpoint.objects.filter(name=self.name).first()
+        return checkpoint.position if checkpoint else 0
+
+    def replay(self, progress=None):
+        with transaction.atomic():
+            RideProjection.objects.all().delete()
+            ProjectionCheckpoint.objects.update_or_create(
+                name=self.name, defaults={"position": 0, "gaps": []}
+            )
+        return self.catch_up(progress=progress)
+
+    def catch_up(self, progress=None):
+        """
+        Apply all events after the checkpoint; return how many were applied.
+        """
+        applied = 0
+        while True:
+            batch_applied = self.apply_next_batch()
+            if not batch_applied:
+                return applied
+            applied += batch_applied
+            if progress is not None:
+                progress(applied)
+
+    @transaction.atomic
+    def apply_next_batch(self):
+        checkpoint, _ = ProjectionCheckpoint.objects.select_for_update().get_or_create(
+            name=self.name
+        )
+        now = time.time()
+        gaps = {
+            event_id: missed_at
+            for event_id, missed_at in checkpoint.gaps
+            if now - missed_at < self.gap_timeout
+        }
+        events = list(
+            RideEvent.objects.filter(
+                Q(id_ride_event__gt=checkpoint.position) | Q(id_ride_event__in=list(gaps))
+            )
+            .order_by("id_ride_event")
+            .values_list(
+                "id_ride_event", "id_ride_id", "event_kind", "description", "created_at"
+            )[: self.batch_size]
+        )
+        if not events:
+            if len(gaps) != len(checkpoint.gaps):
+                checkpoint.gaps = [[event_id, missed_at] for event_id, missed_at in gaps.items()]
+                checkpoint.save()
+            return 0
+
+        ride_ids = {event[1] for event in events}
+        projections = RideProjection.objects.in_bulk(ride_ids)
+        created = {}
+        for event_id, ride_id, event_kind, description, created_at in events:
+            projection = projections.get(ride_id)
+            if projection is None:
+                projection = projections[ride_id] = created[ride_id] = RideProjection(
+                    id_ride_id=ride_id
+                )
+            self.apply(projection, event_id, event_kind, description, created_at)
+
+        RideProjection.objects.bulk_create(created.values())
+        updated = [p for ride_id, p in projections.items() if ride_id not in created]
+        RideProjection.objects.bulk_update(
+            updated,
+            [
+                "status",
+                "timeline",
+                "pickup_at",
+                "dropoff_at",
+                "trip_seconds",
+                "event_count",
+                "last_event_id",
+            ],
+        )
+        # Late events fill their gaps; ids passed without an event open new ones.
+        event_ids = {event[0] for event in events}
+        for event_id in event_ids:
+            gaps.pop(event_id, None)
+        position = max(checkpoint.position, events[-1][0])
+        for event_id in range(max(checkpoint.position + 1, position - self.max_gaps), position):
+            if event_id not in event_ids:
+                gaps[event_id] = now
+        checkpoint.position = position
+        checkpoint.gaps = [[event_id, gaps[event_id]] for event_id in sorted(gaps)[-self.max_gaps :]]
+        checkpoint.save()
+        return len(events)
+
+    def apply(self, projection, event_id, event_kind, description, created_at):
+        projection.event_count += 1
+        projection.last_event_id = event_id
+        # Statuses without a kind of their own are still parsed from the text.
+        status = KIND_STATUSES.get(event_kind) or parse_status(description)
+        if status is None:
+            return
+        projection.status = status
+        projection.timeline = projection.timeline + [[status, created_at.isoformat()]]
+        # From the resolved status, so events stored without their kind
+        # (bulk_create, rows older than the kind backfill) still time trips.
+        if status == KIND_STATUSES[RideEvent.Kind.PICKUP]:
+            projection.pickup_at = created_at
+        elif status == KIND_STATUSES[RideEvent.Kind.DROPOFF]:
+            projection.dropoff_at = created_at
+        if projection.pickup_at and projection.dropoff_at:
+            projection.trip_seconds = (
+                projection.dropoff_at - projection.pickup_at
+            ).total_seconds()
@@ -0,0 +1,186 @@
+import logging
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("ride_app.queries")
+
+DEFAULT_OPTIONS = {
+    "ENABLED": False,
+    "STRICT": False,
+    "N_PLUS_ONE_THRESHOLD": 5,
+    "SLOW_QUERY_MS": 100,
+}
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_RE = re.compile(r"%s|\?")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_THIS_FILE = str(Path(__file__).resolve())
+
+
+def get_options():
+    """
+    Return the QUERY_ANALYSIS setting merged over the defaults.
+    """
+    return {**DEFAULT_OPTIONS, **getattr(settings, "QUERY_ANALYSIS", {})}
+
+
+def fingerprint(sql):
+    """
+    Normalize a SQL statement so that queries differing only in their
+    literal values (ids, strings, IN lists) share the same fingerprint.
+    """
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _PLACEHOLDER_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("IN (...)", sql)
+    return _WHITESPACE_RE.sub(" ", sql).strip()
+
+
+@lru_cache(maxsize=1024)
+def _is_project_file(filename):
+    path = str(Path(filename).resolve())
+    return (
+        path != _THIS_FILE
+        and path.startswith(str(settings.BASE_DIR))
+        and "site-packages" not in path
+    )
+
+
+def _origin_frame():
+    # The innermost frame inside the project (outside this module and any
+    # installed package) is the code that actually triggered the query.
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if _is_project_file(code.co_filename):
+            return f"{code.co_filename}:{frame.f_lineno} in {code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Raised in strict mode when a request exceeds its query budget or
+    repeats the same query fingerprint past the N+1 threshold.
+    """
+
+
+class QueryRecord:
+    __slots__ = ("sql", "fingerprint", "duration_ms", "origin")
+
+    def __init__(self, sql, duration_ms, origin):
+        self.sql = sql
+        self.fingerprint = fingerprint(sql)
+        self.duration_ms = duration_ms
+        self.origin = origin
+
+
+class QueryAnalyzer:
+    """
+    Database execute wrapper that records every query run while it is
+    installed and reports slow queries and repeated fingerprints.
+    """
+
+    def __init__(self, budget=None, n_plus_one_threshold=None, slow_query_ms=None, label=""):
+        options = get_options()
+        self.budget = budget
+        self.n_plus_one_threshold = (
+            n_plus_one_threshold
+            if n_plus_one_threshold is not None
+            else options["N_PLUS_ONE_THRESHOLD"]
+        )
+        self.slow_query_ms = (
+            slow_query_ms if slow_query_ms is not None else options["SLOW_QUERY_MS"]
+        )
+        self.label = label
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            origin = _origin_frame()
+            self.queries.append(QueryRecord(sql, duration_ms, origin))
+            if self.slow_query_ms is not None and duration_ms >= self.slow_query_ms:
+                logger.warning(
+                    "Slow query (%.1f ms) %s from %s: %s",
+                    duration_ms,
+                    self.label,
+                    origin,
+                    sql,
+                )
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_ms(self):
+        return sum(query.duration_ms for query in self.queries)
+
+    def repeated_fingerprints(self):
+        """
+        Return {fingerprint: count} for fingerprints at or above the N+1 threshold.
+        """
+        counts = Counter(query.fingerprint for query in self.queries)
+        return {
+            sql: count
+            for sql, count in counts.items()
+            if count >= self.n_plus_one_threshold
+        }
+
+    def problems(self):
+        problems = []
+        if self.budget is not None and self.count > self.budget:
+            problems.append(
+                f"{self.label} ran {self.count} queries, budget is {self.budget}"
+            )
+        for sql, count in self.repeated_fingerprints().items():
+            origins = {
+                query.origin for query in self.queries if query.fingerprint == sql
+            }
+            problems.append(
+                f"{self.label} repeated a query {count} times (possible N+1) "
+                f"from {', '.join(sorted(filter(None, origins))) or 'unknown'}: {sql}"
+            )
+        return problems
+
+    def check(self, strict=False):
+        """
+        Log every problem found; in strict mode raise QueryBudgetExceeded instead.
+        """
+        problems = self.problems()
+        if problems and strict:
+            raise QueryBudgetExceeded("\n".join(problems))
+        for problem in problems:
+            logger.warning(problem)
+        return problems
+
+
+@contextmanager
+def analyze_queries(strict=False, **kwargs):
+    """
+    Record queries on every configured database for the duration of the block.
+
+        with analyze_queries(budget=3, strict=True) as analyzer:
+            client.get("/rides/")
+    """
+    analyzer = QueryAnalyzer(**kwargs)
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(analyzer))
+        yield analyzer
+    analyzer.check(strict=strict)
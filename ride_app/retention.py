@@ -0,0 +1,238 @@
+"""
+Bulk purges of old rides, old events and whole users.
+
+Deleting through the ORM makes Django's collector load every dependent
+Ride, RideEvent and RideProjection row into Python and send signals for
+each, which holds the database's write lock for minutes on large tables.
+A purge instead selects ids in bounded batches in index order and removes
+each batch with set-based DELETEs of its dependents and itself, one short
+transaction per batch, pausing between batches so other writers get their
+turn.
+
+Those DELETEs are plain SQL (see ``_delete``), so Django neither cascades
+nor sends pre_delete/post_delete for the rows. Every dependent table is
+therefore deleted explicitly before the rows it references (events and
+projections before their rides, a user's stats and idempotency records
+before the user), and what the skipped signal handlers would do is done
+per batch: purged rides are taken out of the user stats and the working
+set of active rides. Users themselves are deleted through the ORM, so
+their remaining small relations cascade and user signals still run.
+
+Purging events alone leaves the stats and projections as they are: they
+keep the trips and timelines learned from them.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import stats
+from .models import IdempotencyRecord, Ride, RideEvent, RideProjection, User, UserDailyStats
+from .projections import RideProjector
+from .working_set import active_rides
+
+DEFAULT_OPTIONS = {
+    # Rides picked up, and events created, more than this many days ago are
+    # purged by `manage.py purge --enforce`; 0 keeps them.
+    "RIDE_DAYS": 0,
+    "EVENT_DAYS": 0,
+    "BATCH_SIZE": 1000,
+    # Seconds to wait between batches.
+    "PAUSE": 0.05,
+}
+COUNTED = ("rides", "events", "projections", "user_daily_stats", "idempotency_records", "users")
+
+
+def get_options():
+    return {**DEFAULT_OPTIONS, **getattr(settings, "RETENTION", {})}
+
+
+def _delete(model, field_name, values):
+    """
+    ``DELETE FROM <model's table> WHERE <field> IN (values)`` through a
+    cursor, as many statements as the database's parameter limit needs.
+    No rows are loaded, no signals are sent and nothing cascades: rows
+    referencing the deleted ones must already be gone. Returns the number
+    of rows deleted.
+    """
+    values = list(values)
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    field = model._meta.pk if field_name == "pk" else model._meta.get_field(field_name)
+    batch_size = connection.features.max_query_params or len(values)
+    deleted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(values), batch_size):
+            batch = values[start : start + batch_size]
+            cursor.execute(
+                f"DELETE FROM {quote(model._meta.db_table)} "
+                f"WHERE {quote(field.column)} IN ({', '.join(['%s'] * len(batch))})",
+                [field.get_db_prep_value(value, connection) for value in batch],
+            )
+            deleted += cursor.rowcount
+    return deleted
+
+
+class Purge:
+    """
+    Deletes rides picked up before ``rides_before``, events created before
+    ``events_before`` and the users ``user_ids`` with all their rides.
+
+    ``count()`` returns the rows each table would lose; ``run()`` deletes
+    them (or only counts with ``dry_run``) and returns the rows deleted.
+    ``progress(done, total)`` is called after every batch with the rides,
+    events and users purged so far and in all.
+    """
+
+    def __init__(
+        self,
+        rides_before=None,
+        events_before=None,
+        user_ids=(),
+        batch_size=None,
+        pause=None,
+        dry_run=False,
+        progress=None,
+    ):
+        options = get_options()
+        if events_before is not None and events_before > timezone.now() - timedelta(days=1):
+            # The working set and ride listings serve the last day's events.
+            raise ValueError("Only events older than a day can be purged.")
+        self.rides_before = rides_before
+        self.events_before = events_before
+        self.user_ids = sorted(set(user_ids))
+        self.batch_size = max(batch_size or options["BATCH_SIZE"], 1)
+        self.pause = options["PAUSE"] if pause is None else pause
+        self.dry_run = dry_run
+        self.progress = progress
+        self.done = 0
+        self.total = 0
+        self._started = False
+
+    def rides(self):
+        condition = Q(pk__in=[])
+        if self.rides_before is not None:
+            condition |= Q(pickup_time__lt=self.rides_before)
+        if self.user_ids:
+            condition |= Q(id_rider_id__in=self.user_ids) | Q(id_driver_id__in=self.user_ids)
+        return Ride.objects.filter(condition)
+
+    def old_events(self):
+        if self.events_before is None:
+            return RideEvent.objects.none()
+        return RideEvent.objects.filter(created_at__lt=self.events_before)
+
+    def count(self):
+        rides = self.rides().values("pk")
+        counts = {
+            "rides": rides.count(),
+            "events": RideEvent.objects.filter(
+                Q(id_ride__in=rides) | Q(pk__in=self.old_events().values("pk"))
+            ).count(),
+            "projections": RideProjection.objects.filter(id_ride__in=rides).count(),
+            "user_daily_stats": UserDailyStats.objects.filter(id_user__in=self.user_ids).count(),
+            "idempotency_records": IdempotencyRecord.objects.filter(
+                id_user__in=self.user_ids
+            ).count(),
+            "users": User.objects.filter(pk__in=self.user_ids).count(),
+        }
+        return counts
+
+    def run(self):
+        counts = dict.fromkeys(COUNTED, 0)
+        planned = self.count()
+        self.done = 0
+        self.total = (
+            planned["rides"]
+            + self.old_events().exclude(id_ride__in=self.rides().values("pk")).count()
+            + planned["users"]
+        )
+        if self.dry_run:
+            return planned
+
+        for ride_ids in self._batches(self.rides().order_by("pk")):
+            self._throttle()
+            for name, deleted in self.delete_rides(ride_ids).items():
+                counts[name] += deleted
+            self._advance(len(ride_ids))
+
+        if self.events_before is not None:
+            # Projections keep the history of the events about to go.
+            RideProjector().catch_up()
+        for event_ids in self._batches(self.old_events().order_by("created_at", "pk")):
+            self._throttle()
+            with transaction.atomic():
+                counts["events"] += _delete(RideEvent, "pk", event_ids)
+            self._advance(len(event_ids))
+
+        for user_id in self.user_ids:
+            self._throttle()
+            with transaction.atomic():
+                counts["user_daily_stats"] += _delete(UserDailyStats, "id_user", [user_id])
+                counts["idempotency_records"] += _delete(IdempotencyRecord, "id_user", [user_id])
+                # Only small relations (tokens, jobs, ...) are left for the
+                # collector, and user signals still run.
+                deleted = User.objects.filter(pk=user_id).delete()[1]
+                counts["users"] += deleted.get(User._meta.label, 0)
+            self._advance(1)
+        return counts
+
+    def delete_rides(self, ride_ids):
+        """
+        Delete one batch of rides with their events and projections.
+        """
+        with transaction.atomic():
+            emptied = stats.uncount_rides(ride_ids)
+            counts = {
+                # Dependents first: the ride DELETE doesn't cascade.
+                "events": _delete(RideEvent, "id_ride", ride_ids),
+                "projections": _delete(RideProjection, "id_ride", ride_ids),
+                "rides": _delete(Ride, "pk", ride_ids),
+                "user_daily_stats": emptied,
+            }
+            if active_rides.tracking:
+
+                def forget_active_rides():
+                    for ride_id in ride_ids:
+                        active_rides.ride_deleted(ride_id)
+
+                transaction.on_commit(forget_active_rides)
+        return counts
+
+    def _batches(self, queryset):
+        # Deleted rows drop out of the query, so each batch is the first
+        # ``batch_size`` left in index order.
+        while True:
+            ids = list(queryset.values_list("pk", flat=True)[: self.batch_size])
+            if not ids:
+                return
+            yield ids
+            if len(ids) < self.batch_size:
+                return
+
+    def _throttle(self):
+        # Let other writers in between two batches.
+        if self._started and self.pause:
+            time.sleep(self.pause)
+        self._started = True
+
+    def _advance(self, count):
+        self.done += count
+        if self.progress is not None:
+            self.progress(self.done, self.total)
+
+
+def retention_cutoffs(now=None):
+    """
+    (rides_before, events_before) from the RETENTION settings.
+    """
+    now = now or timezone.now()
+    options = get_options()
+    return tuple(
+        now - timedelta(days=options[name]) if options[name] else None
+        for name in ("RIDE_DAYS", "EVENT_DAYS")
+    )
@@ -0,0 +1,89 @@
+import gzip
+import hashlib
+import json
+from functools import lru_cache
+
+import yaml
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.views import View
+
+YAML_MEDIA_TYPE = "application/vnd.oai.openapi"
+JSON_MEDIA_TYPE = "application/vnd.oai.openapi+json"
+
+
+def generate_schema():
+    """
+    Introspect the API with drf-spectacular and return the schema as YAML bytes.
+    """
+    from drf_spectacular.openapi import AutoSchema
+    from drf_spectacular.renderers import OpenApiYamlRenderer
+    from drf_spectacular.settings import spectacular_settings
+    from rest_framework.settings import api_settings
+
+    # Production settings drop DEFAULT_SCHEMA_CLASS so workers never import
+    # drf-spectacular (the router touches every view's schema); views look
+    # it up on each access, so installing it here is enough to introspect.
+    previous = api_settings.DEFAULT_SCHEMA_CLASS
+    api_settings.DEFAULT_SCHEMA_CLASS = AutoSchema
+    try:
+        generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+        schema = generator.get_schema(request=None, public=True)
+    finally:
+        api_settings.DEFAULT_SCHEMA_CLASS = previous
+    return OpenApiYamlRenderer().render(schema, renderer_context={})
+
+
+class SchemaVariant:
+    __slots__ = ("content_type", "body", "gzipped", "etag")
+
+    def __init__(self, content_type, body):
+        self.content_type = content_type
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+@lru_cache(maxsize=None)
+def load_schema(path):
+    """
+    Read the prebuilt schema file once and keep YAML and JSON renderings,
+    plain and gzipped, in memory.
+    """
+    with open(path, "rb") as schema_file:
+        body = schema_file.read()
+    as_json = json.dumps(yaml.safe_load(body), indent=4).encode()
+    return {
+        "yaml": SchemaVariant(YAML_MEDIA_TYPE, body),
+        "json": SchemaVariant(JSON_MEDIA_TYPE, as_json),
+    }
+
+
+class StaticSchemaView(View):
+    """
+    Serve the OpenAPI schema written by ``manage.py build_schema`` from memory,
+    with ETag revalidation and gzip, instead of introspecting every view on
+    each request like SpectacularAPIView.
+    """
+
+    def get(self, request, *args, **kwargs):
+        variants = load_schema(str(settings.OPENAPI_SCHEMA_FILE))
+        requested = request.GET.get("format", "")
+        wants_json = "json" in requested or (
+            not requested and "json" in request.headers.get("Accept", "")
+        )
+        variant = variants["json" if wants_json else "yaml"]
+
+        if variant.etag in request.headers.get("If-None-Match", ""):
+            response = HttpResponseNotModified()
+        elif "gzip" in request.headers.get("Accept-Encoding", ""):
+            response = HttpResponse(variant.gzipped, content_type=variant.content_type)
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(variant.body, content_type=variant.content_type)
+        response["ETag"] = variant.etag
+        # Clients may cache the schema but must revalidate it (a cheap 304).
+        response["Cache-Control"] = "no-cache"
+        patch_vary_headers(response, ("Accept", "Accept-Encoding"))
+        return response
@@ -1,5 +1,10 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import User, Ride, RideEvent
+from rest_framework.reverse import reverse
+from .models import STATUS_TRANSITIONS, Job, User, Ride, RideEvent, RideProjection
+from .jobs import JOB_KINDS
+from .projections import status_durations
+from .transitions import is_allowed
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -11,12 +16,19 @@ class UserSerializer(serializers.ModelSerializer):
 class RideEventSerializer(serializers.ModelSerializer):
     class Meta:
         model = RideEvent
-        fields = ["id_ride_event", "description", "created_at"]
+        fields = ["id_ride_event", "event_kind", "description", "created_at"]
 
 
 class RideSerializer(serializers.ModelSerializer):
     id_rider = UserSerializer(read_only=True)
     id_driver = UserSerializer(read_only=True)
+    # Writes reference the rider and driver by id.
+    rider_id = serializers.PrimaryKeyRelatedField(
+        source="id_rider", queryset=User.objects.all(), write_only=True
+    )
+    driver_id = serializers.PrimaryKeyRelatedField(
+        source="id_driver", queryset=User.objects.all(), write_only=True
+    )
     todays_ride_events = serializers.SerializerMethodField()
 
     class Meta:
@@ -26,6 +38,8 @@ class RideSerializer(serializers.ModelSerializer):
             "status",
             "id_rider",
             "id_driver",
+            "rider_id",
+            "driver_id",
             "pickup_latitude",
             "pickup_longitude",
             "dropoff_latitude",
@@ -38,3 +52,197 @@ class RideSerializer(serializers.ModelSerializer):
         # This expects that the queryset has prefetched ride_events from the last 24 hours
         ride_events = getattr(obj, "todays_ride_events", [])
         return RideEventSerializer(ride_events, many=True).data
+
+
+class NormalizedRideSerializer(RideSerializer):
+    """
+    RideSerializer that references rider and driver by id. Used with
+    included_users(), which serializes each distinct user only once.
+    """
+
+    id_rider = serializers.PrimaryKeyRelatedField(read_only=True)
+    id_driver = serializers.PrimaryKeyRelatedField(read_only=True)
+
+
+def included_users(rides):
+    """
+    Return {user id: serialized user} for every rider and driver of ``rides``.
+    """
+    users = {}
+    for ride in rides:
+        for user in (ride.id_rider, ride.id_driver):
+            if user.pk not in users:
+                users[user.pk] = UserSerializer(user).data
+    return {str(pk): data for pk, data in users.items()}
+
+
+class RideProjectionSerializer(serializers.ModelSerializer):
+    id_ride = serializers.IntegerField(source="id_ride_id", read_only=True)
+    status_durations = serializers.SerializerMethodField()
+
+    class Meta:
+        model = RideProjection
+        fields = [
+            "id_ride",
+            "status",
+            "timeline",
+            "pickup_at",
+            "dropoff_at",
+            "trip_seconds",
+            "status_durations",
+            "event_count",
+        ]
+
+    def get_status_durations(self, obj) -> dict:
+        return status_durations(obj.timeline)
+
+
+class JobSerializer(serializers.ModelSerializer):
+    kind = serializers.ChoiceField(choices=sorted(JOB_KINDS))
+    params = serializers.JSONField(required=False, default=dict)
+    result_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            "id_job",
+            "kind",
+            "params",
+            "status",
+            "progress",
+            "attempts",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+            "result_url",
+        ]
+        read_only_fields = [
+            "status",
+            "progress",
+            "attempts",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+
+    def validate(self, attrs):
+        if not isinstance(attrs["params"], dict):
+            raise serializers.ValidationError({"params": "Must be an object."})
+        try:
+            attrs["params"] = JOB_KINDS[attrs["kind"]].clean_params(attrs["params"])
+        except ValueError as exc:
+            raise serializers.ValidationError({"params": str(exc)})
+        return attrs
+
+    def get_result_url(self, obj) -> str | None:
+        if obj.status != Job.Status.SUCCEEDED:
+            return None
+        return reverse("job-result", args=[obj.pk], request=self.context.get("request"))
+
+
+class ActivitySerializer(serializers.Serializer):
+    ride_count = serializers.IntegerField()
+    distance_km = serializers.FloatField()
+    trip_count = serializers.IntegerField()
+    trip_seconds = serializers.FloatField()
+    average_trip_seconds = serializers.FloatField(allow_null=True)
+    active_days = serializers.IntegerField()
+
+
+class UserStatsSerializer(serializers.Serializer):
+    id_user = serializers.IntegerField()
+    start = serializers.DateField(allow_null=True)
+    end = serializers.DateField(allow_null=True)
+    rider = ActivitySerializer()
+    driver = ActivitySerializer()
+
+
+class RideBatchSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), min_length=1, write_only=True
+    )
+    results = RideSerializer(many=True, read_only=True)
+    missing = serializers.ListField(child=serializers.IntegerField(), read_only=True)
+
+    def validate_ids(self, ids):
+        # Repeated ids are returned once, at their first position.
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > settings.RIDE_BATCH_MAX_IDS:
+            raise serializers.ValidationError(
+                f"At most {settings.RIDE_BATCH_MAX_IDS} rides per request."
+            )
+        return ids
+
+
+class RideTransitionSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=list(STATUS_TRANSITIONS))
+    # Only transition if the ride is still in this status.
+    expected_status = serializers.CharField(max_length=50, required=False, write_only=True)
+    id_ride = serializers.IntegerField(read_only=True)
+    previous_status = serializers.CharField(read_only=True)
+    event = RideEventSerializer(read_only=True)
+
+    def validate(self, attrs):
+        expected = attrs.get("expected_status")
+        if expected is not None and not is_allowed(expected, attrs["status"]):
+            raise serializers.ValidationError(
+                {"status": f"Cannot change status from {expected!r} to {attrs['status']!r}."}
+            )
+        return attrs
+
+
+class PointField(serializers.Field):
+    """
+    A ``[lat, lng]`` pair, or ``{"ride": id}`` for a ride's pickup point
+    (``{"ride": id, "end": "dropoff"}`` for its dropoff). Ride references
+    become ("ride", id, end) and are resolved by the view.
+    """
+
+    default_error_messages = {
+        "invalid": 'Expected [lat, lng] or {{"ride": id, "end": "pickup" or "dropoff"}}.',
+        "range": "Latitude must be within [-90, 90] and longitude within [-180, 180].",
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict):
+            ride, end = data.get("ride"), data.get("end", "pickup")
+            if type(ride) is not int or end not in ("pickup", "dropoff") or set(data) - {"ride", "end"}:
+                self.fail("invalid")
+            return ("ride", ride, end)
+        if (
+            not isinstance(data, list)
+            or len(data) != 2
+            or not all(type(value) in (int, float) for value in data)
+        ):
+            self.fail("invalid")
+        lat, lng = map(float, data)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            self.fail("range")
+        return (lat, lng)
+
+    def to_representation(self, value):
+        return list(value)
+
+
+class DistanceMatrixSerializer(serializers.Serializer):
+    origins = serializers.ListField(child=PointField(), min_length=1)
+    destinations = serializers.ListField(child=PointField(), min_length=1)
+    speed_kmh = serializers.FloatField(min_value=1, max_value=300, required=False)
+    distances_km = serializers.ListField(
+        child=serializers.ListField(child=serializers.FloatField()), read_only=True
+    )
+    eta_seconds = serializers.ListField(
+        child=serializers.ListField(child=serializers.FloatField()), read_only=True
+    )
+
+    def validate(self, attrs):
+        cells = len(attrs["origins"]) * len(attrs["destinations"])
+        if cells > settings.DISTANCE_MATRIX_MAX_CELLS:
+            raise serializers.ValidationError(
+                f"At most {settings.DISTANCE_MATRIX_MAX_CELLS} origin x destination "
+                f"pairs per request, got {cells}."
+            )
+        attrs.setdefault("speed_kmh", settings.ETA_SPEED_KMH)
+        return attrs
@@ -0,0 +1,121 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import stats
+from .authentication import token_cache
+from .models import Ride, RideEvent, User
+from .working_set import USER_FIELDS, active_rides
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    # Role, is_active or the user itself may have changed.
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(pre_save, sender=Ride)
+def remember_ride_stats_fields(sender, instance, raw=False, update_fields=None, **kwargs):
+    # The stored values, to move the ride's stats if they change.
+    instance._stats_previous = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not stats.STATS_FIELDS & set(update_fields):
+        return
+    instance._stats_previous = Ride.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=Ride)
+def update_ride_stats(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        # A ride that was just inserted has no events, hence no trip yet.
+        stats.record_ride(instance, bounds=(None, None))
+        return
+    previous = getattr(instance, "_stats_previous", None)
+    if previous is not None and stats.ride_changed(previous, instance):
+        stats.move_ride(previous, instance)
+
+
+@receiver(pre_delete, sender=Ride)
+def uncount_ride_stats(sender, instance, **kwargs):
+    # Before the cascade, while the ride's events still define its trip.
+    stats.record_ride(instance, sign=-1)
+
+
+@receiver(post_save, sender=RideEvent)
+def update_trip_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.record_event(instance)
+
+
+@receiver(post_delete, sender=RideEvent)
+def uncount_trip_stats(sender, instance, origin=None, **kwargs):
+    # Events deleted along with their ride were uncounted with the ride.
+    if getattr(origin, "model", type(origin)) is RideEvent:
+        stats.record_event(instance, created=False)
+
+
+# The working set of active rides (ride_app.working_set) applies writes
+# once they commit, so rolled back writes never reach it.
+
+
+@receiver(post_save, sender=Ride)
+def sync_active_ride(sender, instance, raw=False, using=None, **kwargs):
+    if raw or not active_rides.tracking:
+        return
+    ride_id, status = instance.pk, instance.status
+    transaction.on_commit(lambda: active_rides.ride_saved(ride_id, status), using=using)
+
+
+@receiver(post_delete, sender=Ride)
+def drop_active_ride(sender, instance, using=None, **kwargs):
+    if active_rides.tracking:
+        ride_id = instance.pk
+        transaction.on_commit(lambda: active_rides.ride_deleted(ride_id), using=using)
+
+
+@receiver(post_save, sender=RideEvent)
+@receiver(post_delete, sender=RideEvent)
+def sync_active_ride_events(sender, instance, created=False, raw=False, using=None, **kwargs):
+    if raw or not active_rides.tracking or active_rides.get(instance.id_ride_id) is None:
+        return
+    if created:
+        transaction.on_commit(lambda: active_rides.event_saved(instance), using=using)
+    else:
+        ride_id = instance.id_ride_id
+        transaction.on_commit(lambda: active_rides.refresh(ride_id), using=using)
+
+
+@receiver(post_save, sender=User)
+def sync_active_ride_users(sender, instance, raw=False, update_fields=None, using=None, **kwargs):
+    if raw or not active_rides.tracking or not active_rides.holds_user(instance.pk):
+        return
+    if update_fields is not None and not USER_FIELDS & set(update_fields):
+        # e.g. the last_login update on every login.
+        return
+    deferred = instance.get_deferred_fields()
+    values = {
+        field.attname: getattr(instance, field.attname)
+        for field in User._meta.concrete_fields
+        if field.attname not in deferred
+        and (update_fields is None or field.name in update_fields)
+    }
+    user_id = instance.pk
+    transaction.on_commit(lambda: active_rides.user_saved(user_id, values), using=using)
+
+
+@receiver(post_delete, sender=User)
+def drop_active_ride_user(sender, instance, using=None, **kwargs):
+    if active_rides.tracking and active_rides.holds_user(instance.pk):
+        user_id = instance.pk
+        transaction.on_commit(lambda: active_rides.user_deleted(user_id), using=using)
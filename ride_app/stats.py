@@ -0,0 +1,305 @@
+"""
+Per-user daily activity aggregates (UserDailyStats).
+
+Every ride counts once for its rider and once for its driver on its pickup
+date, with the pickup -> dropoff distance. Its trip duration, from the
+first pickup event to the last dropoff event, is added once both exist.
+The signal handlers in ride_app.signals apply each ride or event write as
+a delta, so reading stats never touches rides or events. Writes that skip
+signals (bulk_create, QuerySet.update/delete, raw SQL) must call these
+functions themselves or be followed by ``manage.py rebuild_user_stats``.
+"""
+
+from django.db import connections, router, transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+from .geo import haversine_km
+from .models import Ride, RideEvent, UserDailyStats
+
+COUNTERS = ("ride_count", "distance_km", "trip_count", "trip_seconds")
+# Rows per upsert statement; 7 parameters each stays under SQLite's 999.
+UPSERT_BATCH_SIZE = 100
+# Ride fields the stats depend on; other updates leave them alone.
+STATS_FIELDS = {
+    "id_rider",
+    "id_driver",
+    "pickup_time",
+    "pickup_latitude",
+    "pickup_longitude",
+    "dropoff_latitude",
+    "dropoff_longitude",
+}
+
+
+def ride_distance_km(ride):
+    return haversine_km(
+        ride.pickup_latitude,
+        ride.pickup_longitude,
+        ride.dropoff_latitude,
+        ride.dropoff_longitude,
+    )
+
+
+def ride_keys(ride):
+    """
+    The (user id, role, date) rows a ride counts towards.
+    """
+    # Unsaved or just created rides may still hold the assigned string or
+    # naive datetime.
+    pickup_time = Ride._meta.get_field("pickup_time").to_python(ride.pickup_time)
+    if timezone.is_naive(pickup_time):
+        pickup_time = timezone.make_aware(pickup_time)
+    day = timezone.localdate(pickup_time)
+    return [
+        (ride.id_rider_id, UserDailyStats.Role.RIDER, day),
+        (ride.id_driver_id, UserDailyStats.Role.DRIVER, day),
+    ]
+
+
+def upsert(totals):
+    """
+    Add {(user id, role, date): {counter: delta}} to the stats rows with a
+    single INSERT ... ON CONFLICT DO UPDATE (per UPSERT_BATCH_SIZE rows),
+    creating rows as needed. Increments happen in SQL, so concurrent
+    writers don't lose updates.
+    """
+    rows = [(key, counters) for key, counters in totals.items() if any(counters.values())]
+    if not rows:
+        return
+    connection = connections[router.db_for_write(UserDailyStats)]
+    quote = connection.ops.quote_name
+    fields = [UserDailyStats._meta.get_field(name) for name in ("id_user", "role", "date", *COUNTERS)]
+    table = quote(UserDailyStats._meta.db_table)
+    columns = [quote(field.column) for field in fields]
+    increments = ", ".join(
+        f"{column} = {table}.{column} + excluded.{column}" for column in columns[3:]
+    )
+    row_sql = f"({', '.join(['%s'] * len(fields))})"
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start : start + UPSERT_BATCH_SIZE]
+            params = []
+            for key, counters in batch:
+                values = (*key, *(counters.get(name, 0) for name in COUNTERS))
+                params.extend(
+                    field.get_db_prep_save(value, connection)
+                    for field, value in zip(fields, values)
+                )
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) "
+                f"VALUES {', '.join([row_sql] * len(batch))} "
+                f"ON CONFLICT ({', '.join(columns[:3])}) DO UPDATE SET {increments}",
+                params,
+            )
+
+
+def add(keys, **deltas):
+    """
+    Add ``deltas`` to the counters of each (user id, role, date) row.
+    """
+    upsert({key: deltas for key in keys})
+
+
+def trip_seconds(pickup_at, dropoff_at):
+    if pickup_at is None or dropoff_at is None or dropoff_at < pickup_at:
+        return None
+    return (dropoff_at - pickup_at).total_seconds()
+
+
+def trip_delta(before, after):
+    """
+    Counter deltas for a ride whose trip went from ``before`` to ``after``
+    seconds (None: no complete trip).
+    """
+    return {
+        "trip_count": (after is not None) - (before is not None),
+        "trip_seconds": (after or 0) - (before or 0),
+    }
+
+
+def trip_bounds(ride_id):
+    """
+    (first pickup, last dropoff) event times of a ride; one aggregate over
+    the ride's events.
+    """
+    bounds = RideEvent.objects.filter(id_ride_id=ride_id).aggregate(
+        pickup_at=Min("created_at", filter=Q(event_kind=RideEvent.Kind.PICKUP)),
+        dropoff_at=Max("created_at", filter=Q(event_kind=RideEvent.Kind.DROPOFF)),
+    )
+    return bounds["pickup_at"], bounds["dropoff_at"]
+
+
+def with_event(bounds, event):
+    pickup_at, dropoff_at = bounds
+    if event.event_kind == RideEvent.Kind.PICKUP:
+        pickup_at = min(filter(None, (pickup_at, event.created_at)))
+    elif event.event_kind == RideEvent.Kind.DROPOFF:
+        dropoff_at = max(filter(None, (dropoff_at, event.created_at)))
+    return pickup_at, dropoff_at
+
+
+def add_ride(totals, ride, trip, sign=1):
+    """
+    Add a ride, with a trip of ``trip`` seconds (None: no complete trip),
+    times ``sign`` to {key: counters}.
+    """
+    distance = ride_distance_km(ride)
+    for key in ride_keys(ride):
+        row = totals.setdefault(key, dict.fromkeys(COUNTERS, 0))
+        row["ride_count"] += sign
+        row["distance_km"] += sign * distance
+        if trip is not None:
+            row["trip_count"] += sign
+            row["trip_seconds"] += sign * trip
+    return totals
+
+
+def record_ride(ride, sign=1, bounds=None):
+    """
+    Count (sign=1) or uncount (sign=-1) a ride and its trip. ``bounds``
+    are its (first pickup, last dropoff) times, when the caller knows them.
+    """
+    if bounds is None:
+        bounds = trip_bounds(ride.pk)
+    upsert(add_ride({}, ride, trip_seconds(*bounds), sign))
+
+
+def move_ride(previous, ride):
+    """
+    Move a ride's counts from its ``previous`` stored values to its current
+    ones in one upsert.
+    """
+    trip = trip_seconds(*trip_bounds(ride.pk))
+    upsert(add_ride(add_ride({}, previous, trip, sign=-1), ride, trip))
+
+
+def ride_changed(previous, ride):
+    return ride_keys(previous) != ride_keys(ride) or ride_distance_km(
+        previous
+    ) != ride_distance_km(ride)
+
+
+def record_event(event, created=True):
+    """
+    Apply a pickup/dropoff event that was just created (or deleted) to the
+    trip of its ride: one query for the ride's keys and its trip bounds
+    without the event, and one upsert.
+    """
+    if event.event_kind not in (RideEvent.Kind.PICKUP, RideEvent.Kind.DROPOFF):
+        return
+    ride = (
+        rides_with_trips(exclude_event=event.pk if created else None)
+        .only("pickup_time", "id_rider_id", "id_driver_id")
+        .filter(pk=event.id_ride_id)
+        .first()
+    )
+    if ride is None:
+        return
+    bounds = (ride.first_pickup, ride.last_dropoff)
+    if created:
+        before_bounds, after_bounds = bounds, with_event(bounds, event)
+    else:
+        before_bounds, after_bounds = with_event(bounds, event), bounds
+    add(
+        ride_keys(ride),
+        **trip_delta(trip_seconds(*before_bounds), trip_seconds(*after_bounds)),
+    )
+
+
+def rides_with_trips(exclude_event=None):
+    """
+    Rides annotated with the first_pickup and last_dropoff times of their
+    events, leaving out event ``exclude_event``.
+    """
+    events = Q() if exclude_event is None else ~Q(ride_events__pk=exclude_event)
+    return Ride.objects.order_by("pk").annotate(
+        first_pickup=Min(
+            "ride_events__created_at",
+            filter=Q(ride_events__event_kind=RideEvent.Kind.PICKUP) & events,
+        ),
+        last_dropoff=Max(
+            "ride_events__created_at",
+            filter=Q(ride_events__event_kind=RideEvent.Kind.DROPOFF) & events,
+        ),
+    )
+
+
+def add_totals(totals, rides):
+    """
+    Add rides annotated by ``rides_with_trips()`` to {key: counters}.
+    """
+    for ride in rides:
+        add_ride(totals, ride, trip_seconds(ride.first_pickup, ride.last_dropoff))
+    return totals
+
+
+def rebuild(batch_size=2000):
+    """
+    Recompute every UserDailyStats row from rides and events. Returns the
+    number of rows written.
+    """
+    totals = {}
+    rides = rides_with_trips()
+    last_pk = 0
+    while True:
+        batch = list(rides.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        add_totals(totals, batch)
+
+    with transaction.atomic():
+        UserDailyStats.objects.all().delete()
+        UserDailyStats.objects.bulk_create(
+            (
+                UserDailyStats(id_user_id=user_id, role=role, date=day, **counters)
+                for (user_id, role, day), counters in totals.items()
+            ),
+            batch_size=1000,
+        )
+    return len(totals)
+
+
+def uncount_rides(ride_ids):
+    """
+    Remove rides that are about to be deleted without signals, with their
+    trips, from the stats. Rows left without rides are deleted; returns
+    how many.
+    """
+    totals = add_totals({}, rides_with_trips().filter(pk__in=ride_ids))
+    upsert(
+        {key: {name: -value for name, value in counters.items()} for key, counters in totals.items()}
+    )
+    if not totals:
+        return 0
+    return UserDailyStats.objects.filter(
+        id_user_id__in={user_id for user_id, _, _ in totals}, ride_count__lte=0
+    ).delete()[0]
+
+
+def user_stats(user_id, start=None, end=None):
+    """
+    {role: totals} for a user over the days ``start``..``end`` (inclusive,
+    either may be None), with the average trip length.
+    """
+    rows = UserDailyStats.objects.filter(id_user_id=user_id)
+    if start is not None:
+        rows = rows.filter(date__gte=start)
+    if end is not None:
+        rows = rows.filter(date__lte=end)
+    totals = {
+        role: {**dict.fromkeys(COUNTERS, 0), "active_days": 0}
+        for role in UserDailyStats.Role.values
+    }
+    for row in rows.values("role").annotate(
+        active_days=Count("pk"), **{name: Sum(name) for name in COUNTERS}
+    ):
+        totals[row.pop("role")].update(row)
+    for role_totals in totals.values():
+        role_totals["average_trip_seconds"] = (
+            role_totals["trip_seconds"] / role_totals["trip_count"]
+            if role_totals["trip_count"]
+            else None
+        )
+    return totals
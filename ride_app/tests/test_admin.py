@@ -0,0 +1,133 @@
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from ride_app.admin_tools import EstimatedCountPaginator, estimated_row_count
+from ride_app.models import User, Ride, RideEvent
+
+
+class AdminPerformanceTest(TestCase):
+    def setUp(self):
+        self.superuser = User.objects.create_superuser(
+            username="root", password="password123", email="root@example.com"
+        )
+        self.client.force_login(self.superuser)
+        self.riders = [
+            User.objects.create_user(
+                username=f"rider{i}",
+                password="password123",
+                first_name="Rider",
+                last_name=str(i),
+                role=User.Role.RIDER,
+            )
+            for i in range(3)
+        ]
+
+    def create_rides(self, count):
+        for i in range(count):
+            rider = self.riders[i % len(self.riders)]
+            ride = Ride.objects.create(
+                status="pickup",
+                id_rider=rider,
+                id_driver=rider,
+                pickup_latitude=10.0,
+                pickup_longitude=20.0,
+                dropoff_latitude=30.0,
+                dropoff_longitude=40.0,
+                pickup_time=datetime(2025, 3, 1, 10, tzinfo=dt_timezone.utc),
+            )
+            RideEvent.objects.create(
+                id_ride=ride,
+                description="Status changed to pickup",
+                created_at=datetime(2025, 3, 1 + i % 2, 10, tzinfo=dt_timezone.utc),
+            )
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_changelists_do_not_query_per_row(self):
+        for name in ("admin:ride_app_ride_changelist", "admin:ride_app_rideevent_changelist"):
+            self.create_rides(2)
+            few, _ = self.count_queries(reverse(name))
+            self.create_rides(10)
+            many, _ = self.count_queries(reverse(name))
+            self.assertEqual(few, many, name)
+
+    def test_ride_search_is_exact(self):
+        self.create_rides(3)
+        url = reverse("admin:ride_app_ride_changelist")
+        _, response = self.count_queries(url, {"q": "rider1"})
+        self.assertEqual(response.context["cl"].result_count, 1)
+        _, response = self.count_queries(url, {"q": "rider"})
+        self.assertEqual(response.context["cl"].result_count, 0)
+        ride = Ride.objects.first()
+        _, response = self.count_queries(url, {"q": str(ride.id_ride)})
+        self.assertEqual(list(response.context["cl"].result_list), [ride])
+
+    def test_event_description_prefix_search(self):
+        self.create_rides(2)
+        url = reverse("admin:ride_app_rideevent_changelist")
+        _, response = self.count_queries(url, {"q": "Status changed"})
+        self.assertEqual(response.context["cl"].result_count, 2)
+        _, response = self.count_queries(url, {"q": "changed"})
+        self.assertEqual(response.context["cl"].result_count, 0)
+
+    def test_date_hierarchy_filter(self):
+        self.create_rides(4)
+        url = reverse("admin:ride_app_rideevent_changelist")
+        _, response = self.count_queries(url)
+        (created_filter,) = response.context["cl"].filter_specs
+        self.assertEqual(created_filter.lookup_choices, [("2025", "2025")])
+        _, response = self.count_queries(url, {"created": "2025-03"})
+        self.assertEqual(response.context["cl"].result_count, 4)
+        _, response = self.count_queries(url, {"created": "2025-03-02"})
+        self.assertEqual(response.context["cl"].result_count, 2)
+        (created_filter,) = response.context["cl"].filter_specs
+        self.assertEqual(len(created_filter.lookup_choices), 2 + 31)
+        # Invalid and out-of-range dates select nothing.
+        for value in ["2025-13", "9999", "9999-12", "9999-12-31", "0001", "99999"]:
+            with self.subTest(value=value):
+                _, response = self.count_queries(url, {"created": value})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context["cl"].result_count, 4)
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="rider", password="password123")
+        for _ in range(5):
+            Ride.objects.create(
+                status="pickup",
+                id_rider=self.user,
+                id_driver=self.user,
+                pickup_latitude=10.0,
+                pickup_longitude=20.0,
+                dropoff_latitude=30.0,
+                dropoff_longitude=40.0,
+                pickup_time=datetime(2025, 3, 1, 10, tzinfo=dt_timezone.utc),
+            )
+
+    def test_sqlite_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.assertEqual(estimated_row_count(Ride), 5)
+
+    def test_large_tables_use_estimate(self):
+        with mock.patch("ride_app.admin_tools.estimated_row_count", return_value=10_000_000):
+            paginator = EstimatedCountPaginator(Ride.objects.order_by("pk"), 100)
+            with self.assertNumQueries(0):
+                self.assertEqual(paginator.count, 10_000_000)
+        with mock.patch("ride_app.admin_tools.estimated_row_count", return_value=None):
+            paginator = EstimatedCountPaginator(Ride.objects.order_by("pk"), 100)
+            self.assertEqual(paginator.count, 5)
+
+    def test_filtered_counts_are_capped(self):
+        queryset = Ride.objects.filter(status="pickup").order_by("pk")
+        paginator = EstimatedCountPaginator(queryset, 2)
+        paginator.count_limit = 3
+        self.assertEqual(paginator.count, 3)
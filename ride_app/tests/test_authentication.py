@@ -0,0 +1,107 @@
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from ride_app.authentication import CachedTokenAuthentication, TokenCache, token_cache
+from ride_app.models import User
+
+
+class TokenCacheTest(TestCase):
+    def test_lru_eviction(self):
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set("a", 1, "admin")
+        cache.set("b", 2, "admin")
+        cache.get("a")
+        cache.set("c", 3, "admin")
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
+
+    def test_ttl_expiry(self):
+        cache = TokenCache(max_size=2, ttl=10)
+        with mock.patch("ride_app.authentication.time.monotonic", return_value=100.0):
+            cache.set("a", 1, "admin")
+        with mock.patch("ride_app.authentication.time.monotonic", return_value=111.0):
+            self.assertIsNone(cache.get("a"))
+
+    def test_invalidate_user(self):
+        cache = TokenCache()
+        cache.set("a", 1, "admin")
+        cache.set("b", 1, "admin")
+        cache.set("c", 2, "admin")
+        cache.invalidate_user(1)
+        self.assertIsNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_options_are_read_on_use(self):
+        cache = TokenCache()
+        with override_settings(AUTH_TOKEN_CACHE={"MAX_SIZE": 1, "TTL": 5}):
+            self.assertEqual((cache.max_size, cache.ttl), (1, 5))
+            cache.set("a", 1, "admin")
+            cache.set("b", 2, "admin")
+        self.assertEqual(len(cache), 1)
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.admin_user = User.objects.create_user(
+            username="admin",
+            password="password123",
+            role=User.Role.ADMIN,
+            phone_number="1234567890",
+        )
+        self.token = Token.objects.create(user=self.admin_user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.url = reverse("ride-list")
+
+    def test_cached_token_skips_auth_queries(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        # Warm cache: only the count query remains (no rides, so no page query).
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_role_change_is_seen(self):
+        self.client.get(self.url)
+        self.admin_user.role = User.Role.CUSTOMER
+        self.admin_user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(self.url)
+        self.admin_user.is_active = False
+        self.admin_user.save()
+        response = self.client.get(self.url)
+        # SessionAuthentication comes first and has no WWW-Authenticate
+        # header, so DRF reports failed authentication as 403.
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_deleted_token_is_rejected(self):
+        self.client.get(self.url)
+        self.token.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data["detail"], "Invalid token.")
+
+    def test_cached_user_fields_need_no_queries(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            user, _ = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+            self.assertEqual(user.role, User.Role.ADMIN)
+            self.assertEqual(user.username, "admin")
+            self.assertEqual(user.phone_number, "1234567890")
+            self.assertIsNotNone(user.date_joined)
+        # The password hash isn't cached; it loads on access.
+        self.assertTrue(user.check_password("password123"))
+
+    def test_user_endpoint_costs_no_user_queries(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("rest_user_details"))
+        self.assertEqual(response.data["username"], "admin")
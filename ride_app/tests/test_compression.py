@@ -0,0 +1,65 @@
+import gzip
+import brotli
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from ride_app.compression import negotiate_encoding, parse_accept_encoding
+from ride_app.middleware import CompressionMiddleware
+
+BODY = b'{"id_rider": {"first_name": "Alice", "last_name": "Smith"}}' * 100
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024)
+class CompressionMiddlewareTest(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def respond(self, response, accept_encoding):
+        middleware = CompressionMiddleware(lambda request: response)
+        return middleware(self.factory.get("/rides/", HTTP_ACCEPT_ENCODING=accept_encoding))
+
+    def test_parse_accept_encoding(self):
+        self.assertEqual(
+            parse_accept_encoding("gzip;q=0.5, br, identity;q=0"),
+            {"gzip": 0.5, "br": 1.0, "identity": 0.0},
+        )
+
+    def test_negotiation_respects_quality(self):
+        self.assertEqual(negotiate_encoding("gzip"), "gzip")
+        self.assertIsNone(negotiate_encoding("identity"))
+        self.assertIsNone(negotiate_encoding("gzip;q=0"))
+        self.assertIsNone(negotiate_encoding(""))
+
+    def test_gzip(self):
+        response = self.respond(HttpResponse(BODY), "gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(gzip.decompress(response.content), BODY)
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+
+    def test_small_responses_are_not_compressed(self):
+        response = self.respond(HttpResponse(b'{"count": 0}'), "gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_streaming_gzip(self):
+        chunks = [BODY[:1000], BODY[1000:]]
+        response = self.respond(StreamingHttpResponse(iter(chunks)), "gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), BODY)
+
+    def test_already_encoded_responses_are_left_alone(self):
+        response = HttpResponse(BODY)
+        response["Content-Encoding"] = "gzip"
+        self.assertEqual(self.respond(response, "gzip").content, BODY)
+
+    def test_brotli_preferred(self):
+        response = self.respond(HttpResponse(BODY), "gzip, deflate, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(response.content), BODY)
+        response = self.respond(HttpResponse(BODY), "gzip, br;q=0.5")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def test_streaming_brotli(self):
+        chunks = [BODY[:1000], BODY[1000:]]
+        response = self.respond(StreamingHttpResponse(iter(chunks)), "br")
+        body = brotli.decompress(b"".join(response.streaming_content))
+        self.assertEqual(body, BODY)
@@ -0,0 +1,151 @@
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+import environ
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from ride_app import db_router
+from ride_app.db_router import ReadReplicaRouter
+from ride_app.middleware import ReplicaPinMiddleware
+from ride_app.models import Ride, RideEvent, User
+from ride_core.databases import build_databases
+
+
+class DatabaseProfileTest(TestCase):
+    def build(self, base_dir, **variables):
+        with mock.patch.dict(os.environ, variables):
+            return build_databases(environ.Env(), base_dir)
+
+    def test_development_profile_is_untuned(self):
+        databases = self.build(Path("/srv"))
+        self.assertEqual(databases["default"]["CONN_MAX_AGE"], 0)
+        self.assertEqual(databases["default"]["OPTIONS"]["init_command"], "")
+        self.assertEqual(list(databases), ["default"])
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            self.build(Path("/srv"), DB_PROFILE="fast")
+
+    def test_production_profile_on_two_sqlite_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            databases = self.build(
+                directory,
+                DB_PROFILE="production",
+                SQLITE_CACHE_SIZE="-2000",
+                DB_REPLICAS=str(directory / "replica.sqlite3"),
+            )
+            self.assertEqual(databases["default"]["CONN_MAX_AGE"], 600)
+            self.assertTrue(databases["default"]["CONN_HEALTH_CHECKS"])
+            self.assertEqual(databases["replica_1"]["TEST"], {"MIRROR": "default"})
+
+            handler = ConnectionHandler(databases)
+            try:
+                for alias in ("default", "replica_1"):
+                    with handler[alias].cursor() as cursor:
+                        cursor.execute("PRAGMA journal_mode")
+                        self.assertEqual(cursor.fetchone()[0], "wal")
+                        cursor.execute("PRAGMA synchronous")
+                        self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+                        cursor.execute("PRAGMA cache_size")
+                        self.assertEqual(cursor.fetchone()[0], -2000)
+                # With WAL a reader is not blocked by an open write transaction.
+                writer = handler["default"]
+                reader = ConnectionHandler(databases)["default"]
+                with writer.cursor() as cursor:
+                    cursor.execute("CREATE TABLE t (x integer)")
+                writer.set_autocommit(False)
+                with writer.cursor() as cursor:
+                    cursor.execute("INSERT INTO t VALUES (1)")
+                with reader.cursor() as cursor:
+                    cursor.execute("SELECT count(*) FROM t")
+                    self.assertEqual(cursor.fetchone()[0], 0)
+                writer.rollback()
+                reader.close()
+            finally:
+                handler.close_all()
+
+
+@override_settings(DATABASE_REPLICAS=["replica_1", "replica_2"], REPLICA_CHECK_INTERVAL=60)
+class ReadReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.router = ReadReplicaRouter()
+        db_router.unpin()
+        db_router._replica_state.clear()
+
+    def tearDown(self):
+        db_router.unpin()
+        db_router._replica_state.clear()
+
+    def read(self):
+        # TestCase wraps each test in a transaction; step outside of it.
+        with mock.patch.object(db_router.connections[DEFAULT_DB_ALIAS], "in_atomic_block", False):
+            return self.router.db_for_read(Ride)
+
+    @mock.patch("ride_app.db_router.replica_lag", return_value=0)
+    def test_reads_go_to_replicas(self, replica_lag):
+        self.assertIn(self.read(), {"replica_1", "replica_2"})
+        self.assertEqual(self.router.db_for_write(Ride), DEFAULT_DB_ALIAS)
+
+    @mock.patch("ride_app.db_router.replica_lag", return_value=0)
+    def test_reads_follow_writes_to_primary(self, replica_lag):
+        self.router.db_for_write(Ride)
+        self.assertEqual(self.read(), DEFAULT_DB_ALIAS)
+        db_router.unpin()
+        self.assertNotEqual(self.read(), DEFAULT_DB_ALIAS)
+
+    @mock.patch("ride_app.db_router.replica_lag", side_effect=lambda alias: 0 if alias == "replica_2" else 60)
+    def test_lagging_replica_is_skipped(self, replica_lag):
+        for _ in range(10):
+            self.assertEqual(self.read(), "replica_2")
+        # The lag check result is cached for REPLICA_CHECK_INTERVAL.
+        self.assertEqual(replica_lag.call_count, 2)
+
+    @mock.patch("ride_app.db_router.replica_lag", return_value=60)
+    def test_falls_back_to_primary(self, replica_lag):
+        self.assertEqual(self.read(), DEFAULT_DB_ALIAS)
+
+    def test_reads_inside_transactions_use_primary(self):
+        with transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Ride), DEFAULT_DB_ALIAS)
+
+    @mock.patch("ride_app.db_router.replica_lag", return_value=0)
+    def test_users_are_read_from_the_primary(self, replica_lag):
+        with mock.patch.object(db_router.connections[DEFAULT_DB_ALIAS], "in_atomic_block", False):
+            self.assertEqual(self.router.db_for_read(User), DEFAULT_DB_ALIAS)
+
+    @mock.patch("ride_app.db_router.replica_lag", return_value=0)
+    def test_pin_ends_with_the_request(self, replica_lag):
+        def view(request):
+            self.router.db_for_write(Ride)
+            self.assertEqual(self.read(), DEFAULT_DB_ALIAS)
+            return HttpResponse()
+
+        ReplicaPinMiddleware(view)(RequestFactory().post("/rides/"))
+        self.assertIn(self.read(), {"replica_1", "replica_2"})
+
+    def test_other_apps_are_not_routed(self):
+        self.assertIsNone(self.router.db_for_read(Token))
+        self.assertFalse(self.router.allow_migrate("replica_1", "ride_app"))
+        self.assertIsNone(self.router.allow_migrate("default", "ride_app"))
+
+    def test_replica_lag_probe(self):
+        self.assertEqual(db_router.replica_lag(DEFAULT_DB_ALIAS), 0)
+        user = User.objects.create_user(username="rider", password="password123")
+        ride = Ride.objects.create(
+            status="pickup",
+            id_rider=user,
+            id_driver=user,
+            pickup_latitude=10.0,
+            pickup_longitude=20.0,
+            dropoff_latitude=30.0,
+            dropoff_longitude=40.0,
+            pickup_time="2025-03-01T10:00:00Z",
+        )
+        RideEvent.objects.create(id_ride=ride, description="Status changed to pickup")
+        # Compared with itself the primary is never behind.
+        self.assertEqual(db_router.replica_lag(DEFAULT_DB_ALIAS), 0)
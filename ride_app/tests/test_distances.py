@@ -0,0 +1,104 @@
+from io import StringIO
+from unittest import skipIf
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from ride_app import geo
+from ride_app.models import Ride, User
+
+POINTS = [(40.7128, -74.0060), (34.0522, -118.2437), (51.5074, -0.1278), (-33.8688, 151.2093)]
+
+
+class DistanceMatrixTest(SimpleTestCase):
+    def test_python_backend_matches_haversine(self):
+        matrix = geo.distance_matrix(POINTS[:2], POINTS, backend="python")
+        for row, origin in zip(matrix, POINTS[:2]):
+            for distance, destination in zip(row, POINTS):
+                self.assertAlmostEqual(distance, geo.haversine_km(*origin, *destination))
+        self.assertEqual(matrix[0][0], 0)
+
+    def test_chunks_hold_whole_rows(self):
+        chunks = list(geo.iter_distance_matrix(POINTS, POINTS, "python", chunk_cells=9))
+        self.assertEqual([start for start, _ in chunks], [0, 2])
+        self.assertEqual([len(block) for _, block in chunks], [2, 2])
+        self.assertEqual(list(geo.iter_distance_matrix([], POINTS)), [])
+
+    @skipIf(geo.numpy is None, "numpy is not installed")
+    def test_numpy_backend_matches_python(self):
+        numpy_matrix = geo.distance_matrix(POINTS, POINTS[::-1], backend="numpy")
+        python_matrix = geo.distance_matrix(POINTS, POINTS[::-1], backend="python")
+        for numpy_row, python_row in zip(numpy_matrix, python_matrix):
+            for a, b in zip(numpy_row, python_row):
+                self.assertAlmostEqual(a, b, places=6)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command(
+            "distance_benchmark",
+            origins=50,
+            destinations=40,
+            backends=["python"],
+            python_max_cells=1000,
+            chunk_cells=400,
+            stdout=out,
+        )
+        self.assertIn("50 x 40 matrix, 2,000 cells", out.getvalue())
+        # Whole chunks of 10 rows: it stops after the third one.
+        self.assertIn("first 1,200 cells", out.getvalue())
+
+
+class DistanceEndpointTest(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_user(
+            username="admin",
+            password="password123",
+            role=User.Role.ADMIN,
+            phone_number="1234567890",
+        )
+        self.ride = Ride.objects.create(
+            status="pickup",
+            id_rider=self.admin_user,
+            id_driver=self.admin_user,
+            pickup_latitude=POINTS[0][0],
+            pickup_longitude=POINTS[0][1],
+            dropoff_latitude=POINTS[1][0],
+            dropoff_longitude=POINTS[1][1],
+            pickup_time="2025-03-01T10:00:00Z",
+        )
+        self.client.force_authenticate(user=self.admin_user)
+        self.url = reverse("ride-distances")
+
+    def test_matrix_with_points_and_rides(self):
+        body = {
+            "origins": [{"ride": self.ride.pk}, {"ride": self.ride.pk, "end": "dropoff"}],
+            "destinations": [list(POINTS[2]), [POINTS[0][0], POINTS[0][1]]],
+            "speed_kmh": 60,
+        }
+        # Authentication aside, one query loads every referenced ride.
+        with self.assertNumQueries(1):
+            response = self.client.post(self.url, body, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["origins"], [list(POINTS[0]), list(POINTS[1])])
+        expected = geo.haversine_km(*POINTS[1], *POINTS[2])
+        self.assertAlmostEqual(response.data["distances_km"][1][0], expected, places=2)
+        self.assertEqual(response.data["distances_km"][0][1], 0)
+        self.assertAlmostEqual(response.data["eta_seconds"][1][0], expected * 60, delta=1)
+
+    def test_invalid_requests(self):
+        for body in (
+            {"origins": [[91, 0]], "destinations": [[0, 0]]},
+            {"origins": [["a", 0]], "destinations": [[0, 0]]},
+            {"origins": [{"ride": "1"}], "destinations": [[0, 0]]},
+            {"origins": [], "destinations": [[0, 0]]},
+            {"origins": [{"ride": 999}], "destinations": [[0, 0]]},
+        ):
+            response = self.client.post(self.url, body, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, body)
+
+    @override_settings(DISTANCE_MATRIX_MAX_CELLS=3)
+    def test_matrix_size_limit(self):
+        body = {"origins": [[0, 0], [1, 1]], "destinations": [[0, 0], [1, 1]]}
+        response = self.client.post(self.url, body, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,5 +1,5 @@
 from django.test import TestCase
-from ride_app.models import Ride, User
+from ride_app.models import Ride, RideEvent, User
 from ride_app.filters import RideFilter
 
 class RideFilterTestCase(TestCase):
@@ -84,3 +84,13 @@ class RideFilterTestCase(TestCase):
         qs = filtered.qs
         self.assertEqual(qs.count(), 1)
         self.assertEqual(qs.first().id_rider.email, "bob@example.com")
+
+    def test_filter_by_event_kind(self):
+        # Rides with a dropoff event, listed once even with several of them.
+        RideEvent.objects.create(id_ride=self.ride1, description="Status changed to dropoff")
+        RideEvent.objects.create(id_ride=self.ride1, description="Status changed to dropoff")
+        RideEvent.objects.create(id_ride=self.ride2, description="Status changed to pickup")
+        data = {'event_kind': RideEvent.Kind.DROPOFF}
+        filtered = RideFilter(data=data, queryset=Ride.objects.all())
+        self.assertEqual(list(filtered.qs), [self.ride1])
+        self.assertFalse(RideFilter(data={'event_kind': 9}, queryset=Ride.objects.all()).is_valid())
@@ -0,0 +1,254 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+from ride_app import idempotency
+from ride_app.models import IdempotencyRecord, Ride, User
+
+
+# Sends the same first-use Idempotency-Key from several threads at once to a
+# server on its own SQLite file, and prints each response's status and
+# whether it was replayed.
+CONCURRENT_SCRIPT = """
+import json, sys, threading
+import django
+django.setup()
+from django.core.management import call_command
+from django.db import connections
+from rest_framework.test import APIClient
+from ride_app.models import IdempotencyRecord, Ride, User
+
+threads = int(sys.argv[1])
+call_command("migrate", verbosity=0)
+admin = User.objects.create(username="admin", role=User.Role.ADMIN)
+ride = Ride.objects.create(
+    status="en-route",
+    id_rider=admin,
+    id_driver=admin,
+    pickup_latitude=10.0,
+    pickup_longitude=20.0,
+    dropoff_latitude=30.0,
+    dropoff_longitude=40.0,
+    pickup_time="2025-03-01T10:00:00Z",
+)
+barrier = threading.Barrier(threads)
+responses = []
+
+def send():
+    client = APIClient(raise_request_exception=False)
+    client.force_authenticate(admin)
+    barrier.wait()
+    response = client.patch(
+        f"/rides/{ride.pk}/", {"status": "pickup"}, format="json", headers={"Idempotency-Key": "k"}
+    )
+    responses.append([response.status_code, response.get("Idempotent-Replayed")])
+    connections.close_all()
+
+workers = [threading.Thread(target=send) for _ in range(threads)]
+for worker in workers:
+    worker.start()
+for worker in workers:
+    worker.join()
+print(json.dumps({"responses": responses, "records": IdempotencyRecord.objects.count()}))
+"""
+
+
+class IdempotencyKeyTest(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_user(
+            username="admin",
+            password="password123",
+            role=User.Role.ADMIN,
+            phone_number="1234567890",
+        )
+        self.client.force_authenticate(user=self.admin_user)
+        self.ride = Ride.objects.create(
+            status="en-route",
+            id_rider=self.admin_user,
+            id_driver=self.admin_user,
+            pickup_latitude=10.0,
+            pickup_longitude=20.0,
+            dropoff_latitude=30.0,
+            dropoff_longitude=40.0,
+            pickup_time="2025-03-01T10:00:00Z",
+        )
+        self.url = reverse("ride-detail", args=[self.ride.pk])
+
+    def patch(self, key=None, **changes):
+        headers = {"Idempotency-Key": key} if key is not None else {}
+        return self.client.patch(
+            self.url, {"status": "pickup", **changes}, format="json", headers=headers
+        )
+
+    def test_update_without_key(self):
+        self.assertEqual(self.patch().status_code, status.HTTP_200_OK)
+        self.assertEqual(self.patch(status="dropoff").status_code, status.HTTP_200_OK)
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.status, "dropoff")
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+    def create(self, key=None):
+        headers = {"Idempotency-Key": key} if key is not None else {}
+        data = {
+            "status": "en-route",
+            "rider_id": self.admin_user.pk,
+            "driver_id": self.admin_user.pk,
+            "pickup_latitude": 10.0,
+            "pickup_longitude": 20.0,
+            "dropoff_latitude": 30.0,
+            "dropoff_longitude": 40.0,
+            "pickup_time": "2025-03-01T11:00:00Z",
+        }
+        return self.client.post(reverse("ride-list"), data, format="json", headers=headers)
+
+    def test_create_without_key(self):
+        response = self.create()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["id_rider"]["id_user"], self.admin_user.pk)
+        self.assertEqual(Ride.objects.count(), 2)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+    def test_retried_create_inserts_one_ride(self):
+        first = self.create("create-1")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        retry = self.create("create-1")
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Ride.objects.exclude(pk=self.ride.pk).count(), 1)
+        self.assertEqual(IdempotencyRecord.objects.count(), 1)
+
+    def test_retry_replays_the_first_response(self):
+        first = self.patch("ride-1")
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Idempotent-Replayed", first)
+        Ride.objects.filter(pk=self.ride.pk).update(status="dropoff")
+        # Savepoint, lookup, release: nothing is validated or written.
+        with self.assertNumQueries(3):
+            retry = self.patch("ride-1")
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry.json(), first.json())
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.status, "dropoff")
+        # Keys are per user and per request.
+        self.assertEqual(self.patch("ride-2").status_code, status.HTTP_200_OK)
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.status, "pickup")
+
+    def test_fingerprint_after_the_body_was_parsed(self):
+        def fingerprint(data, **extra):
+            request = Request(
+                APIRequestFactory().patch(self.url, data, format="multipart", **extra),
+                parsers=[MultiPartParser(), FormParser()],
+            )
+            # As CSRF checks do for forms: parsing consumes the stream.
+            request.data
+            return idempotency.request_fingerprint(request)
+
+        self.assertEqual(fingerprint({"status": "dropoff"}), fingerprint({"status": "dropoff"}))
+        self.assertNotEqual(fingerprint({"status": "dropoff"}), fingerprint({"status": "pickup"}))
+        upload = SimpleUploadedFile("a.txt", b"abc")
+        self.assertNotEqual(fingerprint({"file": upload}), fingerprint({"status": "pickup"}))
+
+    def test_multipart_retry_is_replayed(self):
+        headers = {"Idempotency-Key": "form-1"}
+        first = self.client.patch(self.url, {"status": "dropoff"}, format="multipart", headers=headers)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        retry = self.client.patch(self.url, {"status": "dropoff"}, format="multipart", headers=headers)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        other = self.client.patch(self.url, {"status": "pickup"}, format="multipart", headers=headers)
+        self.assertEqual(other.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_key_reused_for_a_different_request(self):
+        self.patch("ride-1")
+        response = self.patch("ride-1", status="dropoff")
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.status, "pickup")
+
+    def test_errors_are_not_stored(self):
+        response = self.patch("ride-1", pickup_latitude="north")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+        self.assertEqual(self.patch("ride-1").status_code, status.HTTP_200_OK)
+        self.assertEqual(self.patch("x" * 256).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expired_records_are_replaced_and_evicted(self):
+        self.patch("ride-1")
+        self.patch("ride-2", status="dropoff")
+        IdempotencyRecord.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.patch("ride-1")
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.status, "pickup")
+        # The new record is kept, the other expired one evicted.
+        self.assertEqual(list(IdempotencyRecord.objects.values_list("key", flat=True)), ["ride-1"])
+
+    def test_concurrent_duplicate_replays_the_winner(self):
+        winner = self.patch("ride-1")
+        # The duplicate looked the key up before the winner committed, so its
+        # insert hits the unique constraint.
+        with mock.patch.object(idempotency, "_find", return_value=None):
+            response = self.patch("ride-1")
+        self.assertEqual(response["Idempotent-Replayed"], "true")
+        self.assertEqual(response.json(), winner.json())
+
+    def test_lock_contention_inside_a_transaction_is_a_conflict(self):
+        # TestCase's transaction can't be retried, so the lock is reported.
+        locked = OperationalError("database is locked")
+        with mock.patch.object(idempotency, "_execute", side_effect=locked) as execute:
+            response = self.patch("ride-1")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(execute.call_count, 1)
+        with mock.patch.object(idempotency, "_execute", side_effect=OperationalError("disk I/O error")):
+            with self.assertRaises(OperationalError):
+                self.patch("ride-1")
+
+
+class ConcurrentIdempotencyKeyTest(SimpleTestCase):
+    def run_concurrently(self, profile, threads=8):
+        with tempfile.TemporaryDirectory() as directory:
+            environment = {
+                **os.environ,
+                "DB_NAME": str(Path(directory) / "idempotency.sqlite3"),
+                "DB_PROFILE": profile,
+                "ALLOWED_HOSTS": "testserver",
+                "MAX_CONCURRENT_REQUESTS": "0",
+            }
+            environment.pop("DB_REPLICAS", None)
+            process = subprocess.run(
+                [sys.executable, "-c", CONCURRENT_SCRIPT, str(threads)],
+                cwd=settings.BASE_DIR,
+                env=environment,
+                capture_output=True,
+                text=True,
+            )
+        self.assertEqual(process.returncode, 0, process.stderr[-2000:])
+        return json.loads(process.stdout.strip().splitlines()[-1])
+
+    def test_concurrent_first_use_executes_once(self):
+        for profile in ["development", "production"]:
+            with self.subTest(profile=profile):
+                result = self.run_concurrently(profile)
+                codes = sorted(code for code, _ in result["responses"])
+                self.assertEqual(codes, [200] * 8)
+                executed = [replayed for _, replayed in result["responses"] if replayed is None]
+                self.assertEqual(len(executed), 1)
+                self.assertEqual(result["records"], 1)
@@ -0,0 +1,217 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from ride_app import jobs
+from ride_app.models import Job, Ride, RideEvent, User
+
+
+def create_trip(driver, start, trip_minutes, status="dropoff"):
+    ride = Ride.objects.create(
+        status=status,
+        id_rider=driver,
+        id_driver=driver,
+        pickup_latitude=10.0,
+        pickup_longitude=20.0,
+        dropoff_latitude=30.0,
+        dropoff_longitude=40.0,
+        pickup_time=start,
+    )
+    RideEvent.objects.create(id_ride=ride, description="Status changed to pickup", created_at=start)
+    RideEvent.objects.create(
+        id_ride=ride,
+        description="Status changed to dropoff",
+        created_at=start + timedelta(minutes=trip_minutes),
+    )
+    return ride
+
+
+@override_settings(JOB_QUEUE={"RESULT_TTL": 60, "MAX_ATTEMPTS": 2, "RETRY_DELAY": 0})
+class JobQueueTest(TestCase):
+    def setUp(self):
+        self.driver = User.objects.create_user(
+            username="driver", password="password123", first_name="Dana", last_name="Smith"
+        )
+        self.start = timezone.make_aware(timezone.datetime(2025, 3, 5, 10))
+        create_trip(self.driver, self.start, 90)
+        create_trip(self.driver, self.start, 30)
+        jobs.JOB_KINDS.pop("flaky", None)
+        self.addCleanup(jobs.JOB_KINDS.pop, "flaky", None)
+
+    def test_submit_reuses_pending_and_recent_jobs(self):
+        job, created = jobs.submit("driver_report")
+        self.assertTrue(created)
+        self.assertEqual(job.params, {"min_trip_seconds": 3600.0})
+        # Defaults and explicit values hash the same.
+        self.assertEqual(jobs.submit("driver_report", {"min_trip_seconds": 3600}), (job, False))
+        self.assertTrue(jobs.submit("driver_report", {"min_trip_seconds": 60})[1])
+
+        jobs.run_job(jobs.claim_job())
+        self.assertEqual(jobs.submit("driver_report")[0], job)
+        Job.objects.filter(pk=job.pk).update(finished_at=timezone.now() - timedelta(minutes=5))
+        self.assertTrue(jobs.submit("driver_report")[1])
+
+    def test_invalid_submissions(self):
+        with self.assertRaises(ValueError):
+            jobs.submit("payroll")
+        with self.assertRaises(ValueError):
+            jobs.submit("driver_report", {"month": "2025-03"})
+        invalid = [
+            ("driver_report", {"min_trip_seconds": "long"}),
+            # Values of another JSON type are rejected, not coerced.
+            ("driver_report", {"min_trip_seconds": "3600"}),
+            ("driver_report", {"min_trip_seconds": True}),
+            ("rides_export", {"status": 3}),
+            ("rides_export", {"batch_size": 100.5}),
+            # int(True) would be 1: purge user 1.
+            ("purge", {"user_id": True, "dry_run": False}),
+            # bool("false") would be True, bool(0) False.
+            ("purge", {"ride_days": 365, "dry_run": "false"}),
+            ("purge", {"ride_days": 365, "dry_run": 0}),
+        ]
+        for kind, params in invalid:
+            with self.subTest(kind=kind, params=params):
+                with self.assertRaises(ValueError):
+                    jobs.submit(kind, params)
+        self.assertFalse(Job.objects.exists())
+
+    def test_driver_report(self):
+        job, _ = jobs.submit("driver_report")
+        self.assertTrue(jobs.run_job(jobs.claim_job()))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.SUCCEEDED)
+        self.assertEqual(job.progress, 1)
+        self.assertJSONEqual(
+            job.result,
+            [{"month": "2025-03", "id_driver": self.driver.pk, "driver": "Dana S", "trip_count": 1}],
+        )
+
+    def test_rides_export_in_batches(self):
+        progress = []
+        output = jobs.rides_export({"status": "DROPOFF", "batch_size": 1}, progress.append)
+        lines = output.splitlines()
+        self.assertEqual(lines[0].split(","), jobs.EXPORT_FIELDS)
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(progress, [0.5, 1.0])
+
+    def test_failures_are_retried_then_failed(self):
+        calls = []
+
+        @jobs.register("flaky")
+        def flaky(params, progress):
+            calls.append(1)
+            raise RuntimeError("boom")
+
+        job, _ = jobs.submit("flaky")
+        with self.assertLogs("ride_app.jobs", "ERROR"):
+            self.assertFalse(jobs.run_job(jobs.claim_job()))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.QUEUED, 1))
+        self.assertIn("RuntimeError: boom", job.error)
+        with self.assertLogs("ride_app.jobs", "ERROR"):
+            self.assertFalse(jobs.run_job(jobs.claim_job()))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, 2))
+        self.assertIsNone(jobs.claim_job())
+        self.assertEqual(len(calls), 2)
+        # A failed job isn't reused.
+        self.assertTrue(jobs.submit("flaky")[1])
+
+    def test_abandoned_jobs_are_reclaimed(self):
+        job, _ = jobs.submit("driver_report")
+        claimed = jobs.claim_job()
+        self.assertEqual(claimed, job)
+        self.assertIsNone(jobs.claim_job())
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = jobs.claim_job()
+        self.assertEqual(reclaimed.attempts, 2)
+        # The first run finishing late doesn't overwrite the second attempt.
+        self.assertTrue(jobs.run_job(claimed))
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.Status.RUNNING)
+        # Out of attempts: a second abandonment fails the job.
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(jobs.claim_job())
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.Status.FAILED)
+
+    def test_worker_kills_jobs_past_their_timeout(self):
+        job, _ = jobs.submit("driver_report")
+        job = jobs.claim_job()
+        worker = jobs.Worker(log=lambda message: None)
+        process = mock.Mock(is_alive=mock.Mock(return_value=True))
+        worker.running[job.pk] = (process, job, 0)
+        worker.reap()
+        process.terminate.assert_called_once()
+        self.assertEqual(worker.running, {})
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.QUEUED)
+        self.assertIn("Timed out", job.error)
+
+    def test_worker_command_inline(self):
+        jobs.submit("driver_report")
+        jobs.submit("rides_export")
+        out = StringIO()
+        call_command("worker", processes=0, burst=True, stdout=out)
+        self.assertEqual(out.getvalue().count("started"), 2)
+        self.assertFalse(Job.objects.exclude(status=Job.Status.SUCCEEDED).exists())
+
+
+class JobAPITest(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_user(
+            username="admin",
+            password="password123",
+            role=User.Role.ADMIN,
+            phone_number="1234567890",
+        )
+        create_trip(self.admin_user, timezone.now() - timedelta(days=1), 30)
+        self.client.force_authenticate(user=self.admin_user)
+
+    def test_submit_poll_and_download(self):
+        response = self.client.post(
+            reverse("job-list"), {"kind": "rides_export", "params": {"status": "dropoff"}}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], Job.Status.QUEUED)
+        self.assertIsNone(response.data["result_url"])
+        detail = response["Location"]
+        result_url = reverse("job-result", args=[response.data["id_job"]])
+        self.assertEqual(self.client.get(result_url).status_code, status.HTTP_409_CONFLICT)
+
+        jobs.Worker(processes=0, log=lambda message: None).run(burst=True)
+        response = self.client.get(detail)
+        self.assertEqual(response.data["status"], Job.Status.SUCCEEDED)
+        self.assertTrue(response.data["result_url"].endswith(result_url))
+        response = self.client.get(result_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn("attachment;", response["Content-Disposition"])
+        self.assertEqual(len(response.content.decode().splitlines()), 2)
+        missing = reverse("job-result", args=["abc"])
+        self.assertEqual(self.client.get(missing).status_code, status.HTTP_404_NOT_FOUND)
+
+        # The same request again reuses the stored result.
+        response = self.client.post(
+            reverse("job-list"), {"kind": "rides_export", "params": {"status": "dropoff"}}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_invalid_params(self):
+        response = self.client.post(
+            reverse("job-list"), {"kind": "driver_report", "params": {"month": 3}}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("params", response.data)
+        for params in [{"user_id": True, "dry_run": False}, {"ride_days": 1, "dry_run": "false"}]:
+            with self.subTest(params=params):
+                response = self.client.post(
+                    reverse("job-list"), {"kind": "purge", "params": params}, format="json"
+                )
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn("params", response.data)
+        self.assertFalse(Job.objects.exists())
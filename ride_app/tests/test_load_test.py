@@ -0,0 +1,65 @@
+import json
+from io import StringIO
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from ride_app.loadtest import (
+    DEFAULT_MIX,
+    STATUSES,
+    TrafficGenerator,
+    parse_mix,
+    percentile,
+    summarize,
+)
+
+
+class LoadTestHelpersTest(SimpleTestCase):
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix("list=3, detail=1"), {"list": 3.0, "detail": 1.0})
+        with self.assertRaises(ValueError):
+            parse_mix("search=1")
+        with self.assertRaises(ValueError):
+            parse_mix("list=0")
+
+    def test_traffic_generator(self):
+        generator = TrafficGenerator(DEFAULT_MIX, (101, 200), seed=1)
+        requests = [generator.next_request() for _ in range(500)]
+        endpoints = {request[0] for request in requests}
+        self.assertEqual(endpoints, set(DEFAULT_MIX))
+        for endpoint, method, path, body in requests:
+            if endpoint in ("detail", "write"):
+                self.assertTrue(101 <= int(path.split("/")[2]) <= 200)
+            if method == "PATCH":
+                self.assertIn(body["status"], STATUSES)
+        # Detail reads are skewed towards a few rides.
+        details = [path for endpoint, _, path, _ in requests if endpoint == "detail"]
+        self.assertGreater(details.count("/rides/101/"), len(details) / 4)
+
+    def test_summarize(self):
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(percentile([1, 2, 3, 4], 99), 4)
+        samples = [
+            ("list", 200, 0.010, 3),
+            ("list", 200, 0.030, 3),
+            ("detail", 404, 0.005, 2),
+            ("detail", 0, 0.100, None),
+        ]
+        report = summarize(samples, elapsed=2.0)
+        self.assertEqual(report["total"]["requests"], 4)
+        self.assertEqual(report["total"]["throughput"], 2.0)
+        self.assertEqual(report["list"]["p50_ms"], 10.0)
+        self.assertEqual(report["list"]["error_rate"], 0)
+        self.assertEqual(report["detail"]["error_rate"], 1)
+        self.assertEqual(report["detail"]["statuses"], {"0": 1, "404": 1})
+        self.assertEqual(report["detail"]["queries_mean"], 2)
+
+
+class LoadTestCommandTest(SimpleTestCase):
+    def test_offline_run_against_sqlite(self):
+        out = StringIO()
+        call_command(
+            "load_test", processes=2, requests=15, rides=60, json=True, stdout=out
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["total"]["requests"], 30)
+        self.assertEqual(report["total"]["error_rate"], 0)
+        self.assertIsNotNone(report["total"]["queries_max"])
@@ -1,3 +1,7 @@
+from importlib import import_module
+from unittest import mock
+from django.apps import apps
+from django.db import connection
 from django.test import TestCase
 from django.utils import timezone
 from ride_app.models import User, Ride, RideEvent
@@ -118,3 +122,27 @@ class RideEventModelTest(TestCase):
         self.assertEqual(events.count(), 2)
         self.assertIn(event1, events)
         self.assertIn(event2, events)
+
+    def test_event_kind_derived_from_description(self):
+        pickup = RideEvent.objects.create(id_ride=self.ride, description="Status changed to pickup")
+        note = RideEvent.objects.create(id_ride=self.ride, description="Driver is 2 minutes away")
+        explicit = RideEvent.objects.create(
+            id_ride=self.ride, description="Rider dropped off early", event_kind=RideEvent.Kind.DROPOFF
+        )
+        self.assertEqual(pickup.event_kind, RideEvent.Kind.PICKUP)
+        self.assertEqual(note.event_kind, RideEvent.Kind.OTHER)
+        self.assertEqual(explicit.event_kind, RideEvent.Kind.DROPOFF)
+
+    def test_populate_event_kind_migration(self):
+        populate_event_kind = import_module(
+            "ride_app.migrations.0005_populate_event_kind"
+        ).populate_event_kind
+        RideEvent.objects.create(id_ride=self.ride, description="Status changed to cancelled")
+        RideEvent.objects.create(id_ride=self.ride, description="Driver is 2 minutes away")
+        # Rows written before the column existed all start as OTHER.
+        RideEvent.objects.update(event_kind=RideEvent.Kind.OTHER)
+        populate_event_kind(apps, mock.Mock(connection=connection))
+        self.assertEqual(
+            sorted(RideEvent.objects.values_list("event_kind", flat=True)),
+            [RideEvent.Kind.OTHER, RideEvent.Kind.CANCELLED],
+        )
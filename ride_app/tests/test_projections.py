@@ -0,0 +1,156 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from ride_app.models import ProjectionCheckpoint, Ride, RideEvent, RideProjection, User
+from ride_app.projections import RideProjector, parse_status, status_durations
+
+
+class RideProjectorTest(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_user(
+            username="admin",
+            password="password123",
+            role=User.Role.ADMIN,
+            phone_number="1234567890",
+        )
+        self.start = timezone.now() - timedelta(hours=3)
+        self.rides = [self.create_ride() for _ in range(3)]
+
+    def create_ride(self):
+        return Ride.objects.create(
+            status="en-route",
+            id_rider=self.admin_user,
+            id_driver=self.admin_user,
+            pickup_latitude=10.0,
+            pickup_longitude=20.0,
+            dropoff_latitude=30.0,
+            dropoff_longitude=40.0,
+            pickup_time=self.start,
+        )
+
+    def add_event(self, ride, description, minutes):
+        return RideEvent.objects.create(
+            id_ride=ride,
+            description=description,
+            created_at=self.start + timedelta(minutes=minutes),
+        )
+
+    def add_trip(self, ride, trip_minutes):
+        self.add_event(ride, "Status changed to en-route", 0)
+        self.add_event(ride, "Driver is 2 minutes away", 5)
+        self.add_event(ride, "Status changed to pickup", 10)
+        self.add_event(ride, "Status changed to dropoff", 10 + trip_minutes)
+
+    def test_parse_status(self):
+        self.assertEqual(parse_status("Status changed to pickup"), "pickup")
+        self.assertIsNone(parse_status("Driver is 2 minutes away"))
+        self.assertIsNone(parse_status("Status changed to "))
+
+    def test_catch_up_builds_projection(self):
+        self.add_trip(self.rides[0], 90)
+        self.assertEqual(RideProjector().catch_up(), 4)
+        projection = RideProjection.objects.get(id_ride=self.rides[0])
+        self.assertEqual(projection.status, "dropoff")
+        self.assertEqual([status for status, _ in projection.timeline], ["en-route", "pickup", "dropoff"])
+        self.assertEqual(projection.pickup_at, self.start + timedelta(minutes=10))
+        self.assertEqual(projection.trip_seconds, 90 * 60)
+        self.assertEqual(projection.event_count, 4)
+        self.assertEqual(
+            status_durations(projection.timeline), {"en-route": 600, "pickup": 5400}
+        )
+
+    def test_events_without_a_kind_time_trips(self):
+        # bulk_create skips save(), so the kinds stay OTHER.
+        RideEvent.objects.bulk_create(
+            RideEvent(
+                id_ride=self.rides[0],
+                description=f"Status changed to {status}",
+                created_at=self.start + timedelta(minutes=minutes),
+            )
+            for status, minutes in [("pickup", 10), ("dropoff", 55)]
+        )
+        self.assertEqual(set(RideEvent.objects.values_list("event_kind", flat=True)), {0})
+        RideProjector().catch_up()
+        projection = RideProjection.objects.get(id_ride=self.rides[0])
+        self.assertEqual(projection.status, "dropoff")
+        self.assertEqual(projection.pickup_at, self.start + timedelta(minutes=10))
+        self.assertEqual(projection.trip_seconds, 45 * 60)
+
+    def test_incremental_catch_up_in_batches(self):
+        projector = RideProjector(batch_size=3)
+        self.add_event(self.rides[0], "Status changed to en-route", 0)
+        self.add_event(self.rides[1], "Status changed to en-route", 0)
+        self.assertEqual(projector.catch_up(), 2)
+        last = self.add_event(self.rides[0], "Status changed to pickup", 10)
+        self.add_trip(self.rides[2], 30)
+        progress = []
+        self.assertEqual(projector.catch_up(progress=progress.append), 5)
+        self.assertEqual(progress, [3, 5])
+        self.assertEqual(RideProjection.objects.get(id_ride=self.rides[0]).status, "pickup")
+        self.assertEqual(RideProjection.objects.get(id_ride=self.rides[2]).trip_seconds, 1800)
+        self.assertGreater(projector.position(), last.id_ride_event)
+        self.assertEqual(projector.catch_up(), 0)
+
+    def test_late_event_behind_checkpoint(self):
+        projector = RideProjector()
+        self.add_event(self.rides[0], "Status changed to en-route", 0)
+        late = self.add_event(self.rides[0], "Status changed to pickup", 10)
+        self.add_event(self.rides[1], "Status changed to en-route", 0)
+        # Not committed yet when the projector passes its id.
+        RideEvent.objects.filter(pk=late.pk).delete()
+        self.assertEqual(projector.catch_up(), 2)
+        checkpoint = ProjectionCheckpoint.objects.get()
+        self.assertEqual([event_id for event_id, _ in checkpoint.gaps], [late.pk])
+
+        late.save(force_insert=True)
+        self.assertEqual(projector.catch_up(), 1)
+        self.assertEqual(ProjectionCheckpoint.objects.get().gaps, [])
+        self.assertEqual(RideProjection.objects.get(id_ride=self.rides[0]).status, "pickup")
+
+        # Gaps that never fill expire.
+        RideEvent.objects.filter(pk=late.pk).delete()
+        self.add_event(self.rides[1], "Status changed to pickup", 10)
+        projector.replay()
+        self.assertEqual(len(ProjectionCheckpoint.objects.get().gaps), 1)
+        self.assertEqual(RideProjector(gap_timeout=0).catch_up(), 0)
+        self.assertEqual(ProjectionCheckpoint.objects.get().gaps, [])
+
+    def test_replay_matches_catch_up(self):
+        for minutes, ride in zip((20, 70, 130), self.rides):
+            self.add_trip(ride, minutes)
+        RideProjector(batch_size=5).catch_up()
+        incremental = list(RideProjection.objects.order_by("id_ride").values())
+        RideProjection.objects.filter(id_ride=self.rides[0]).update(status="corrupted")
+        out = StringIO()
+        call_command("project_rides", "--replay", "--batch-size", "2", stdout=out)
+        self.assertIn("Applied 12 events", out.getvalue())
+        self.assertEqual(list(RideProjection.objects.order_by("id_ride").values()), incremental)
+        self.assertEqual(ProjectionCheckpoint.objects.get().position, RideEvent.objects.latest("pk").pk)
+
+    def test_timeline_endpoints_read_projection(self):
+        self.add_trip(self.rides[0], 90)
+        self.add_trip(self.rides[1], 20)
+        RideProjector().catch_up()
+        self.client.force_authenticate(user=self.admin_user)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("ride-timeline", args=[self.rides[0].id_ride]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], "dropoff")
+        self.assertEqual(response.data["trip_seconds"], 5400)
+        self.assertEqual(response.data["status_durations"]["pickup"], 5400)
+
+        response = self.client.get(reverse("ride-timeline", args=[self.rides[2].id_ride]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(reverse("ride-timeline", args=["abc"]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(reverse("ride-timelines"), {"min_trip_seconds": 3600})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["id_ride"] for r in response.data["results"]], [self.rides[0].id_ride])
+        response = self.client.get(reverse("ride-timelines"), {"min_trip_seconds": "x"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,131 @@
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from ride_app.models import User, Ride, RideEvent
+from ride_app.query_analysis import (
+    QueryBudgetExceeded,
+    analyze_queries,
+    fingerprint,
+)
+from ride_app.views import RideViewSet
+
+STRICT = {"ENABLED": True, "STRICT": True, "N_PLUS_ONE_THRESHOLD": 5, "SLOW_QUERY_MS": None}
+
+
+class FingerprintTest(TestCase):
+    def test_literals_are_normalized(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM ride_app_ride WHERE id_ride = 1"),
+            fingerprint("SELECT *  FROM ride_app_ride WHERE id_ride = 42"),
+        )
+        self.assertEqual(
+            fingerprint("SELECT * FROM ride_app_user WHERE email = 'a@b.c'"),
+            "SELECT * FROM ride_app_user WHERE email = ?",
+        )
+
+    def test_in_lists_collapse(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s)"),
+            fingerprint("SELECT * FROM t WHERE id IN (%s)"),
+        )
+
+
+class QueryAnalyzerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="rider",
+            password="password123",
+            role=User.Role.RIDER,
+            phone_number="1112223333",
+        )
+        self.rides = [
+            Ride.objects.create(
+                status="pickup",
+                id_rider=self.user,
+                id_driver=self.user,
+                pickup_latitude=10.0,
+                pickup_longitude=20.0,
+                dropoff_latitude=30.0,
+                dropoff_longitude=40.0,
+                pickup_time=timezone.now(),
+            )
+            for _ in range(6)
+        ]
+
+    def test_detects_n_plus_one(self):
+        with self.assertLogs("ride_app.queries", "WARNING") as logs:
+            with analyze_queries() as analyzer:
+                for ride in Ride.objects.all():
+                    ride.id_rider.username
+        self.assertIn("possible N+1", logs.output[0])
+        self.assertEqual(analyzer.count, 7)
+        repeated = analyzer.repeated_fingerprints()
+        self.assertEqual(list(repeated.values()), [6])
+        # The originating frame points back at this test.
+        origins = {query.origin for query in analyzer.queries}
+        self.assertTrue(any("test_query_analysis.py" in origin for origin in origins))
+
+    def test_strict_mode_raises(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with analyze_queries(strict=True, budget=1):
+                list(Ride.objects.all())
+                list(User.objects.all())
+
+    def test_select_related_passes(self):
+        with analyze_queries(strict=True, budget=1) as analyzer:
+            for ride in Ride.objects.select_related("id_rider"):
+                ride.id_rider.username
+        self.assertEqual(analyzer.count, 1)
+
+
+@override_settings(QUERY_ANALYSIS=STRICT)
+class RideViewSetQueryBudgetTest(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_user(
+            username="admin",
+            password="password123",
+            role=User.Role.ADMIN,
+            phone_number="1234567890",
+        )
+        for _ in range(8):
+            ride = Ride.objects.create(
+                status="pickup",
+                id_rider=self.admin_user,
+                id_driver=self.admin_user,
+                pickup_latitude=10.0,
+                pickup_longitude=20.0,
+                dropoff_latitude=30.0,
+                dropoff_longitude=40.0,
+                pickup_time=timezone.now(),
+            )
+            RideEvent.objects.create(id_ride=ride, description="Status changed to pickup")
+        self.ride = ride
+        self.client = APIClient()
+        self.client.login(username="admin", password="password123")
+
+    def test_list_within_budget(self):
+        response = self.client.get(reverse("ride-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(int(response["X-Query-Count"]), 5)
+
+    def test_retrieve_within_budget(self):
+        response = self.client.get(reverse("ride-detail", args=[self.ride.id_ride]))
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(int(response["X-Query-Count"]), 4)
+
+    def test_transition_within_budget(self):
+        ride = Ride.objects.filter(status="pickup").first()
+        response = self.client.post(
+            reverse("ride-transition", args=[ride.id_ride]), {"status": "dropoff"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        # Session, user, status, savepoint, update, event insert, the ride's
+        # stats keys and trip bounds, the stats upsert and the release.
+        self.assertEqual(int(response["X-Query-Count"]), 9)
+
+    def test_budget_overrun_fails_request(self):
+        with mock.patch.object(RideViewSet, "query_budgets", {"list": 1}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse("ride-list"))
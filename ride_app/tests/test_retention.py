@@ -0,0 +1,215 @@
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from ride_app import jobs, stats
+from ride_app.models import (
+    IdempotencyRecord,
+    Job,
+    Ride,
+    RideEvent,
+    RideProjection,
+    User,
+    UserDailyStats,
+)
+from ride_app.projections import RideProjector
+from ride_app.retention import Purge
+
+
+def stats_rows():
+    return {
+        (row.id_user_id, row.role, row.date): (
+            row.ride_count,
+            round(row.distance_km, 6),
+            row.trip_count,
+            row.trip_seconds,
+        )
+        for row in UserDailyStats.objects.all()
+    }
+
+
+class PurgeTest(TestCase):
+    def setUp(self):
+        self.rider = User.objects.create_user(username="rider")
+        self.driver = User.objects.create_user(username="driver")
+        self.now = timezone.now()
+        self.old_rides = [self.create_trip(days_ago=400 + n) for n in range(5)]
+        self.new_ride = self.create_trip(days_ago=3)
+        RideProjector().catch_up()
+
+    def create_trip(self, days_ago, rider=None, driver=None):
+        start = self.now - timedelta(days=days_ago)
+        ride = Ride.objects.create(
+            status="dropoff",
+            id_rider=rider or self.rider,
+            id_driver=driver or self.driver,
+            pickup_latitude=40.7,
+            pickup_longitude=-74.0,
+            dropoff_latitude=40.8,
+            dropoff_longitude=-73.9,
+            pickup_time=start,
+        )
+        for minutes, status in [(0, "pickup"), (30, "dropoff")]:
+            RideEvent.objects.create(
+                id_ride=ride,
+                description=f"Status changed to {status}",
+                created_at=start + timedelta(minutes=minutes),
+            )
+        return ride
+
+    def test_purges_old_rides_in_set_based_batches(self):
+        reports = []
+        purge = Purge(
+            rides_before=self.now - timedelta(days=365),
+            batch_size=2,
+            pause=0,
+            progress=lambda done, total: reports.append((done, total)),
+        )
+        with CaptureQueriesContext(connection) as queries:
+            counts = purge.run()
+
+        self.assertEqual(list(Ride.objects.values_list("pk", flat=True)), [self.new_ride.pk])
+        self.assertEqual(RideEvent.objects.count(), 2)
+        self.assertEqual(RideProjection.objects.count(), 1)
+        self.assertEqual((counts["rides"], counts["events"], counts["projections"]), (5, 10, 5))
+        self.assertEqual(reports, [(2, 5), (4, 5), (5, 5)])
+        # One DELETE of events per batch, however many events there are.
+        event_deletes = [
+            query
+            for query in queries.captured_queries
+            if query["sql"].startswith('DELETE FROM "ride_app_rideevent"')
+        ]
+        self.assertEqual(len(event_deletes), 3)
+
+        # The stats were adjusted as if the rides had been deleted one by one.
+        purged = stats_rows()
+        stats.rebuild()
+        self.assertEqual(purged, stats_rows())
+
+    def test_batches_over_the_parameter_limit_are_split(self):
+        purge = Purge(rides_before=self.now - timedelta(days=365), batch_size=5, pause=0)
+        with mock.patch.object(connection.features, "max_query_params", 2):
+            with CaptureQueriesContext(connection) as queries:
+                counts = purge.run()
+        self.assertEqual((counts["rides"], counts["events"], counts["projections"]), (5, 10, 5))
+        ride_deletes = [
+            query
+            for query in queries.captured_queries
+            if query["sql"].startswith('DELETE FROM "ride_app_ride" ')
+        ]
+        self.assertEqual(len(ride_deletes), 3)
+        self.assertEqual(list(Ride.objects.values_list("pk", flat=True)), [self.new_ride.pk])
+
+    def test_dry_run_only_counts(self):
+        counts = Purge(
+            rides_before=self.now - timedelta(days=365),
+            events_before=self.now - timedelta(days=2),
+            user_ids=[self.driver.pk],
+            dry_run=True,
+        ).run()
+        self.assertEqual(
+            counts,
+            {
+                "rides": 6,
+                "events": 12,
+                "projections": 6,
+                "user_daily_stats": 6,
+                "idempotency_records": 0,
+                "users": 1,
+            },
+        )
+        self.assertEqual(Ride.objects.count(), 6)
+
+    def test_purges_old_events_only(self):
+        RideEvent.objects.create(id_ride=self.new_ride, description="Driver called")
+        before = stats_rows()
+        counts = Purge(events_before=self.now - timedelta(days=2), pause=0).run()
+        self.assertEqual(counts["events"], 12)
+        self.assertEqual(counts["rides"], 0)
+        self.assertEqual(
+            list(RideEvent.objects.values_list("description", flat=True)), ["Driver called"]
+        )
+        # Stats and projections keep what the events told them.
+        self.assertEqual(stats_rows(), before)
+        self.assertEqual(RideProjection.objects.get(id_ride=self.new_ride).trip_seconds, 1800)
+        with self.assertRaises(ValueError):
+            Purge(events_before=self.now - timedelta(hours=12))
+
+    def test_purges_users_with_their_rides(self):
+        other = User.objects.create_user(username="other")
+        shared = self.create_trip(days_ago=1, rider=other)
+        own = self.create_trip(days_ago=1, rider=other, driver=other)
+        Token.objects.create(user=self.driver)
+        IdempotencyRecord.objects.create(
+            id_user=self.driver,
+            key="k",
+            fingerprint="f",
+            status_code=201,
+            response="{}",
+            expires_at=self.now + timedelta(days=1),
+        )
+        counts = Purge(user_ids=[self.driver.pk, self.rider.pk], pause=0).run()
+
+        self.assertEqual(counts["users"], 2)
+        self.assertEqual(counts["rides"], 7)
+        self.assertEqual(counts["idempotency_records"], 1)
+        self.assertEqual(list(Ride.objects.values_list("pk", flat=True)), [own.pk])
+        self.assertFalse(Ride.objects.filter(pk=shared.pk).exists())
+        self.assertEqual(set(User.objects.values_list("username", flat=True)), {"other"})
+        self.assertFalse(Token.objects.exists())
+        # The other user keeps only the stats of their remaining ride.
+        purged = stats_rows()
+        self.assertEqual({key[0] for key in purged}, {other.pk})
+        stats.rebuild()
+        self.assertEqual(purged, stats_rows())
+
+    def test_command(self):
+        out = StringIO()
+        call_command("purge", rides_older_than=365, dry_run=True, stdout=out)
+        self.assertIn("Would delete:", out.getvalue())
+        self.assertEqual(Ride.objects.count(), 6)
+
+        out = StringIO()
+        call_command("purge", rides_older_than=365, batch_size=10, pause=0, stdout=out)
+        self.assertIn("5/5 rides, events and users purged", out.getvalue())
+        self.assertRegex(out.getvalue(), r"rides\s+5\n")
+        self.assertEqual(Ride.objects.count(), 1)
+
+        with self.assertRaises(CommandError):
+            call_command("purge", stdout=StringIO())
+        with self.settings(RETENTION={"RIDE_DAYS": 1, "PAUSE": 0}):
+            call_command("purge", enforce=True, stdout=StringIO())
+        self.assertFalse(Ride.objects.exists())
+
+    def test_purge_job(self):
+        job, _ = jobs.submit("purge", {"ride_days": 365})
+        self.assertTrue(jobs.run_job(jobs.claim_job()))
+        job.refresh_from_db()
+        result = json.loads(job.result)
+        self.assertEqual(result["dry_run"], True)
+        self.assertEqual(result["deleted"]["rides"], 5)
+        self.assertEqual(Ride.objects.count(), 6)
+
+        params = {"ride_days": 365, "dry_run": False}
+        first, _ = jobs.submit("purge", params)
+        # Pending purges are deduplicated ...
+        self.assertEqual(jobs.submit("purge", params), (first, False))
+        self.assertTrue(jobs.run_job(jobs.claim_job()))
+        self.assertEqual(Ride.objects.count(), 1)
+
+        # ... but a finished one is not reused: rides that expired since are
+        # purged by the next submission.
+        expired = self.create_trip(days_ago=500)
+        again, created = jobs.submit("purge", params)
+        self.assertTrue(created)
+        self.assertTrue(jobs.run_job(jobs.claim_job()))
+        self.assertEqual(json.loads(Job.objects.get(pk=again.pk).result)["deleted"]["rides"], 1)
+        self.assertFalse(Ride.objects.filter(pk=expired.pk).exists())
@@ -0,0 +1,77 @@
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+from contextlib import redirect_stderr
+import yaml
+from django.conf import settings
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase
+from ride_app.schema import StaticSchemaView, generate_schema
+
+
+class SchemaFileTest(SimpleTestCase):
+    def test_schema_file_matches_live_introspection(self):
+        # If this fails, regenerate the file with `python manage.py build_schema`.
+        with redirect_stderr(io.StringIO()):
+            live = yaml.safe_load(generate_schema())
+        with open(settings.OPENAPI_SCHEMA_FILE) as schema_file:
+            cached = yaml.safe_load(schema_file)
+        self.assertEqual(cached, live)
+
+    def test_build_schema_check(self):
+        out = io.StringIO()
+        with redirect_stderr(io.StringIO()):
+            call_command("build_schema", "--check", stdout=out)
+        self.assertIn("up to date", out.getvalue())
+
+    def test_build_schema_under_production_settings(self):
+        # Deploys rebuild the schema with the settings the workers use.
+        environment = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": "ride_core.settings_production",
+            "ALLOWED_HOSTS": "testserver",
+        }
+        process = subprocess.run(
+            [sys.executable, "manage.py", "build_schema", "--check"],
+            cwd=settings.BASE_DIR,
+            env=environment,
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(process.returncode, 0, process.stderr[-2000:])
+        self.assertIn("up to date", process.stdout)
+
+
+class StaticSchemaViewTest(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.view = StaticSchemaView.as_view()
+
+    def test_serves_yaml_with_etag(self):
+        response = self.view(self.factory.get("/schema/"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/vnd.oai.openapi")
+        self.assertIn("/rides/", yaml.safe_load(response.content)["paths"])
+        self.assertTrue(response["ETag"])
+
+        response = self.view(
+            self.factory.get("/schema/", HTTP_IF_NONE_MATCH=response["ETag"])
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_serves_json(self):
+        response = self.view(self.factory.get("/schema/", {"format": "json"}))
+        self.assertEqual(response["Content-Type"], "application/vnd.oai.openapi+json")
+        self.assertIn("/rides/", json.loads(response.content)["paths"])
+
+    def test_serves_gzip(self):
+        response = self.view(self.factory.get("/schema/", HTTP_ACCEPT_ENCODING="gzip, br"))
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        plain = self.view(self.factory.get("/schema/"))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(len(response.content), len(plain.content))
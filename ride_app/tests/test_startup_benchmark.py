@@ -0,0 +1,43 @@
+import json
+from io import StringIO
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from ride_app.management.commands.startup_benchmark import parse_importtime
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 | _io
+import time:        50 |         50 |     django.utils.version
+import time:       200 |        250 |   django.utils
+import time:       300 |        550 | django
+import time:        40 |         40 | rest_framework.settings
+"""
+
+
+class ParseImporttimeTest(SimpleTestCase):
+    def test_outermost_imports_per_package(self):
+        self.assertEqual(
+            parse_importtime(IMPORTTIME),
+            {"_io": 100, "django": 550, "rest_framework": 40},
+        )
+
+
+class StartupBenchmarkCommandTest(SimpleTestCase):
+    def test_production_profile_skips_dev_tools(self):
+        out = StringIO()
+        call_command(
+            "startup_benchmark",
+            "--settings-module",
+            "ride_core.settings_production",
+            "--repeat",
+            "1",
+            "--json",
+            stdout=out,
+        )
+        (report,) = json.loads(out.getvalue())
+        # Anonymous requests are rejected by IsAdminRole, after the full stack ran.
+        self.assertEqual(report["status"], 403)
+        self.assertGreater(report["total_ms"], 0)
+        self.assertIn("django", report["imports_ms"])
+        self.assertNotIn("debug_toolbar", report["imports_ms"])
+        self.assertNotIn("drf_spectacular", report["imports_ms"])
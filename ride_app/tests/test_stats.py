@@ -0,0 +1,157 @@
+from datetime import timedelta
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from ride_app import stats
+from ride_app.geo import haversine_km
+from ride_app.models import Ride, RideEvent, User, UserDailyStats
+
+
+def stats_rows():
+    return {
+        (row.id_user_id, row.role, row.date): (
+            row.ride_count,
+            round(row.distance_km, 6),
+            row.trip_count,
+            row.trip_seconds,
+        )
+        for row in UserDailyStats.objects.all()
+        if row.ride_count or row.trip_count
+    }
+
+
+class UserDailyStatsTest(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_user(
+            username="admin",
+            password="password123",
+            role=User.Role.ADMIN,
+            phone_number="1234567890",
+        )
+        self.rider = User.objects.create_user(username="rider", password="password123")
+        self.start = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+        self.ride = self.create_ride()
+
+    def create_ride(self, **fields):
+        return Ride.objects.create(
+            **{
+                "status": "en-route",
+                "id_rider": self.rider,
+                "id_driver": self.admin_user,
+                "pickup_latitude": 40.7128,
+                "pickup_longitude": -74.0060,
+                "dropoff_latitude": 40.7306,
+                "dropoff_longitude": -73.9352,
+                "pickup_time": self.start,
+                **fields,
+            }
+        )
+
+    def add_event(self, ride, status, minutes):
+        return RideEvent.objects.create(
+            id_ride=ride,
+            description=f"Status changed to {status}",
+            created_at=self.start + timedelta(minutes=minutes),
+        )
+
+    def get(self, role, user=None):
+        user = user or (self.rider if role == "rider" else self.admin_user)
+        return UserDailyStats.objects.get(
+            id_user=user, role=role, date=timezone.localdate(self.start)
+        )
+
+    def test_haversine(self):
+        self.assertAlmostEqual(haversine_km(40.7128, -74.0060, 34.0522, -118.2437), 3936, delta=5)
+        self.assertEqual(haversine_km(10, 20, 10, 20), 0)
+
+    def test_ride_writes_update_daily_stats(self):
+        distance = haversine_km(40.7128, -74.0060, 40.7306, -73.9352)
+        rider_stats = self.get("rider")
+        self.assertEqual(rider_stats.ride_count, 1)
+        self.assertAlmostEqual(rider_stats.distance_km, distance)
+        self.assertEqual(self.get("driver").ride_count, 1)
+        self.assertEqual(rider_stats.trip_count, 0)
+
+        self.add_event(self.ride, "pickup", 10)
+        self.add_event(self.ride, "dropoff", 40)
+        self.assertEqual((self.get("rider").trip_count, self.get("rider").trip_seconds), (1, 1800))
+        # A later dropoff lengthens the same trip.
+        late = self.add_event(self.ride, "dropoff", 70)
+        self.assertEqual((self.get("driver").trip_count, self.get("driver").trip_seconds), (1, 3600))
+        late.delete()
+        self.assertEqual(self.get("driver").trip_seconds, 1800)
+
+        # Status-only saves don't touch the stats.
+        self.ride.status = "dropoff"
+        with self.assertNumQueries(1):
+            self.ride.save(update_fields=["status"])
+
+        # Moving the pickup a day earlier moves the ride and its trip.
+        self.ride.pickup_time = self.start - timedelta(days=1)
+        self.ride.save()
+        self.assertEqual(self.get("rider").ride_count, 0)
+        self.assertEqual(self.get("rider").trip_count, 0)
+        self.assertEqual(
+            UserDailyStats.objects.get(
+                id_user=self.rider, role="rider", date=timezone.localdate(self.ride.pickup_time)
+            ).trip_seconds,
+            1800,
+        )
+
+        self.ride.delete()
+        self.assertEqual(stats_rows(), {})
+
+    def test_queries_per_write(self):
+        # The insert and one upsert for both stats rows.
+        with self.assertNumQueries(2):
+            ride = self.create_ride()
+        # The insert and one read of the ride with its trip bounds; a pickup
+        # alone completes no trip, so there is nothing to upsert.
+        with self.assertNumQueries(2):
+            self.add_event(ride, "pickup", 10)
+        # The dropoff completes the trip: one upsert more.
+        with self.assertNumQueries(3):
+            self.add_event(ride, "dropoff", 40)
+        with self.assertNumQueries(1):
+            self.add_event(ride, "cancelled", 50)
+        self.assertEqual((self.get("driver").trip_count, self.get("driver").trip_seconds), (1, 1800))
+
+    def test_rebuild_matches_incremental_updates(self):
+        other = self.create_ride(pickup_time=self.start - timedelta(days=3), id_driver=self.rider)
+        self.add_event(self.ride, "pickup", 0)
+        self.add_event(self.ride, "dropoff", 25)
+        self.add_event(other, "pickup", 5)
+        self.add_event(other, "cancelled", 6)
+        incremental = stats_rows()
+        self.assertEqual(stats.rebuild(batch_size=1), 4)
+        self.assertEqual(stats_rows(), incremental)
+
+    def test_stats_endpoint(self):
+        self.add_event(self.ride, "pickup", 0)
+        self.add_event(self.ride, "dropoff", 30)
+        self.create_ride(pickup_time=self.start - timedelta(days=10))
+        self.client.force_authenticate(user=self.admin_user)
+        url = reverse("user-stats", args=[self.rider.pk])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["rider"]["ride_count"], 2)
+        self.assertEqual(response.data["rider"]["active_days"], 2)
+        self.assertEqual(response.data["rider"]["average_trip_seconds"], 1800)
+        self.assertEqual(response.data["driver"]["ride_count"], 0)
+        self.assertIsNone(response.data["driver"]["average_trip_seconds"])
+
+        response = self.client.get(url, {"days": 7})
+        self.assertEqual(response.data["rider"]["ride_count"], 1)
+        self.assertEqual(response.data["end"], timezone.localdate().isoformat())
+        day = timezone.localdate(self.start - timedelta(days=10)).isoformat()
+        response = self.client.get(url, {"start": day, "end": day})
+        self.assertEqual(response.data["rider"]["ride_count"], 1)
+        self.assertEqual(response.data["rider"]["trip_count"], 0)
+
+        self.assertEqual(self.client.get(url, {"start": "March"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {"days": 0}).status_code, status.HTTP_400_BAD_REQUEST)
+        for pk in [999, "abc"]:
+            missing = reverse("user-stats", args=[pk])
+            self.assertEqual(self.client.get(missing).status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,97 @@
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from ride_app.middleware import ConcurrencyLimitMiddleware
+from ride_app.models import User
+from ride_app.throttling import ConcurrencyLimiter
+from ride_app.views import RideViewSet
+
+BUCKET = {"ENABLED": True, "CACHE": "default", "CAPACITY": 6, "REFILL_RATE": 0.01}
+
+
+@override_settings(RIDE_THROTTLE=BUCKET)
+class TokenBucketThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin_user = User.objects.create_user(
+            username="admin",
+            password="password123",
+            role=User.Role.ADMIN,
+            phone_number="1234567890",
+        )
+        self.other_admin = User.objects.create_user(
+            username="admin2",
+            password="password123",
+            role=User.Role.ADMIN,
+            phone_number="1234567891",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin_user)
+        self.url = reverse("ride-list")
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_bucket_exhaustion_returns_429(self):
+        for _ in range(6):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+    def test_buckets_are_per_user(self):
+        for _ in range(6):
+            self.client.get(self.url)
+        other = APIClient()
+        other.force_authenticate(user=self.other_admin)
+        self.assertEqual(other.get(self.url).status_code, status.HTTP_200_OK)
+
+    def test_distance_ordering_costs_more(self):
+        params = {"ordering": "distance", "lat": 1, "lng": 2}
+        self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_200_OK)
+        # 5 of 6 tokens are gone, so a second distance listing is refused...
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # ...while a plain listing still fits.
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+    def test_disabled_by_default(self):
+        with self.settings(RIDE_THROTTLE={"CAPACITY": 1}):
+            for _ in range(3):
+                self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+    def test_cost_weights(self):
+        view = RideViewSet()
+        factory = APIRequestFactory()
+        # 300 pages of 10 rides skipped: 3 extra tokens.
+        request = Request(factory.get("/rides/", {"page": 301}))
+        self.assertEqual(view.get_throttle_cost(request), 4)
+        request = Request(factory.get("/rides/", {"page": "x"}))
+        self.assertEqual(view.get_throttle_cost(request), 1)
+
+
+class ConcurrencyLimitTest(TestCase):
+    def test_limiter_admits_up_to_limit(self):
+        limiter = ConcurrencyLimiter()
+        self.assertTrue(limiter.acquire(2, 0))
+        self.assertTrue(limiter.acquire(2, 0))
+        self.assertFalse(limiter.acquire(2, 0.01))
+        limiter.release()
+        self.assertTrue(limiter.acquire(2, 0))
+
+    def test_middleware_sheds_load_with_503(self):
+        middleware = ConcurrencyLimitMiddleware(lambda request: HttpResponse("ok"))
+        request = RequestFactory().get("/rides/")
+        with override_settings(MAX_CONCURRENT_REQUESTS=1, CONCURRENCY_QUEUE_TIMEOUT=0):
+            # Simulate a request that is already in flight.
+            middleware.limiter.acquire(1, 0)
+            response = middleware(request)
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(response["Retry-After"], "1")
+            middleware.limiter.release()
+            self.assertEqual(middleware(request).status_code, status.HTTP_200_OK)
+        self.assertEqual(middleware.limiter.active, 0)
@@ -0,0 +1,146 @@
+import os
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from ride_app import transitions
+from ride_app.models import IdempotencyRecord, Ride, RideEvent, User, UserDailyStats
+from ride_app.working_set import active_rides
+
+
+def make_ride(rider, driver, status="en-route"):
+    return Ride.objects.create(
+        status=status,
+        id_rider=rider,
+        id_driver=driver,
+        pickup_latitude=40.7,
+        pickup_longitude=-74.0,
+        dropoff_latitude=40.8,
+        dropoff_longitude=-73.9,
+        pickup_time=timezone.now() - timedelta(minutes=10),
+    )
+
+
+class TransitionTest(TestCase):
+    def setUp(self):
+        self.rider = User.objects.create_user(username="rider")
+        self.driver = User.objects.create_user(username="driver")
+        self.ride = make_ride(self.rider, self.driver)
+
+    def test_conditional_update_without_row_locks(self):
+        with CaptureQueriesContext(connection) as queries:
+            previous, event = transitions.transition(self.ride.pk, "pickup")
+        self.assertEqual(previous, "en-route")
+        self.assertEqual(event.description, "Status changed to pickup")
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.status, "pickup")
+        sql = [query["sql"] for query in queries.captured_queries]
+        update = next(statement for statement in sql if statement.startswith("UPDATE"))
+        self.assertIn('"status" = ', update.split("WHERE")[1])
+        self.assertFalse(any("FOR UPDATE" in statement for statement in sql))
+
+    def test_stale_expected_status_conflicts(self):
+        transitions.transition(self.ride.pk, "pickup", expected="en-route")
+        with self.assertRaises(transitions.TransitionConflict) as raised:
+            transitions.transition(self.ride.pk, "cancelled", expected="en-route")
+        self.assertEqual(raised.exception.current_status, "pickup")
+        self.assertEqual(self.ride.ride_events.count(), 1)
+
+    def test_invalid_transitions(self):
+        with self.assertRaises(transitions.InvalidTransition):
+            transitions.transition(self.ride.pk, "dropoff")
+        with self.assertRaises(Ride.DoesNotExist):
+            transitions.transition(9999, "pickup")
+        self.assertTrue(transitions.is_allowed("Pickup", "DROPOFF"))
+        self.assertFalse(transitions.is_allowed("dropoff", "pickup"))
+        self.assertFalse(transitions.is_allowed("unknown", "pickup"))
+
+    def test_trip_is_recorded_in_the_stats(self):
+        transitions.transition(self.ride.pk, "pickup")
+        transitions.transition(self.ride.pk, "dropoff")
+        row = UserDailyStats.objects.get(id_user=self.driver, role="driver")
+        self.assertEqual((row.ride_count, row.trip_count), (1, 1))
+
+    @skipUnless(os.environ.get("SLOW_TESTS"), "runs a separate interpreter; set SLOW_TESTS=1")
+    def test_stress_command(self):
+        out = StringIO()
+        call_command("transition_stress", threads=4, rides=6, contenders=2, stdout=out)
+        self.assertIn("0 errors, 0 violations", out.getvalue())
+
+
+class TransitionViewTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username="admin", email="admin@example.com", role=User.Role.ADMIN
+        )
+        self.driver = User.objects.create_user(username="driver", email="driver@example.com")
+        self.ride = make_ride(self.admin, self.driver)
+        self.url = reverse("ride-transition", args=[self.ride.pk])
+        self.client.force_authenticate(self.admin)
+
+    def test_returns_the_new_state(self):
+        response = self.client.post(self.url, {"status": "pickup"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["id_ride"], self.ride.pk)
+        self.assertEqual(response.data["status"], "pickup")
+        self.assertEqual(response.data["previous_status"], "en-route")
+        self.assertEqual(response.data["event"]["description"], "Status changed to pickup")
+        self.assertEqual(
+            response.data["event"]["id_ride_event"],
+            RideEvent.objects.get(id_ride=self.ride).pk,
+        )
+
+    def test_conflicts_and_errors(self):
+        response = self.client.post(self.url, {"status": "dropoff"}, format="json")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["status"], "en-route")
+
+        self.client.post(self.url, {"status": "pickup"}, format="json")
+        response = self.client.post(
+            self.url, {"status": "cancelled", "expected_status": "en-route"}, format="json"
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["status"], "pickup")
+
+        for body in [{"status": "pickup", "expected_status": "dropoff"}, {"status": "flying"}, {}]:
+            with self.subTest(body=body):
+                self.assertEqual(self.client.post(self.url, body, format="json").status_code, 400)
+        missing = reverse("ride-transition", args=[9999])
+        response = self.client.post(missing, {"status": "pickup"}, format="json")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.ride.ride_events.count(), 1)
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(self.driver)
+        response = self.client.post(self.url, {"status": "pickup"}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+    def test_retries_with_the_same_key_are_replayed(self):
+        headers = {"Idempotency-Key": "transition-1"}
+        first = self.client.post(self.url, {"status": "pickup"}, format="json", headers=headers)
+        again = self.client.post(self.url, {"status": "pickup"}, format="json", headers=headers)
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json(), first.json())
+        self.assertEqual(self.ride.ride_events.count(), 1)
+        self.assertEqual(IdempotencyRecord.objects.count(), 1)
+
+    @override_settings(ACTIVE_RIDES={"ENABLED": True, "RECONCILE_SECONDS": 3600})
+    def test_updates_the_working_set_on_commit(self):
+        active_rides.clear()
+        self.addCleanup(active_rides.clear)
+        self.assertTrue(active_rides.ready())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, {"status": "pickup"}, format="json")
+        self.assertEqual(active_rides.get(self.ride.pk).status, "pickup")
+        self.assertEqual(len(active_rides.get(self.ride.pk).events), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, {"status": "dropoff"}, format="json")
+        self.assertIsNone(active_rides.get(self.ride.pk))
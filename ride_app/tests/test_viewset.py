@@ -1,4 +1,5 @@
 from datetime import timedelta
+from django.test import override_settings
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
@@ -138,3 +139,52 @@ class RideViewSetTests(APITestCase):
         results = response.data["results"]
         distances_desc = [calc_distance(ride) for ride in results]
         self.assertEqual(distances_desc, sorted(distances_desc, reverse=True))
+
+    def test_normalized_shape(self):
+        self.client.force_authenticate(user=self.admin_user)
+        url = reverse("ride-list")
+        response = self.client.get(url, {"shape": "normalized"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual(len(results), 2)
+        # Rides reference users by id; each user is serialized once.
+        for ride in results:
+            self.assertEqual(ride["id_rider"], self.admin_user.id_user)
+            self.assertEqual(ride["id_driver"], self.admin_user.id_user)
+        users = response.data["included"]["users"]
+        self.assertEqual(list(users), [str(self.admin_user.id_user)])
+        self.assertEqual(users[str(self.admin_user.id_user)]["role"], User.Role.ADMIN)
+
+    def test_batch_keeps_requested_order_and_reports_missing(self):
+        self.client.force_authenticate(user=self.admin_user)
+        url = reverse("ride-batch")
+        ids = f"{self.ride2.pk},9999,{self.ride1.pk},{self.ride2.pk}"
+        # Authentication aside: rides with their users, then today's events.
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {"ids": ids})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [ride["id_ride"] for ride in response.data["results"]],
+            [self.ride2.pk, self.ride1.pk],
+        )
+        self.assertEqual(response.data["missing"], [9999])
+        detail = self.client.get(reverse("ride-detail", args=[self.ride1.pk]))
+        self.assertEqual(response.data["results"][1], detail.data)
+
+        # Repeated parameters work too.
+        response = self.client.get(f"{url}?ids={self.ride1.pk}&ids=9998")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["missing"], [9998])
+
+    @override_settings(RIDE_BATCH_MAX_IDS=3)
+    def test_batch_validates_ids(self):
+        self.client.force_authenticate(user=self.admin_user)
+        url = reverse("ride-batch")
+        for ids in ["", "1,x", "0", "1,2,3,4"]:
+            with self.subTest(ids=ids):
+                response = self.client.get(url, {"ids": ids})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn("ids", response.data)
+        # Duplicates count once towards the limit.
+        response = self.client.get(url, {"ids": "1,1,2,3"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -0,0 +1,264 @@
+import math
+import random
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from ride_app.models import Ride, RideEvent, User
+from ride_app.serializers import UserSerializer
+from ride_app.working_set import USER_FIELDS, ActiveRideSet, active_rides
+
+ENABLED = {"ENABLED": True, "RECONCILE_SECONDS": 3600, "CELL_DEGREES": 0.01}
+
+
+def make_ride(rider, driver, status="en-route", lat=40.7, lng=-74.0, minutes=0):
+    return Ride.objects.create(
+        status=status,
+        id_rider=rider,
+        id_driver=driver,
+        pickup_latitude=lat,
+        pickup_longitude=lng,
+        dropoff_latitude=lat + 0.01,
+        dropoff_longitude=lng + 0.01,
+        pickup_time=timezone.now() - timedelta(minutes=minutes),
+    )
+
+
+@override_settings(ACTIVE_RIDES=ENABLED)
+class ActiveRideSetTest(TestCase):
+    def setUp(self):
+        self.rider = User.objects.create_user(username="rider", email="rider@example.com")
+        self.driver = User.objects.create_user(username="driver", email="driver@example.com")
+
+    def test_load_keeps_active_rides_indexed(self):
+        pickup = make_ride(self.rider, self.driver, status="pickup", lat=40.701, lng=-74.001)
+        en_route = make_ride(self.rider, self.rider, lat=40.751, lng=-74.051)
+        make_ride(self.rider, self.driver, status="Dropoff")
+        make_ride(self.rider, self.driver, status="cancelled")
+        ride_set = ActiveRideSet()
+        ride_set.load()
+
+        self.assertEqual(len(ride_set), 2)
+        self.assertEqual([ride.pk for ride in ride_set.with_status("PICKUP")], [pickup.pk])
+        self.assertEqual([ride.pk for ride in ride_set.for_driver(self.rider.pk)], [en_route.pk])
+        self.assertEqual(ride_set.count("en-route"), 1)
+        # Users are shared between rides; records have no __dict__.
+        self.assertIs(ride_set.get(pickup.pk).id_rider, ride_set.get(en_route.pk).id_rider)
+        self.assertFalse(hasattr(ride_set.get(pickup.pk), "__dict__"))
+
+    def test_nearest_matches_a_full_sort(self):
+        rng = random.Random(1)
+        for _ in range(60):
+            make_ride(
+                self.rider,
+                self.driver,
+                status=rng.choice(["en-route", "pickup"]),
+                lat=rng.gauss(40.7, 0.03),
+                lng=rng.gauss(-74.0, 0.03),
+            )
+        # Far away: found by the fallback scan once rings outgrow the grid.
+        far = make_ride(self.rider, self.driver, lat=-33.86, lng=151.2)
+        ride_set = ActiveRideSet()
+        ride_set.load()
+
+        for lat, lng, status in [(40.7, -74.0, None), (40.75, -73.95, "pickup"), (0, 0, None)]:
+            rides = ride_set.with_status(status) if status else list(ride_set._data.rides.values())
+            expected = sorted(
+                rides,
+                key=lambda ride: (
+                    math.hypot(ride.pickup_latitude - lat, ride.pickup_longitude - lng),
+                    ride.pk,
+                ),
+            )
+            for limit in (1, 7, 100):
+                self.assertEqual(
+                    [ride.pk for ride in ride_set.nearest(lat, lng, limit, status)],
+                    [ride.pk for ride in expected[:limit]],
+                )
+        self.assertEqual(ride_set.nearest(-33.8, 151.2, 1)[0].pk, far.pk)
+
+    def test_stats_report_memory_per_ride(self):
+        ride = make_ride(self.rider, self.driver)
+        RideEvent.objects.create(id_ride=ride, description="Status changed to en-route")
+        ride_set = ActiveRideSet()
+        ride_set.load()
+        stats = ride_set.stats()
+        self.assertEqual((stats["rides"], stats["events"], stats["users"]), (1, 1, 2))
+        self.assertEqual(
+            stats["total_bytes"], stats["ride_bytes"] + stats["index_bytes"] + stats["user_bytes"]
+        )
+        self.assertEqual(stats["bytes_per_ride"], stats["total_bytes"])
+
+    def test_command_reports_memory(self):
+        make_ride(self.rider, self.driver)
+        out = StringIO()
+        call_command("active_rides", stdout=out)
+        self.assertIn("1 active rides", out.getvalue())
+        self.assertIn("B/ride", out.getvalue())
+
+
+@override_settings(ACTIVE_RIDES=ENABLED)
+class WorkingSetViewTest(APITestCase):
+    def setUp(self):
+        active_rides.clear()
+        self.admin = User.objects.create_user(
+            username="admin", email="admin@example.com", role=User.Role.ADMIN
+        )
+        self.driver = User.objects.create_user(username="driver", email="driver@example.com")
+        self.rides = [
+            make_ride(self.admin, self.driver, status=status, lat=40.7 + n * 0.02, minutes=n * 7 % 5)
+            for n, status in enumerate(["en-route", "pickup", "en-route", "dropoff", "en-route"])
+        ]
+        RideEvent.objects.create(id_ride=self.rides[0], description="Status changed to en-route")
+        RideEvent.objects.create(
+            id_ride=self.rides[0],
+            description="Status changed to en-route",
+            created_at=timezone.now() - timedelta(days=2),
+        )
+        self.client.force_authenticate(self.admin)
+
+    def tearDown(self):
+        active_rides.clear()
+
+    def assertSameAsDatabase(self, url, params):
+        response = self.client.get(url, params)
+        self.assertEqual(response["X-Working-Set"], "hit")
+        with self.settings(ACTIVE_RIDES={"ENABLED": False}):
+            expected = self.client.get(url, params)
+        self.assertNotIn("X-Working-Set", expected)
+        self.assertEqual(response.json(), expected.json())
+
+    def test_list_by_active_status(self):
+        url = reverse("ride-list")
+        for params in [
+            {"status": "en-route"},
+            {"status": "En-Route", "ordering": "pickup_time"},
+            {"status": "en-route", "ordering": "-pickup_time", "page_size": 2, "page": 2},
+            {"status": "en-route", "ordering": "distance", "lat": 40.79, "lng": -74.0},
+            {
+                "status": "en-route",
+                "ordering": "distance",
+                "lat": 40.7,
+                "lng": -74.0,
+                "page_size": 1,
+                "page": 3,
+            },
+            {"status": "pickup", "shape": "normalized"},
+        ]:
+            with self.subTest(params=params):
+                self.assertSameAsDatabase(url, params)
+
+    def test_list_falls_back_to_the_database(self):
+        url = reverse("ride-list")
+        for params in [
+            {},
+            {"status": "dropoff"},
+            {"status": "en-route", "rider_email": "admin"},
+            {"status": "en-route", "ordering": "-distance", "lat": 1, "lng": 1},
+        ]:
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn("X-Working-Set", response)
+        self.assertGreater(active_rides.misses, 0)
+
+    def test_retrieve_active_ride_without_queries(self):
+        url = reverse("ride-detail", args=[self.rides[0].pk])
+        self.assertSameAsDatabase(url, {})
+        self.assertEqual(len(self.client.get(url).data["todays_ride_events"]), 1)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response["X-Working-Set"], "hit")
+
+        # Terminal rides and unknown ids come from the database.
+        response = self.client.get(reverse("ride-detail", args=[self.rides[3].pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Working-Set", response)
+        self.assertEqual(self.client.get(reverse("ride-detail", args=[9999])).status_code, 404)
+
+    def test_batch_reads_active_rides_from_the_set(self):
+        ids = f"{self.rides[3].pk},{self.rides[0].pk},{self.rides[1].pk}"
+        self.client.get(reverse("ride-batch"), {"ids": ids})
+        # Only the dropped off ride is loaded: one query plus its events.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("ride-batch"), {"ids": ids})
+        with self.settings(ACTIVE_RIDES={"ENABLED": False}):
+            expected = self.client.get(reverse("ride-batch"), {"ids": ids})
+        self.assertEqual(response.json(), expected.json())
+
+    def test_committed_writes_update_the_set(self):
+        self.client.get(reverse("ride-list"), {"status": "pickup"})
+        self.assertTrue(active_rides.tracking)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ride = make_ride(self.admin, self.driver, status="pickup", lat=40.0)
+            RideEvent.objects.create(id_ride=ride, description="Status changed to pickup")
+        created = active_rides.get(ride.pk)
+        self.assertEqual(created.status, "pickup")
+        self.assertEqual(
+            [event.description for event in created.todays_ride_events],
+            ["Status changed to pickup"],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                reverse("ride-detail", args=[self.rides[1].pk]), {"status": "dropoff"}, format="json"
+            )
+        self.assertIsNone(active_rides.get(self.rides[1].pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RideEvent.objects.create(id_ride=self.rides[2], description="Driver called")
+        self.assertEqual(len(active_rides.get(self.rides[2].pk).events), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rides[4].delete()
+        self.assertIsNone(active_rides.get(self.rides[4].pk))
+
+        # Writes that aren't committed don't reach the set.
+        with self.captureOnCommitCallbacks(execute=False):
+            Ride.objects.filter(pk=self.rides[2].pk).first().delete()
+        self.assertIsNotNone(active_rides.get(self.rides[2].pk))
+
+    def test_reconciles_writes_that_skip_signals(self):
+        url = reverse("ride-detail", args=[self.rides[0].pk])
+        self.client.get(url)
+        Ride.objects.filter(pk=self.rides[0].pk).update(status="cancelled")
+        # Served stale until the set is reconciled.
+        self.assertEqual(self.client.get(url)["X-Working-Set"], "hit")
+        with self.settings(ACTIVE_RIDES={**ENABLED, "RECONCILE_SECONDS": 0}):
+            response = self.client.get(url)
+        self.assertNotIn("X-Working-Set", response)
+        self.assertEqual(response.data["status"], "cancelled")
+
+    def test_user_changes_are_copied_to_the_set(self):
+        self.assertEqual(USER_FIELDS, set(UserSerializer.Meta.fields))
+        self.client.get(reverse("ride-list"), {"status": "pickup"})
+        loaded_at = active_rides.loaded_at
+
+        self.driver.first_name = "Dana"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.driver.save()
+        # Patched in place: no reload, and every ride of the driver sees it.
+        with self.assertNumQueries(0):
+            responses = [
+                self.client.get(reverse("ride-detail", args=[ride.pk])) for ride in self.rides[:2]
+            ]
+        for response in responses:
+            self.assertEqual(response["X-Working-Set"], "hit")
+            self.assertEqual(response.data["id_driver"]["first_name"], "Dana")
+        self.assertEqual(active_rides.loaded_at, loaded_at)
+
+        # Updates of fields the set doesn't serve, like a login, are skipped.
+        with self.captureOnCommitCallbacks() as callbacks:
+            User.objects.get(pk=self.driver.pk).save(update_fields=["last_login"])
+        self.assertEqual(callbacks, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.driver.delete()
+        self.assertFalse(active_rides.holds_user(self.driver.pk))
+        self.assertEqual(len(active_rides), 0)
@@ -0,0 +1,108 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+DEFAULT_OPTIONS = {
+    # Opt-in, so existing clients aren't refused requests they used to get.
+    "ENABLED": False,
+    "CACHE": "default",
+    # Bucket size (burst) and refill rate in tokens per second.
+    "CAPACITY": 100,
+    "REFILL_RATE": 2.0,
+    # Per-scope overrides, e.g. {"rides": {"CAPACITY": 50}}.
+    "SCOPES": {},
+}
+
+
+def get_options():
+    return {**DEFAULT_OPTIONS, **getattr(settings, "RIDE_THROTTLE", {})}
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket throttle keyed on (scope, user).
+
+    Each request takes ``view.get_throttle_cost(request)`` tokens (1 by
+    default) from the caller's bucket for the view's ``throttle_scope``, so
+    expensive listings drain the bucket faster than cheap ones. Buckets live
+    in the configured Django cache, which makes them shared between worker
+    processes when that cache is (e.g. Redis or Memcached).
+    """
+
+    # Serializes the read-modify-write on the cache within this process; a
+    # shared cache backend may let concurrent processes overspend slightly.
+    lock = threading.Lock()
+
+    def __init__(self):
+        self._wait = None
+
+    def get_scope(self, view):
+        return getattr(view, "throttle_scope", None) or getattr(view, "basename", None) or "default"
+
+    def get_ident(self, request):
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return f"user:{user.pk}"
+        return f"ip:{super().get_ident(request)}"
+
+    def get_cost(self, request, view):
+        get_throttle_cost = getattr(view, "get_throttle_cost", None)
+        return get_throttle_cost(request) if get_throttle_cost else 1
+
+    def allow_request(self, request, view):
+        options = get_options()
+        if not options["ENABLED"]:
+            return True
+
+        scope = self.get_scope(view)
+        scope_options = {**options, **options["SCOPES"].get(scope, {})}
+        capacity = scope_options["CAPACITY"]
+        refill_rate = scope_options["REFILL_RATE"]
+        # A single request may never cost more than a full bucket.
+        cost = min(self.get_cost(request, view), capacity)
+        cache = caches[options["CACHE"]]
+        key = f"throttle:{scope}:{self.get_ident(request)}"
+        # Entries expire once the bucket would have refilled completely.
+        timeout = int(capacity / refill_rate) + 1
+
+        with self.lock:
+            now = time.time()
+            tokens, updated_at = cache.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+            if tokens >= cost:
+                cache.set(key, (tokens - cost, now), timeout)
+                return True
+            cache.set(key, (tokens, now), timeout)
+
+        self._wait = (cost - tokens) / refill_rate
+        return False
+
+    def wait(self):
+        return self._wait
+
+
+class ConcurrencyLimiter:
+    """
+    Counts in-flight requests in this process and admits a new one only
+    while fewer than ``limit`` are active, waiting up to ``timeout`` seconds
+    for a slot.
+    """
+
+    def __init__(self):
+        self.active = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, limit, timeout):
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.active < limit, timeout):
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
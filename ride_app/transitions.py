@@ -0,0 +1,71 @@
+"""
+Optimistic ride status transitions.
+
+A transition is a conditional ``UPDATE ... SET status = <new> WHERE
+status = <expected>`` plus the insert of its "Status changed to" event, in
+one transaction that reads nothing and locks no row beyond the update
+itself. Of concurrent transitions from the same status exactly one updates
+the ride; the others update no row and fail with TransitionConflict
+instead of overwriting it.
+
+The update skips the Ride signals. Status isn't a stats field, and the
+event's own signals record pickup/dropoff trips in the user stats (the
+projection catches up from the event log as usual), so only the working
+set of active rides is updated here.
+"""
+
+from django.db import transaction
+
+from .db_router import pin_to_primary
+from .models import STATUS_CHANGE_PREFIX, STATUS_TRANSITIONS, Ride, RideEvent
+from .working_set import active_rides
+
+
+class TransitionError(Exception):
+    def __init__(self, message, current_status):
+        super().__init__(message)
+        self.current_status = current_status
+
+
+class InvalidTransition(TransitionError):
+    pass
+
+
+class TransitionConflict(TransitionError):
+    pass
+
+
+def is_allowed(from_status, to_status):
+    return to_status.lower() in STATUS_TRANSITIONS.get(from_status.lower(), ())
+
+
+def transition(ride_id, status, expected=None):
+    """
+    Move ride ``ride_id`` from status ``expected`` (its current status when
+    None) to ``status``; returns (previous status, new RideEvent). Raises
+    Ride.DoesNotExist, InvalidTransition when ``status`` can't follow the
+    current status, and TransitionConflict when the ride is no longer in
+    ``expected``.
+    """
+    # Decide on the primary's state, not a replica's.
+    pin_to_primary()
+    current = Ride.objects.filter(pk=ride_id).values_list("status", flat=True)
+    if expected is None:
+        expected = current.get()
+    if not is_allowed(expected, status):
+        raise InvalidTransition(
+            f"Cannot change status from {expected!r} to {status!r}.", expected
+        )
+
+    with transaction.atomic():
+        updated = Ride.objects.filter(pk=ride_id, status=expected).update(status=status)
+        if updated:
+            event = RideEvent.objects.create(
+                id_ride_id=ride_id, description=f"{STATUS_CHANGE_PREFIX}{status}"
+            )
+            if active_rides.tracking:
+                transaction.on_commit(lambda: active_rides.ride_saved(ride_id, status))
+    if not updated:
+        actual = current.get()
+        raise TransitionConflict(f"Ride status is {actual!r}, not {expected!r}.", actual)
+    return expected, event
@@ -1,9 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import RideViewSet
+from .views import JobViewSet, RideViewSet, UserViewSet
 
 router = DefaultRouter()
 router.register(r"rides", RideViewSet, basename="ride")
+router.register(r"jobs", JobViewSet, basename="job")
+router.register(r"users", UserViewSet, basename="user")
 
 urlpatterns = [
     path("", include(router.urls)),
@@ -1,16 +1,36 @@
 from datetime import timedelta
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.db import models
 from django.db.models import F, ExpressionWrapper, FloatField
 from django.db.models.functions import Sqrt, Power
 
-from rest_framework import viewsets, filters
+from django.http import HttpResponse
+
+from rest_framework import generics, mixins, status, viewsets, filters
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
 
-from .models import Ride, RideEvent
-from .serializers import RideSerializer
+from . import geo, jobs, stats, transitions
+from .idempotency import idempotent
+from .models import Job, Ride, RideEvent, RideProjection, User
+from .serializers import (
+    DistanceMatrixSerializer,
+    JobSerializer,
+    NormalizedRideSerializer,
+    RideBatchSerializer,
+    RideProjectionSerializer,
+    RideSerializer,
+    RideTransitionSerializer,
+    UserStatsSerializer,
+    included_users,
+)
 from .permissions import IsAdminRole
 from .filters import RideFilter
+from .working_set import NearestRides, active_rides
 import django_filters.rest_framework
 
 
@@ -30,6 +50,283 @@ class RideViewSet(viewsets.ModelViewSet):
     ]
     filterset_class = RideFilter
     ordering_fields = ["pickup_time", "distance"]
+    # Upper bound on queries per action (authentication included), enforced
+    # by QueryAnalysisMiddleware in strict mode.
+    query_budgets = {
+        "list": 5,
+        "retrieve": 4,
+        "batch": 3,
+        "transition": 9,
+        "timeline": 3,
+        "timelines": 4,
+        "distances": 3,
+    }
+    throttle_scope = "rides"
+
+    def get_throttle_cost(self, request):
+        """
+        Token bucket cost of a request: distance ordering computes a distance
+        for every ride, and deep pages make the database skip many rows.
+        """
+        cost = 1
+        if getattr(self, "action", None) == "distances":
+            # One token per 10,000 matrix cells.
+            data = request.data if isinstance(request.data, dict) else {}
+            origins, destinations = data.get("origins"), data.get("destinations")
+            if isinstance(origins, list) and isinstance(destinations, list):
+                cost += len(origins) * len(destinations) // 10_000
+            return cost
+        if getattr(self, "action", None) == "batch":
+            # One token per 25 rides.
+            return cost + len(self.batch_ids()) // 25
+        if "distance" in request.query_params.get("ordering", ""):
+            cost += 4
+        try:
+            page = max(int(request.query_params.get("page", 1)), 1)
+        except ValueError:
+            page = 1
+        cost += (page - 1) * self.paginator.get_page_size(request) // 1000
+        return cost
+
+    def is_normalized(self):
+        # ?shape=normalized lists each rider/driver once in "included" and
+        # references them by id from the rides.
+        return self.request.query_params.get("shape") == "normalized"
+
+    def get_serializer_class(self):
+        if self.action == "list" and self.is_normalized():
+            return NormalizedRideSerializer
+        return super().get_serializer_class()
+
+    # Query parameters a listing served from the working set may have.
+    working_set_params = {"status", "ordering", "lat", "lng", "page", "page_size", "shape", "format"}
+
+    def working_set_rides(self):
+        """
+        The rides a list request asks for, in order, from the working set of
+        active rides (see ride_app.working_set); None when the request needs
+        the database: it doesn't filter on an active status, or has other
+        filters or orderings.
+        """
+        params = self.request.query_params
+        status_filter = params.get("status")
+        if not status_filter or not active_rides.ready():
+            return None
+        rides = None
+        ordering = params.get("ordering", "")
+        answerable = set(params) <= self.working_set_params and active_rides.is_active(status_filter)
+        if answerable and ordering in ("", "pickup_time", "-pickup_time"):
+            rides = active_rides.with_status(status_filter)
+            if ordering:
+                rides.sort(key=lambda ride: ride.pickup_time, reverse=ordering.startswith("-"))
+        elif answerable and ordering == "distance":
+            try:
+                rides = NearestRides(
+                    active_rides, float(params["lat"]), float(params["lng"]), status_filter
+                )
+            except (KeyError, ValueError):
+                pass
+        active_rides.record(rides is not None)
+        return rides
+
+    def list(self, request, *args, **kwargs):
+        rides = self.working_set_rides()
+        from_working_set = rides is not None
+        if not from_working_set:
+            if not self.is_normalized():
+                return super().list(request, *args, **kwargs)
+            rides = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_queryset(rides)
+        if page is not None:
+            rides = page
+        results = self.get_serializer(rides, many=True).data
+        if page is not None:
+            response = self.get_paginated_response(results)
+        elif self.is_normalized():
+            response = Response({"results": results})
+        else:
+            response = Response(results)
+        if self.is_normalized():
+            response.data["included"] = {"users": included_users(rides)}
+        if from_working_set:
+            response["X-Working-Set"] = "hit"
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        ride = None
+        if active_rides.ready():
+            try:
+                ride = active_rides.get(int(kwargs[self.lookup_url_kwarg or self.lookup_field]))
+            except ValueError:
+                pass
+            active_rides.record(ride is not None)
+        if ride is None:
+            return super().retrieve(request, *args, **kwargs)
+        self.check_object_permissions(request, ride)
+        response = Response(self.get_serializer(ride).data)
+        response["X-Working-Set"] = "hit"
+        return response
+
+    # Retried writes with the same Idempotency-Key get the first response.
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    # partial_update() goes through update() as well.
+    @idempotent
+    def update(self, request, *args, **kwargs):
+        return super().update(request, *args, **kwargs)
+
+    @action(detail=True, methods=["post"], serializer_class=RideTransitionSerializer)
+    @idempotent
+    def transition(self, request, pk=None):
+        """
+        Change a ride's status if the change is allowed from its current
+        (or ``expected_status``) status, recording the status event in the
+        same transaction. 409 with the ride's actual ``status`` when it
+        isn't allowed or another request changed the status first.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        new_status = serializer.validated_data["status"]
+        try:
+            ride_id = int(pk)
+            previous_status, event = transitions.transition(
+                ride_id, new_status, serializer.validated_data.get("expected_status")
+            )
+        except (ValueError, Ride.DoesNotExist):
+            raise NotFound()
+        except transitions.TransitionError as exc:
+            return Response(
+                {"detail": str(exc), "status": exc.current_status},
+                status=status.HTTP_409_CONFLICT,
+            )
+        data = {
+            "id_ride": ride_id,
+            "status": new_status,
+            "previous_status": previous_status,
+            "event": event,
+        }
+        return Response(self.get_serializer(data).data)
+
+    @action(
+        detail=False,
+        methods=["post"],
+        serializer_class=DistanceMatrixSerializer,
+        filter_backends=[],
+        pagination_class=None,
+    )
+    def distances(self, request):
+        """
+        Haversine distances (km) and straight-line ETAs (seconds at
+        ``speed_kmh``) from every origin to every destination. Points are
+        [lat, lng] pairs or ride references, loaded in a single query.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        origins = serializer.validated_data["origins"]
+        destinations = serializer.validated_data["destinations"]
+        speed_kmh = serializer.validated_data["speed_kmh"]
+
+        ride_ids = {point[1] for point in origins + destinations if point[0] == "ride"}
+        rides = {}
+        coordinates = Ride.objects.filter(pk__in=ride_ids).values_list(
+            "pk", "pickup_latitude", "pickup_longitude", "dropoff_latitude", "dropoff_longitude"
+        )
+        for pk, pickup_lat, pickup_lng, dropoff_lat, dropoff_lng in coordinates:
+            rides[pk] = {"pickup": (pickup_lat, pickup_lng), "dropoff": (dropoff_lat, dropoff_lng)}
+        missing = sorted(ride_ids - set(rides))
+        if missing:
+            raise ValidationError({"rides": f"Unknown ride ids: {', '.join(map(str, missing))}."})
+
+        def resolve(points):
+            return [rides[point[1]][point[2]] if point[0] == "ride" else point for point in points]
+
+        origins, destinations = resolve(origins), resolve(destinations)
+        distances, etas = [], []
+        for _, block in geo.iter_distance_matrix(origins, destinations):
+            if geo.numpy is not None and isinstance(block, geo.numpy.ndarray):
+                distances.extend(geo.numpy.round(block, 3).tolist())
+                etas.extend(geo.numpy.round(geo.eta_seconds(block, speed_kmh), 1).tolist())
+                continue
+            for row in block:
+                distances.append([round(distance, 3) for distance in row])
+                etas.append([round(geo.eta_seconds(distance, speed_kmh), 1) for distance in row])
+        return Response(
+            {
+                "origins": [list(point) for point in origins],
+                "destinations": [list(point) for point in destinations],
+                "speed_kmh": speed_kmh,
+                "distances_km": distances,
+                "eta_seconds": etas,
+            }
+        )
+
+    def batch_ids(self):
+        # ?ids=3,1,2 or ?ids=3&ids=1,2
+        return [
+            part.strip()
+            for value in self.request.query_params.getlist("ids")
+            for part in value.split(",")
+            if part.strip()
+        ]
+
+    @action(
+        detail=False,
+        serializer_class=RideBatchSerializer,
+        filter_backends=[],
+        pagination_class=None,
+    )
+    def batch(self, request):
+        """
+        Up to RIDE_BATCH_MAX_IDS rides by id (``?ids=3,1,2``) in one request,
+        in the requested order, with the ids that don't exist under
+        ``missing``. Active rides come from the working set when it's
+        enabled; the rest are loaded with a single ``id_ride__in`` query.
+        """
+        serializer = self.get_serializer(data={"ids": self.batch_ids()})
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data["ids"]
+
+        rides = {}
+        if active_rides.ready():
+            for ride_id in ids:
+                ride = active_rides.get(ride_id)
+                if ride is not None:
+                    rides[ride_id] = ride
+        remaining = [ride_id for ride_id in ids if ride_id not in rides]
+        if remaining:
+            rides.update((ride.pk, ride) for ride in self.get_queryset().filter(id_ride__in=remaining))
+        data = {
+            "results": [rides[ride_id] for ride_id in ids if ride_id in rides],
+            "missing": [ride_id for ride_id in ids if ride_id not in rides],
+        }
+        return Response(self.get_serializer(data).data)
+
+    @action(detail=True, serializer_class=RideProjectionSerializer)
+    def timeline(self, request, pk=None):
+        """
+        Status timeline, pickup/dropoff times and durations of a ride, read
+        from its projection only (see ride_app.projections).
+        """
+        projection = generics.get_object_or_404(RideProjection, id_ride=pk)
+        return Response(self.get_serializer(projection).data)
+
+    @action(detail=False, serializer_class=RideProjectionSerializer, filter_backends=[])
+    def timelines(self, request):
+        """
+        Ride projections, optionally only trips of at least ?min_trip_seconds.
+        """
+        queryset = RideProjection.objects.order_by("id_ride")
+        min_trip_seconds = request.query_params.get("min_trip_seconds")
+        if min_trip_seconds:
+            try:
+                queryset = queryset.filter(trip_seconds__gte=float(min_trip_seconds))
+            except ValueError:
+                raise ValidationError({"min_trip_seconds": "Must be a number."})
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
 
     def get_queryset(self): 
 
@@ -69,3 +366,94 @@ class RideViewSet(viewsets.ModelViewSet):
             except ValueError:
                 pass  # In case of conversion error, ignore distance ordering.
         return queryset
+
+
+class JobViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Submit background jobs (see ride_app.jobs), poll their progress and
+    download their results once ``manage.py worker`` has run them.
+    """
+
+    serializer_class = JobSerializer
+    permission_classes = [IsAdminRole]
+    pagination_class = StandardResultsSetPagination
+    queryset = Job.objects.defer("result").order_by("-id_job")
+    query_budgets = {"create": 4, "list": 4, "retrieve": 3, "result": 3}
+    throttle_scope = "jobs"
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job, _ = jobs.submit(
+            serializer.validated_data["kind"],
+            serializer.validated_data["params"],
+            user=request.user,
+        )
+        # A reused result is ready now; anything else is accepted for later.
+        code = status.HTTP_200_OK if job.status == Job.Status.SUCCEEDED else status.HTTP_202_ACCEPTED
+        headers = {"Location": reverse("job-detail", args=[job.pk], request=request)}
+        return Response(self.get_serializer(job).data, status=code, headers=headers)
+
+    @action(detail=True)
+    def result(self, request, pk=None):
+        """
+        The job's output, as an attachment in its kind's format.
+        """
+        job = generics.get_object_or_404(Job, pk=pk)
+        if job.status != Job.Status.SUCCEEDED:
+            return Response(
+                {"detail": f"Job is {job.status}.", "status": job.status},
+                status=status.HTTP_409_CONFLICT,
+            )
+        job_kind = jobs.JOB_KINDS.get(job.kind)
+        extension = job_kind.extension if job_kind else "txt"
+        response = HttpResponse(job.result, content_type=job.content_type)
+        response["Content-Disposition"] = f'attachment; filename="{job.kind}-{job.pk}.{extension}"'
+        return response
+
+
+class UserViewSet(viewsets.GenericViewSet):
+    queryset = User.objects.all()
+    serializer_class = UserStatsSerializer
+    permission_classes = [IsAdminRole]
+    query_budgets = {"stats": 4}
+    throttle_scope = "users"
+
+    def get_date(self, name):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise ValidationError({name: "Must be a date (YYYY-MM-DD)."})
+        return day
+
+    @action(detail=True)
+    def stats(self, request, pk=None):
+        """
+        A user's rides, distance and trip durations as rider and as driver,
+        summed from the precomputed daily aggregates. ``?start=``/``?end=``
+        (inclusive dates) or ``?days=N`` (the last N days) limit the range.
+        """
+        user_id = generics.get_object_or_404(User.objects.only("pk"), pk=pk).pk
+        start, end = self.get_date("start"), self.get_date("end")
+        days = request.query_params.get("days")
+        if days:
+            try:
+                days = int(days)
+            except ValueError:
+                days = 0
+            if days < 1:
+                raise ValidationError({"days": "Must be a positive integer."})
+            end = timezone.localdate()
+            start = end - timedelta(days=days - 1)
+        data = {"id_user": user_id, "start": start, "end": end, **stats.user_stats(user_id, start, end)}
+        return Response(self.get_serializer(data).data)
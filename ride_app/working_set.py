@@ -0,0 +1,478 @@
+"""
+In-process working set of active rides.
+
+Rides whose status isn't terminal (dropoff, cancelled) are a small part of
+the table but get most of the reads, so each process can keep them in
+memory: one ``ActiveRide`` record (``__slots__``, no per-instance dict) per
+ride, indexed by status, driver and grid cell, sharing its rider and driver
+with the other rides of those users and holding its events of the last 24
+hours. RideViewSet serves list and retrieve requests from it when they only
+need active rides.
+
+Writes made through the ORM in this process are applied by the signal
+handlers in ride_app.signals once their transaction commits. Writes from
+other processes, and writes that skip signals, are picked up when the set
+is reloaded from the database every RECONCILE_SECONDS, which bounds how
+stale a read can be.
+"""
+
+import math
+import sys
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+from .models import Ride, RideEvent
+
+DEFAULT_OPTIONS = {
+    "ENABLED": False,
+    # Seconds between reloads from the database.
+    "RECONCILE_SECONDS": 30,
+    # Side of a grid cell of the location index, in degrees.
+    "CELL_DEGREES": 0.01,
+    "TERMINAL_STATUSES": ("dropoff", "cancelled"),
+    # Rides per query when loading.
+    "LOAD_BATCH_SIZE": 2000,
+}
+# Events older than this aren't served (see RideSerializer.todays_ride_events).
+EVENT_WINDOW = timedelta(days=1)
+# The fields of the shared user objects that are served (UserSerializer's);
+# saves that change none of them leave the set alone.
+USER_FIELDS = frozenset({"id_user", "role", "first_name", "last_name", "email", "phone_number"})
+
+
+def get_options():
+    return {**DEFAULT_OPTIONS, **getattr(settings, "ACTIVE_RIDES", {})}
+
+
+class RecentEvent:
+    __slots__ = ("id_ride_event", "event_kind", "description", "created_at")
+
+    def __init__(self, id_ride_event, event_kind, description, created_at):
+        self.id_ride_event = id_ride_event
+        self.event_kind = event_kind
+        self.description = description
+        self.created_at = created_at
+
+
+class ActiveRide:
+    """
+    The fields RideSerializer reads, so it serializes like a Ride loaded
+    with its users and today's events.
+    """
+
+    __slots__ = (
+        "id_ride",
+        "status",
+        "id_rider",
+        "id_driver",
+        "pickup_latitude",
+        "pickup_longitude",
+        "dropoff_latitude",
+        "dropoff_longitude",
+        "pickup_time",
+        "events",
+        "cell",
+    )
+
+    def __init__(self, ride, rider, driver, events, cell):
+        self.id_ride = ride.id_ride
+        # Interned: a handful of distinct statuses shared by every ride.
+        self.status = sys.intern(ride.status)
+        self.id_rider = rider
+        self.id_driver = driver
+        self.pickup_latitude = ride.pickup_latitude
+        self.pickup_longitude = ride.pickup_longitude
+        self.dropoff_latitude = ride.dropoff_latitude
+        self.dropoff_longitude = ride.dropoff_longitude
+        self.pickup_time = ride.pickup_time
+        self.events = events
+        self.cell = cell
+
+    @property
+    def pk(self):
+        return self.id_ride
+
+    @property
+    def todays_ride_events(self):
+        since = timezone.now() - EVENT_WINDOW
+        return [event for event in self.events if event.created_at >= since]
+
+
+def _recent_events(events):
+    return tuple(
+        RecentEvent(event.id_ride_event, event.event_kind, event.description, event.created_at)
+        for event in sorted(events, key=lambda event: event.id_ride_event)
+    )
+
+
+def _entry_size(entry):
+    # Users are shared between rides and counted separately.
+    size = sys.getsizeof(entry) + sys.getsizeof(entry.events) + sys.getsizeof(entry.cell)
+    for name in ("pickup_latitude", "pickup_longitude", "dropoff_latitude", "dropoff_longitude", "pickup_time"):
+        size += sys.getsizeof(getattr(entry, name))
+    for event in entry.events:
+        size += sys.getsizeof(event) + sys.getsizeof(event.description) + sys.getsizeof(event.created_at)
+    return size
+
+
+def recent_events_prefetch():
+    return Prefetch(
+        "ride_events",
+        queryset=RideEvent.objects.filter(created_at__gte=timezone.now() - EVENT_WINDOW),
+        to_attr="recent_events",
+    )
+
+
+def active_rides_queryset(terminal_statuses=None):
+    """
+    Rides not in a terminal status, with their users and recent events.
+    """
+    if terminal_statuses is None:
+        terminal_statuses = get_options()["TERMINAL_STATUSES"]
+    terminal = Q()
+    for status in terminal_statuses:
+        terminal |= Q(status__iexact=status)
+    return (
+        Ride.objects.exclude(terminal)
+        .order_by("pk")
+        .select_related("id_rider", "id_driver")
+        .prefetch_related(recent_events_prefetch())
+    )
+
+
+class _Indexes:
+    def __init__(self, cell_degrees, terminal_statuses):
+        self.cell_degrees = cell_degrees
+        self.terminal_statuses = frozenset(status.lower() for status in terminal_statuses)
+        self.rides = {}
+        self.by_status = {}
+        self.by_driver = {}
+        self.by_cell = {}
+        self.users = {}
+
+    def is_active(self, status):
+        return status.lower() not in self.terminal_statuses
+
+    def cell(self, lat, lng):
+        return (math.floor(lat / self.cell_degrees), math.floor(lng / self.cell_degrees))
+
+    def entry(self, ride, events):
+        # One shared object per user, whichever ride loaded it first.
+        rider = self.users.setdefault(ride.id_rider_id, ride.id_rider)
+        driver = self.users.setdefault(ride.id_driver_id, ride.id_driver)
+        cell = self.cell(ride.pickup_latitude, ride.pickup_longitude)
+        return ActiveRide(ride, rider, driver, _recent_events(events), cell)
+
+    def add(self, entry):
+        self.discard(entry.id_ride)
+        self.rides[entry.id_ride] = entry
+        for index, key in self._keys(entry):
+            index.setdefault(key, set()).add(entry.id_ride)
+
+    def discard(self, ride_id):
+        entry = self.rides.pop(ride_id, None)
+        if entry is None:
+            return
+        for index, key in self._keys(entry):
+            ids = index[key]
+            ids.discard(ride_id)
+            if not ids:
+                del index[key]
+
+    def _keys(self, entry):
+        return (
+            (self.by_status, entry.status.lower()),
+            (self.by_driver, entry.id_driver.pk),
+            (self.by_cell, entry.cell),
+        )
+
+
+class ActiveRideSet:
+    """
+    Thread-safe working set of active rides; see the module docstring.
+    """
+
+    def __init__(self):
+        options = get_options()
+        self._data = _Indexes(options["CELL_DEGREES"], options["TERMINAL_STATUSES"])
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self.loaded_at = None
+        self.load_seconds = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data.rides)
+
+    @property
+    def tracking(self):
+        """
+        Whether writes should be applied to the set (it's enabled and loaded).
+        """
+        return self.loaded_at is not None and get_options()["ENABLED"]
+
+    def load(self):
+        """
+        Replace the set with the active rides in the database.
+        """
+        options = get_options()
+        data = _Indexes(options["CELL_DEGREES"], options["TERMINAL_STATUSES"])
+        started = time.monotonic()
+        rides = active_rides_queryset(data.terminal_statuses)
+        for ride in rides.iterator(chunk_size=options["LOAD_BATCH_SIZE"]):
+            data.add(data.entry(ride, ride.recent_events))
+        with self._lock:
+            self._data = data
+            self.loaded_at = time.monotonic()
+            self.load_seconds = self.loaded_at - started
+
+    def clear(self):
+        options = get_options()
+        with self._lock:
+            self._data = _Indexes(options["CELL_DEGREES"], options["TERMINAL_STATUSES"])
+            self.loaded_at = None
+
+    def ready(self):
+        """
+        Whether the set can serve reads; (re)loads it when it's enabled and
+        was never loaded or is older than RECONCILE_SECONDS. While one
+        thread reconciles, the others keep reading the previous version.
+        """
+        options = get_options()
+        if not options["ENABLED"]:
+            return False
+        loaded_at = self.loaded_at
+        if (
+            loaded_at is not None
+            and time.monotonic() - loaded_at < options["RECONCILE_SECONDS"]
+        ):
+            return True
+        if self._reload_lock.acquire(blocking=loaded_at is None):
+            try:
+                if self.loaded_at == loaded_at:
+                    self.load()
+            finally:
+                self._reload_lock.release()
+        return True
+
+    def refresh(self, ride_id):
+        """
+        Reload one ride after it was written: two queries, or none when it
+        is neither in the set nor active.
+        """
+        ride = (
+            Ride.objects.select_related("id_rider", "id_driver")
+            .prefetch_related(recent_events_prefetch())
+            .filter(pk=ride_id)
+            .first()
+        )
+        with self._lock:
+            data = self._data
+            if ride is None or not data.is_active(ride.status):
+                data.discard(ride_id)
+                return
+            # Keep the shared user objects already held.
+            data.add(data.entry(ride, ride.recent_events))
+
+    def ride_saved(self, ride_id, status):
+        if self._data.is_active(status):
+            self.refresh(ride_id)
+        else:
+            self.ride_deleted(ride_id)
+
+    def ride_deleted(self, ride_id):
+        with self._lock:
+            self._data.discard(ride_id)
+
+    def event_saved(self, event):
+        with self._lock:
+            entry = self._data.rides.get(event.id_ride_id)
+            if entry is None:
+                return
+            since = timezone.now() - EVENT_WINDOW
+            # The ride's own refresh may already have loaded it.
+            events = [
+                recent
+                for recent in entry.events
+                if recent.id_ride_event != event.pk and recent.created_at >= since
+            ]
+            events.append(event)
+            entry.events = _recent_events(events)
+
+    def user_saved(self, user_id, values):
+        """
+        Copy ``values`` ({attname: value}) onto the user object the user's
+        rides share, so every one of them serves the change.
+        """
+        with self._lock:
+            user = self._data.users.get(user_id)
+            if user is not None:
+                for attname, value in values.items():
+                    setattr(user, attname, value)
+
+    def user_deleted(self, user_id):
+        # Its rides went with it (CASCADE); drop any the set still holds.
+        with self._lock:
+            data = self._data
+            if data.users.pop(user_id, None) is None:
+                return
+            for ride_id in [
+                ride_id
+                for ride_id, entry in data.rides.items()
+                if user_id in (entry.id_rider.pk, entry.id_driver.pk)
+            ]:
+                data.discard(ride_id)
+
+    def record(self, hit):
+        # Approximate under concurrency; only for the metrics.
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def get(self, ride_id):
+        return self._data.rides.get(ride_id)
+
+    def holds_user(self, user_id):
+        return user_id in self._data.users
+
+    def is_active(self, status):
+        return self._data.is_active(status)
+
+    def with_status(self, status):
+        """
+        Active rides with ``status`` (case-insensitive), by id.
+        """
+        with self._lock:
+            data = self._data
+            ids = sorted(data.by_status.get(status.lower(), ()))
+            return [data.rides[ride_id] for ride_id in ids]
+
+    def for_driver(self, driver_id):
+        with self._lock:
+            data = self._data
+            ids = sorted(data.by_driver.get(driver_id, ()))
+            return [data.rides[ride_id] for ride_id in ids]
+
+    def count(self, status=None):
+        with self._lock:
+            if status is None:
+                return len(self._data.rides)
+            return len(self._data.by_status.get(status.lower(), ()))
+
+    def nearest(self, lat, lng, limit, status=None):
+        """
+        Up to ``limit`` active rides (with ``status``) closest to (lat, lng)
+        by pickup point, using the same planar distance in degrees as the
+        ``ordering=distance`` listing. Searches rings of grid cells outward
+        from the point's cell until ``limit`` rides are known to be closer
+        than anything outside the rings.
+        """
+        with self._lock:
+            data = self._data
+            wanted = data.by_status.get(status.lower(), set()) if status else None
+            total = len(wanted) if wanted is not None else len(data.rides)
+            limit = min(limit, total)
+            if limit <= 0:
+                return []
+
+            def distance(entry):
+                return math.hypot(entry.pickup_latitude - lat, entry.pickup_longitude - lng)
+
+            center_row, center_column = data.cell(lat, lng)
+            found = []
+            ring = 0
+            while len(found) < total:
+                # Once a ring has more cells than there are occupied cells,
+                # scanning everything left is cheaper.
+                if 8 * ring > len(data.by_cell):
+                    seen = {ride_id for _, ride_id, _ in found}
+                    candidates = wanted if wanted is not None else data.rides
+                    for ride_id in candidates:
+                        if ride_id not in seen:
+                            entry = data.rides[ride_id]
+                            found.append((distance(entry), ride_id, entry))
+                    break
+                for row in range(center_row - ring, center_row + ring + 1):
+                    edge = row in (center_row - ring, center_row + ring)
+                    step = 1 if edge else 2 * ring
+                    for column in range(center_column - ring, center_column + ring + 1, step):
+                        for ride_id in data.by_cell.get((row, column), ()):
+                            if wanted is None or ride_id in wanted:
+                                entry = data.rides[ride_id]
+                                found.append((distance(entry), ride_id, entry))
+                # Rides outside the rings are more than ring cells away.
+                radius = ring * data.cell_degrees
+                if sum(1 for item in found if item[0] <= radius) >= limit:
+                    break
+                ring += 1
+            found.sort(key=lambda item: (item[0], item[1]))
+            return [entry for _, _, entry in found[:limit]]
+
+    def stats(self):
+        """
+        Size and memory metrics. Sizes are shallow ``sys.getsizeof`` sums of
+        the records, their values and the index containers.
+        """
+        with self._lock:
+            data = self._data
+            ride_bytes = sum(_entry_size(entry) for entry in data.rides.values())
+            index_bytes = sys.getsizeof(data.rides)
+            for index in (data.by_status, data.by_driver, data.by_cell):
+                index_bytes += sys.getsizeof(index) + sum(
+                    sys.getsizeof(key) + sys.getsizeof(ids) for key, ids in index.items()
+                )
+            user_bytes = sum(
+                sys.getsizeof(user) + sys.getsizeof(user.__dict__) for user in data.users.values()
+            )
+            rides = len(data.rides)
+            events = sum(len(entry.events) for entry in data.rides.values())
+            users = len(data.users)
+            cells = len(data.by_cell)
+        total_bytes = ride_bytes + index_bytes + user_bytes
+        return {
+            "rides": rides,
+            "events": events,
+            "users": users,
+            "cells": cells,
+            "ride_bytes": ride_bytes,
+            "index_bytes": index_bytes,
+            "user_bytes": user_bytes,
+            "total_bytes": total_bytes,
+            "bytes_per_ride": total_bytes / rides if rides else None,
+            "age_seconds": time.monotonic() - self.loaded_at if self.loaded_at is not None else None,
+            "load_seconds": self.load_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class NearestRides:
+    """
+    Active rides with ``status`` by distance from (lat, lng), as a sequence
+    for the paginator: slicing finds only the rides up to the slice's end.
+    """
+
+    def __init__(self, ride_set, lat, lng, status):
+        self.ride_set = ride_set
+        self.lat = lat
+        self.lng = lng
+        self.status = status
+
+    def __len__(self):
+        return self.ride_set.count(self.status)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        stop = len(self) if index.stop is None else index.stop
+        return self.ride_set.nearest(self.lat, self.lng, stop, self.status)[index]
+
+
+active_rides = ActiveRideSet()
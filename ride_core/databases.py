@@ -0,0 +1,85 @@
+"""
+Environment-driven database profiles.
+
+``DB_PROFILE`` picks the base tuning ("development" or "production"); the
+individual ``DB_*``/``SQLITE_*`` variables override single values.
+``DB_REPLICAS`` is a comma separated list of SQLite files exposed as the
+aliases ``replica_1``, ``replica_2``, ... for ride_app.db_router.
+"""
+
+PROFILES = {
+    "development": {
+        "CONN_MAX_AGE": 0,
+        "CONN_HEALTH_CHECKS": False,
+        "TRANSACTION_MODE": None,
+        "PRAGMAS": {},
+    },
+    "production": {
+        # Keep connections open between requests, but verify them before
+        # reuse so a dropped connection doesn't fail a request.
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        # Take the write lock when a transaction starts instead of failing
+        # with "database is locked" when a reader upgrades to a writer.
+        "TRANSACTION_MODE": "IMMEDIATE",
+        # WAL lets readers proceed while a writer commits.
+        "PRAGMAS": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "mmap_size": 268435456,
+            "cache_size": -65536,
+            "busy_timeout": 5000,
+        },
+    },
+}
+
+PRAGMA_VARIABLES = {
+    "journal_mode": "SQLITE_JOURNAL_MODE",
+    "synchronous": "SQLITE_SYNCHRONOUS",
+    "mmap_size": "SQLITE_MMAP_SIZE",
+    "cache_size": "SQLITE_CACHE_SIZE",
+    "busy_timeout": "SQLITE_BUSY_TIMEOUT",
+}
+
+
+def sqlite_init_command(pragmas):
+    return ";".join(f"PRAGMA {name}={value}" for name, value in pragmas.items())
+
+
+def build_databases(env, base_dir, default_profile="development"):
+    profile_name = env("DB_PROFILE", default=default_profile)
+    try:
+        profile = PROFILES[profile_name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown DB_PROFILE {profile_name!r}, expected one of {', '.join(PROFILES)}"
+        )
+
+    pragmas = dict(profile["PRAGMAS"])
+    for pragma, variable in PRAGMA_VARIABLES.items():
+        value = env(variable, default=None)
+        if value:
+            pragmas[pragma] = value
+
+    options = {"init_command": sqlite_init_command(pragmas)}
+    transaction_mode = env("DB_TRANSACTION_MODE", default=profile["TRANSACTION_MODE"])
+    if transaction_mode:
+        options["transaction_mode"] = transaction_mode
+
+    def sqlite(name, **extra):
+        return {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": name,
+            "CONN_MAX_AGE": env.int("DB_CONN_MAX_AGE", default=profile["CONN_MAX_AGE"]),
+            "CONN_HEALTH_CHECKS": env.bool(
+                "DB_CONN_HEALTH_CHECKS", default=profile["CONN_HEALTH_CHECKS"]
+            ),
+            "OPTIONS": dict(options),
+            **extra,
+        }
+
+    databases = {"default": sqlite(env("DB_NAME", default=str(base_dir / "db.sqlite3")))}
+    for number, name in enumerate(env.list("DB_REPLICAS", default=[]), 1):
+        # Tests run against a single database; replicas mirror it.
+        databases[f"replica_{number}"] = sqlite(name, TEST={"MIRROR": "default"})
+    return databases
@@ -1,6 +1,8 @@
 from pathlib import Path
 import environ
 
+from ride_core.databases import build_databases
+
 env = environ.Env()
 environ.Env.read_env()
 
@@ -11,9 +13,16 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = env("SECRET_KEY")
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = env("DEBUG")
+DEBUG = env.bool("DEBUG", default=False)
+
+ALLOWED_HOSTS = env.list("ALLOWED_HOSTS", default=[])
 
-ALLOWED_HOSTS = []
+# Debug toolbar and the live OpenAPI schema are development tools. Leaving
+# them out of INSTALLED_APPS/MIDDLEWARE spares every worker their import time
+# at startup and the toolbar's work on every request.
+DEV_TOOLS = env.bool("DEV_TOOLS", default=DEBUG)
+DEV_APPS = ["drf_spectacular", "debug_toolbar"]
+DEV_MIDDLEWARE = ["debug_toolbar.middleware.DebugToolbarMiddleware"]
 
 
 # Application definition
@@ -32,13 +41,15 @@ INSTALLED_APPS = [
     "allauth.socialaccount",
     "django_filters",
     "corsheaders",
-    "drf_spectacular",
-    "debug_toolbar",
     "ride_app",
-]
+] + (DEV_APPS if DEV_TOOLS else [])
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "ride_app.middleware.ReplicaPinMiddleware",
+    "ride_app.middleware.CompressionMiddleware",
+    "ride_app.middleware.ConcurrencyLimitMiddleware",
+    "ride_app.middleware.QueryAnalysisMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -47,8 +58,7 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
-]
+] + (DEV_MIDDLEWARE if DEV_TOOLS else [])
 
 ROOT_URLCONF = "ride_core.urls"
 
@@ -80,12 +90,18 @@ WSGI_APPLICATION = "ride_core.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
-}
+# Profiles and variables are documented in ride_core/databases.py.
+
+DATABASES = build_databases(env, BASE_DIR, default_profile="development")
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["ride_app.db_router.ReadReplicaRouter"]
+# Reads follow a write to the primary for this long (read-your-writes), and
+# at most until the end of the request.
+REPLICA_PIN_SECONDS = env.float("REPLICA_PIN_SECONDS", default=5)
+# Replicas further behind the primary than this are skipped until re-checked.
+REPLICA_MAX_LAG_SECONDS = env.float("REPLICA_MAX_LAG_SECONDS", default=10)
+REPLICA_CHECK_INTERVAL = env.float("REPLICA_CHECK_INTERVAL", default=5)
 
 
 # Password validation
@@ -139,9 +155,82 @@ REST_FRAMEWORK = {
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.SessionAuthentication",
-        "rest_framework.authentication.TokenAuthentication",
+        "ride_app.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_THROTTLE_CLASSES": [
+        "ride_app.throttling.TokenBucketThrottle",
+    ],
+}
+
+# Token bucket throttling (see ride_app/throttling.py), off unless
+# THROTTLE_ENABLED is set. Views may charge more than one token per request
+# through get_throttle_cost().
+RIDE_THROTTLE = {
+    "ENABLED": env.bool("THROTTLE_ENABLED", default=False),
+    "CAPACITY": env.int("THROTTLE_CAPACITY", default=100),
+    "REFILL_RATE": env.float("THROTTLE_REFILL_RATE", default=2.0),
+}
+
+# Responses smaller than this are sent uncompressed. Brotli is preferred to
+# gzip when the client accepts both.
+COMPRESSION_MIN_SIZE = env.int("COMPRESSION_MIN_SIZE", default=1024)
+COMPRESSION_BROTLI_QUALITY = env.int("COMPRESSION_BROTLI_QUALITY", default=5)
+
+# Admission control: requests beyond this many in flight per worker wait up
+# to CONCURRENCY_QUEUE_TIMEOUT seconds for a slot, then get a 503. Keep it
+# below the number of database connections a worker may open; 0 disables it.
+MAX_CONCURRENT_REQUESTS = env.int("MAX_CONCURRENT_REQUESTS", default=32)
+CONCURRENCY_QUEUE_TIMEOUT = env.float("CONCURRENCY_QUEUE_TIMEOUT", default=0.5)
+CONCURRENCY_RETRY_AFTER = env.int("CONCURRENCY_RETRY_AFTER", default=1)
+
+# GET /rides/batch/?ids=...: most rides per request.
+RIDE_BATCH_MAX_IDS = env.int("RIDE_BATCH_MAX_IDS", default=100)
+
+# POST /rides/distances/: largest matrix per request and the average speed
+# behind the straight-line ETAs.
+DISTANCE_MATRIX_MAX_CELLS = env.int("DISTANCE_MATRIX_MAX_CELLS", default=250_000)
+ETA_SPEED_KMH = env.float("ETA_SPEED_KMH", default=30.0)
+
+# Token -> user field values cache used by CachedTokenAuthentication.
+# TTL (seconds) bounds staleness across worker processes after revocation.
+AUTH_TOKEN_CACHE = {
+    "MAX_SIZE": env.int("AUTH_TOKEN_CACHE_MAX_SIZE", default=10000),
+    "TTL": env.int("AUTH_TOKEN_CACHE_TTL", default=60),
+}
+
+# In-process working set of active rides (see ride_app.working_set) that
+# serves ride listings filtered on an active status and ride details.
+# Other processes' writes show up after at most RECONCILE_SECONDS.
+ACTIVE_RIDES = {
+    "ENABLED": env.bool("ACTIVE_RIDES", default=False),
+    "RECONCILE_SECONDS": env.int("ACTIVE_RIDES_RECONCILE_SECONDS", default=30),
+    "CELL_DEGREES": env.float("ACTIVE_RIDES_CELL_DEGREES", default=0.01),
+}
+
+# Ages (days) past which `manage.py purge --enforce` deletes rides and
+# events (see ride_app.retention); 0 keeps them. Purges delete BATCH_SIZE
+# rows per transaction and wait PAUSE seconds between batches.
+RETENTION = {
+    "RIDE_DAYS": env.int("RETENTION_RIDE_DAYS", default=0),
+    "EVENT_DAYS": env.int("RETENTION_EVENT_DAYS", default=0),
+    "BATCH_SIZE": env.int("RETENTION_BATCH_SIZE", default=1000),
+    "PAUSE": env.float("RETENTION_PAUSE", default=0.05),
+}
+
+# Responses to writes sent with an Idempotency-Key are replayed to retries
+# with the same key for TTL seconds.
+IDEMPOTENCY = {
+    "TTL": env.int("IDEMPOTENCY_TTL", default=24 * 60 * 60),
+}
+
+# Background jobs run by `manage.py worker` (see ride_app.jobs). Results are
+# reused for identical submissions for RESULT_TTL seconds.
+JOB_QUEUE = {
+    "RESULT_TTL": env.int("JOB_RESULT_TTL", default=3600),
+    "MAX_ATTEMPTS": env.int("JOB_MAX_ATTEMPTS", default=3),
+    "RETRY_DELAY": env.int("JOB_RETRY_DELAY", default=30),
+    "TIMEOUT": env.int("JOB_TIMEOUT", default=600),
 }
 
 # Optional when using JWT for authentication
@@ -162,8 +251,14 @@ SPECTACULAR_SETTINGS = {
     "SWAGGER_UI_SETTINGS": {
         "persistAuthorization": True,
     },
+    "SERVE_INCLUDE_SCHEMA": False,
 }
 
+# "live" introspects the API on every /schema/ request (drf-spectacular);
+# "static" serves OPENAPI_SCHEMA_FILE, written by `manage.py build_schema`.
+OPENAPI_SCHEMA_MODE = env("OPENAPI_SCHEMA_MODE", default="live" if DEV_TOOLS else "static")
+OPENAPI_SCHEMA_FILE = BASE_DIR / "schema.yml"
+
 
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",  # Vite
@@ -172,6 +267,15 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:4200",  # Angular CLI
 ]
 
+# Per-request SQL analysis (see ride_app/query_analysis.py). Strict mode turns
+# query budget overruns and N+1 patterns into errors, e.g. in CI.
+QUERY_ANALYSIS = {
+    "ENABLED": env.bool("QUERY_ANALYSIS", default=False),
+    "STRICT": env.bool("QUERY_ANALYSIS_STRICT", default=False),
+    "N_PLUS_ONE_THRESHOLD": env.int("QUERY_ANALYSIS_N_PLUS_ONE_THRESHOLD", default=5),
+    "SLOW_QUERY_MS": env.float("QUERY_ANALYSIS_SLOW_QUERY_MS", default=100),
+}
+
 # CSRF_TRUSTED_ORIGINS = []  # For CSRF protection, add trusted origins here
 
 INTERNAL_IPS = [
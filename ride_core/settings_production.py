@@ -0,0 +1,34 @@
+"""
+Production settings for ride_core.
+
+Use with DJANGO_SETTINGS_MODULE=ride_core.settings_production. Development
+tools (debug toolbar, live schema generation) are never loaded and the
+database defaults to the "production" profile from ride_core/databases.py.
+"""
+
+from ride_core.settings import *  # noqa: F401,F403
+from ride_core.databases import build_databases
+from ride_core.settings import (
+    BASE_DIR,
+    DEV_APPS,
+    DEV_MIDDLEWARE,
+    INSTALLED_APPS,
+    MIDDLEWARE,
+    REST_FRAMEWORK,
+    env,
+)
+
+DEBUG = False
+DEV_TOOLS = False
+OPENAPI_SCHEMA_MODE = "static"
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in DEV_APPS]
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in DEV_MIDDLEWARE]
+# drf_spectacular's AutoSchema is only needed to generate the schema;
+# build_schema installs it itself, so it also runs under these settings.
+REST_FRAMEWORK = {
+    key: value for key, value in REST_FRAMEWORK.items() if key != "DEFAULT_SCHEMA_CLASS"
+}
+
+DATABASES = build_databases(env, BASE_DIR, default_profile="production")
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
@@ -1,7 +1,6 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
-from debug_toolbar.toolbar import debug_toolbar_urls
 
 
 urlpatterns = [
@@ -13,10 +12,28 @@ urlpatterns = [
         "rest-auth/registration/",  # new
         include("dj_rest_auth.registration.urls"),
     ),
-    path("schema/", SpectacularAPIView.as_view(), name="schema"),
-    path(
-        "docs/",
-        SpectacularSwaggerView.as_view(url_name="schema"),
-        name="swagger-ui",
-    ),
-] + debug_toolbar_urls()
+]
+
+if settings.OPENAPI_SCHEMA_MODE == "static":
+    from ride_app.schema import StaticSchemaView
+
+    urlpatterns.append(path("schema/", StaticSchemaView.as_view(), name="schema"))
+
+# Development tools are imported only when installed (see DEV_TOOLS).
+if "drf_spectacular" in settings.INSTALLED_APPS:
+    from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+
+    if settings.OPENAPI_SCHEMA_MODE != "static":
+        urlpatterns.append(path("schema/", SpectacularAPIView.as_view(), name="schema"))
+    urlpatterns.append(
+        path(
+            "docs/",
+            SpectacularSwaggerView.as_view(url_name="schema"),
+            name="swagger-ui",
+        )
+    )
+
+if "debug_toolbar" in settings.INSTALLED_APPS:
+    from debug_toolbar.toolbar import debug_toolbar_urls
+
+    urlpatterns += debug_toolbar_urls()